@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count
 from .models import Cliente, Proveedor
 
 @admin.register(Cliente)
@@ -7,15 +8,24 @@ class ClienteAdmin(admin.ModelAdmin):
     search_fields = ['rut', 'razon_social', 'giro']
     list_filter = ['giro']
     
+    def get_queryset(self, request):
+        # Conteo en la misma consulta del listado (antes, un COUNT por fila)
+        return super().get_queryset(request).annotate(num_pedidos=Count('pedido'))
+
     def cantidad_pedidos(self, obj):
-        return obj.pedido_set.count()
+        return obj.num_pedidos
     cantidad_pedidos.short_description = 'Pedidos'
+    cantidad_pedidos.admin_order_field = 'num_pedidos'
 
 @admin.register(Proveedor)
 class ProveedorAdmin(admin.ModelAdmin):
     list_display = ['rut', 'razon_social', 'email_contacto', 'telefono', 'cantidad_productos']
     search_fields = ['rut', 'razon_social']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(num_productos=Count('producto'))
+
     def cantidad_productos(self, obj):
-        return obj.producto_set.count()
-    cantidad_productos.short_description = 'Productos'
\ No newline at end of file
+        return obj.num_productos
+    cantidad_productos.short_description = 'Productos'
+    cantidad_productos.admin_order_field = 'num_productos'
\ No newline at end of file
@@ -2,6 +2,22 @@ from django import forms
 from .models import Proveedor, Cliente
 from django.core.exceptions import ValidationError
 
+def digito_verificador(cuerpo):
+    """Dígito verificador (módulo 11) del cuerpo numérico de un RUT."""
+    suma = 0
+    multiplicador = 2
+    for c in reversed(str(cuerpo)):
+        suma += int(c) * multiplicador
+        multiplicador = multiplicador + 1 if multiplicador < 7 else 2
+
+    dv_calculado = 11 - (suma % 11)
+    if dv_calculado == 11:
+        return '0'
+    if dv_calculado == 10:
+        return 'K'
+    return str(dv_calculado)
+
+
 def validar_rut(rut_completo):
     """
     Verifica que el RUT sea válido (formato y dígito verificador).
@@ -19,23 +35,7 @@ def validar_rut(rut_completo):
     if not cuerpo.isdigit():
         raise ValidationError("El cuerpo del RUT debe ser numérico.")
     try:
-        reverso = cuerpo[::-1]
-        multiplicador = 2
-        suma = 0
-        for c in reverso:
-            suma += int(c) * multiplicador
-            multiplicador = multiplicador + 1 if multiplicador < 7 else 2
-        
-        dv_calculado = 11 - (suma % 11)
-
-        if dv_calculado == 11:
-            dv_final = '0'
-        elif dv_calculado == 10:
-            dv_final = 'K'
-        else:
-            dv_final = str(dv_calculado)
-        
-        if dv_final != dv:
+        if digito_verificador(cuerpo) != dv:
             raise ValidationError("El dígito verificador es incorrecto.")
             
     except Exception:
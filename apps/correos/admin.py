@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import CorreoSalida
+
+
+@admin.register(CorreoSalida)
+class CorreoSalidaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'asunto', 'estado', 'intentos', 'proximo_intento', 'fecha_creacion', 'fecha_envio']
+    list_filter = ['estado']
+    search_fields = ['asunto', 'referencia']
+    readonly_fields = ['lote', 'fecha_toma', 'fecha_envio', 'ultimo_error']
+    actions = ['reintentar']
+
+    @admin.action(description='Reintentar ahora')
+    def reintentar(self, request, queryset):
+        actualizados = queryset.exclude(estado='Enviado').update(
+            estado='Pendiente', intentos=0, proximo_intento=timezone.now()
+        )
+        self.message_user(request, f'{actualizados} correos vuelven a la bandeja.')
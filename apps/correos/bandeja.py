@@ -0,0 +1,177 @@
+"""
+Bandeja de salida de correos.
+
+El código que quiere mandar un correo llama a `encolar_correo` (o
+`encolar_mensajes`) dentro de su transacción: solo se inserta una fila en
+CorreoSalida, sin conectarse al servidor SMTP. El comando `procesar_correos`
+toma los pendientes por lotes, los envía por una sola conexión por lote y,
+si un envío falla, lo reprograma con espera exponencial hasta
+MAXIMO_INTENTOS.
+
+El backend de envío es settings.CORREOS_BACKEND (por defecto el mismo
+EMAIL_BACKEND); en desarrollo o pruebas puede ser el de consola, archivo o
+locmem.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from apps.correos.models import CorreoSalida
+from ticashop.metricas import Contador
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 50
+MAXIMO_INTENTOS = 6
+
+# Espera antes del reintento n: ESPERA_BASE * 2^(n-1), sin pasar de ESPERA_MAXIMA
+ESPERA_BASE = timedelta(minutes=1)
+ESPERA_MAXIMA = timedelta(hours=1)
+
+# Un correo "Enviando" más antiguo que esto quedó de un worker caído
+MINUTOS_ENVIO_ABANDONADO = 15
+
+CORREOS = Contador(
+    'ticashop_correos_total',
+    'Intentos de envío de la bandeja de salida, por resultado',
+    etiquetas=('resultado',),
+)
+
+
+def encolar_correo(asunto, cuerpo, destinatarios, remitente=None, referencia=''):
+    """Agrega un correo a la bandeja. Se envía cuando la transacción actual hace commit."""
+    return CorreoSalida.objects.create(
+        asunto=asunto[:255],
+        cuerpo=cuerpo,
+        remitente=remitente or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios),
+        referencia=referencia[:100],
+    )
+
+
+def encolar_mensajes(mensajes, referencias=None):
+    """Encola varios EmailMessage con un solo INSERT."""
+    referencias = referencias or [''] * len(mensajes)
+    return CorreoSalida.objects.bulk_create([
+        CorreoSalida(
+            asunto=mensaje.subject[:255],
+            cuerpo=mensaje.body,
+            remitente=mensaje.from_email or settings.DEFAULT_FROM_EMAIL,
+            destinatarios=list(mensaje.to),
+            referencia=referencia[:100],
+        )
+        for mensaje, referencia in zip(mensajes, referencias)
+    ])
+
+
+def espera_reintento(intentos):
+    return min(ESPERA_BASE * 2 ** (intentos - 1), ESPERA_MAXIMA)
+
+
+def tomar_lote(tamano=TAMANO_LOTE):
+    """
+    Reclama hasta `tamano` correos listos para enviar. El UPDATE solo toma
+    los que siguen Pendiente y los marca con un identificador de lote, así
+    dos workers nunca se llevan el mismo correo.
+    """
+    ahora = timezone.now()
+    ids = list(
+        CorreoSalida.objects.filter(estado='Pendiente', proximo_intento__lte=ahora)
+        .order_by('proximo_intento', 'id')
+        .values_list('id', flat=True)[:tamano]
+    )
+    if not ids:
+        return []
+    lote = uuid.uuid4().hex
+    CorreoSalida.objects.filter(id__in=ids, estado='Pendiente').update(
+        estado='Enviando', lote=lote, fecha_toma=ahora
+    )
+    return list(CorreoSalida.objects.filter(lote=lote, estado='Enviando').order_by('id'))
+
+
+def _registrar_fallo(correo, error):
+    correo.intentos += 1
+    correo.ultimo_error = str(error)[:1000]
+    if correo.intentos >= MAXIMO_INTENTOS:
+        correo.estado = 'Error'
+        logger.error(f"Correo #{correo.id} descartado tras {correo.intentos} intentos: {error}")
+    else:
+        correo.estado = 'Pendiente'
+        correo.proximo_intento = timezone.now() + espera_reintento(correo.intentos)
+        logger.warning(f"Correo #{correo.id} falló (intento {correo.intentos}), se reintentará: {error}")
+    correo.save(update_fields=['intentos', 'ultimo_error', 'estado', 'proximo_intento'])
+
+
+def enviar_lote(correos):
+    """Envía los correos por una conexión del backend configurado. Retorna (enviados, fallidos)."""
+    backend = getattr(settings, 'CORREOS_BACKEND', None) or settings.EMAIL_BACKEND
+    conexion = get_connection(backend=backend)
+    enviados = []
+    fallidos = 0
+    try:
+        conexion.open()
+        for correo in correos:
+            mensaje = EmailMessage(
+                correo.asunto, correo.cuerpo, correo.remitente, correo.destinatarios,
+                connection=conexion,
+            )
+            try:
+                mensaje.send()
+            except Exception as e:
+                _registrar_fallo(correo, e)
+                fallidos += 1
+                # El servidor puede haber cortado la sesión
+                conexion.close()
+                conexion.open()
+            else:
+                enviados.append(correo.id)
+    except Exception as e:
+        # No se pudo (re)conectar: lo que no alcanzó a salir se reintenta
+        logger.error(f"Error de conexión al servidor de correo: {e}")
+        for correo in correos:
+            if correo.id not in enviados and correo.estado == 'Enviando':
+                _registrar_fallo(correo, e)
+                fallidos += 1
+    finally:
+        conexion.close()
+        if enviados:
+            CorreoSalida.objects.filter(id__in=enviados).update(
+                estado='Enviado', fecha_envio=timezone.now(), ultimo_error=''
+            )
+            CORREOS.inc(len(enviados), resultado='enviado')
+        if fallidos:
+            CORREOS.inc(fallidos, resultado='fallido')
+    return len(enviados), fallidos
+
+
+def procesar_pendientes(tamano_lote=TAMANO_LOTE):
+    """Envía lotes hasta vaciar los correos listos. Retorna (enviados, fallidos)."""
+    total_enviados = total_fallidos = 0
+    while True:
+        correos = tomar_lote(tamano_lote)
+        if not correos:
+            break
+        enviados, fallidos = enviar_lote(correos)
+        total_enviados += enviados
+        total_fallidos += fallidos
+    return total_enviados, total_fallidos
+
+
+def reencolar_abandonados():
+    """Devuelve a Pendiente los correos que un worker tomó y no terminó."""
+    limite = timezone.now() - timedelta(minutes=MINUTOS_ENVIO_ABANDONADO)
+    return CorreoSalida.objects.filter(estado='Enviando', fecha_toma__lt=limite).update(
+        estado='Pendiente', lote=''
+    )
+
+
+def purgar(dias):
+    """Borra los correos enviados hace más de `dias` días."""
+    borrados, _ = CorreoSalida.objects.filter(
+        estado='Enviado', fecha_envio__lt=timezone.now() - timedelta(days=dias)
+    ).delete()
+    return borrados
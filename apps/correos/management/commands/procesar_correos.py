@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.correos.bandeja import procesar_pendientes, purgar, reencolar_abandonados, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos pendientes de la bandeja de salida, con reintentos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Sigue esperando correos nuevos en vez de terminar al vaciar la bandeja.'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5.0,
+            help='Segundos de espera entre revisiones de la bandeja en modo continuo.'
+        )
+        parser.add_argument(
+            '--tamano-lote', type=int, default=TAMANO_LOTE,
+            help='Correos enviados por cada conexión SMTP.'
+        )
+        parser.add_argument(
+            '--purgar-dias', type=int, default=None,
+            help='Borra antes los correos enviados hace más de N días.'
+        )
+
+    def handle(self, *args, **options):
+        if options['purgar_dias'] is not None:
+            borrados = purgar(options['purgar_dias'])
+            self.stdout.write(f'{borrados} correos enviados eliminados.')
+
+        while True:
+            reencolar_abandonados()
+            enviados, fallidos = procesar_pendientes(max(1, options['tamano_lote']))
+            if enviados or fallidos:
+                self.stdout.write(self.style.SUCCESS(f'{enviados} correos enviados, {fallidos} fallidos.'))
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
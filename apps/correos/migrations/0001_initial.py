@@ -0,0 +1,41 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoSalida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo', models.TextField()),
+                ('remitente', models.CharField(max_length=255)),
+                ('destinatarios', models.JSONField(default=list)),
+                ('referencia', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Enviando', 'Enviando'), ('Enviado', 'Enviado'), ('Error', 'Error')], default='Pendiente', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('lote', models.CharField(blank=True, max_length=32)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_toma', models.DateTimeField(blank=True, null=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Correo de Salida',
+                'verbose_name_plural': 'Correos de Salida',
+                'db_table': 'correos_salida',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_intento_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import models
+from django.utils import timezone
+
+
+class CorreoSalida(models.Model):
+    """
+    Correo en la bandeja de salida. Se crea dentro de la misma transacción
+    que la operación que lo origina (si esa transacción se revierte, el
+    correo no existe) y lo envía el comando `procesar_correos`.
+    """
+    ESTADOS = (
+        ('Pendiente', 'Pendiente'),
+        ('Enviando', 'Enviando'),
+        ('Enviado', 'Enviado'),
+        ('Error', 'Error'),
+    )
+
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField()
+    remitente = models.CharField(max_length=255)
+    destinatarios = models.JSONField(default=list)
+    # Origen del correo (p. ej. "recordatorio:vencida:123"), para buscarlo en el admin
+    referencia = models.CharField(max_length=100, blank=True, db_index=True)
+
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='Pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    # Marca del worker que tomó el correo (ver bandeja.tomar_lote)
+    lote = models.CharField(max_length=32, blank=True)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_toma = models.DateTimeField(null=True, blank=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.asunto} -> {', '.join(self.destinatarios)} ({self.estado})"
+
+    class Meta:
+        db_table = 'correos_salida'
+        verbose_name = 'Correo de Salida'
+        verbose_name_plural = 'Correos de Salida'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_intento_idx'),
+        ]
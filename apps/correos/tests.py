@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.correos.bandeja import (
+    ESPERA_MAXIMA, MAXIMO_INTENTOS, encolar_correo, espera_reintento,
+    procesar_pendientes, reencolar_abandonados, tomar_lote
+)
+from apps.correos.models import CorreoSalida
+
+
+class BackendQueFalla(EmailBackend):
+    """Backend locmem que rechaza los destinatarios con 'rechazado' en la dirección."""
+
+    def send_messages(self, mensajes):
+        if any('rechazado' in destinatario for mensaje in mensajes for destinatario in mensaje.to):
+            raise OSError('Destinatario rechazado')
+        return super().send_messages(mensajes)
+
+
+@override_settings(CORREOS_BACKEND='apps.correos.tests.BackendQueFalla')
+class BandejaTests(TestCase):
+
+    def test_envia_los_pendientes(self):
+        correo = encolar_correo('Asunto', 'Cuerpo', ['cliente@ticashop.cl'])
+
+        self.assertEqual(procesar_pendientes(), (1, 0))
+
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, 'Enviado')
+        self.assertIsNotNone(correo.fecha_envio)
+        self.assertEqual(mail.outbox[0].to, ['cliente@ticashop.cl'])
+
+    def test_fallo_reprograma_con_espera_exponencial(self):
+        correo = encolar_correo('Asunto', 'Cuerpo', ['rechazado@ticashop.cl'])
+        encolar_correo('Asunto', 'Cuerpo', ['cliente@ticashop.cl'])
+
+        antes = timezone.now()
+        with self.assertLogs('apps.correos.bandeja', 'WARNING'):
+            self.assertEqual(procesar_pendientes(), (1, 1))
+
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, 'Pendiente')
+        self.assertEqual(correo.intentos, 1)
+        self.assertIn('Destinatario rechazado', correo.ultimo_error)
+        self.assertGreaterEqual(correo.proximo_intento, antes + espera_reintento(1))
+        # Hasta que pase la espera no se vuelve a tomar
+        self.assertEqual(procesar_pendientes(), (0, 0))
+
+    def test_espera_reintento(self):
+        self.assertEqual(espera_reintento(1), timedelta(minutes=1))
+        self.assertEqual(espera_reintento(2), timedelta(minutes=2))
+        self.assertEqual(espera_reintento(4), timedelta(minutes=8))
+        self.assertEqual(espera_reintento(20), ESPERA_MAXIMA)
+
+    def test_descarta_tras_el_maximo_de_intentos(self):
+        correo = encolar_correo('Asunto', 'Cuerpo', ['rechazado@ticashop.cl'])
+
+        with self.assertLogs('apps.correos.bandeja', 'WARNING') as registro:
+            for _ in range(MAXIMO_INTENTOS):
+                CorreoSalida.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now())
+                procesar_pendientes()
+
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, 'Error')
+        self.assertEqual(correo.intentos, MAXIMO_INTENTOS)
+        self.assertEqual(tomar_lote(), [])
+        self.assertIn('descartado', registro.output[-1])
+
+    def test_un_correo_se_toma_una_sola_vez(self):
+        encolar_correo('Asunto', 'Cuerpo', ['cliente@ticashop.cl'])
+
+        self.assertEqual(len(tomar_lote()), 1)
+        self.assertEqual(tomar_lote(), [])
+
+    def test_reencola_los_abandonados(self):
+        correo = encolar_correo('Asunto', 'Cuerpo', ['cliente@ticashop.cl'])
+        tomar_lote()
+        CorreoSalida.objects.filter(pk=correo.pk).update(fecha_toma=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(reencolar_abandonados(), 1)
+        self.assertEqual(procesar_pendientes(), (1, 0))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DocumentoVenta, DetalleDocumento, Pago
+from .models import DocumentoVenta, DetalleDocumento, Pago, SecuenciaFolio, RecordatorioEnviado
 
 class DetalleDocumentoInline(admin.TabularInline):
     model = DetalleDocumento
@@ -50,4 +50,15 @@ class PagoAdmin(admin.ModelAdmin):
     list_display = ['id', 'documento', 'fecha_pago', 'monto_pagado', 'metodo_pago']
     list_filter = ['metodo_pago', 'fecha_pago']
     search_fields = ['documento__folio', 'referencia']
-    readonly_fields = ['fecha_pago']
\ No newline at end of file
+    readonly_fields = ['fecha_pago']
+
+@admin.register(SecuenciaFolio)
+class SecuenciaFolioAdmin(admin.ModelAdmin):
+    list_display = ['tipo_documento', 'siguiente']
+
+@admin.register(RecordatorioEnviado)
+class RecordatorioEnviadoAdmin(admin.ModelAdmin):
+    list_display = ['documento', 'tipo', 'fecha', 'estado', 'email', 'fecha_registro']
+    list_filter = ['tipo', 'estado', 'fecha']
+    search_fields = ['documento__folio', 'email']
+    list_select_related = ['documento']
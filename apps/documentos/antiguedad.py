@@ -0,0 +1,136 @@
+"""
+Antigüedad de saldos (cuentas por cobrar) por tramos de días vencidos.
+
+Una sola consulta agrupada por cliente suma el saldo de las facturas
+abiertas en cada tramo según los días transcurridos desde el vencimiento
+(las que no tienen fecha de vencimiento vencen el día de emisión). Los
+totales generales se suman en Python a partir de las filas por cliente.
+
+Con fecha de corte hoy (o futura) se usa el saldo guardado en el documento
+(DocumentoVenta.saldo_pendiente). Con una fecha pasada el saldo se
+reconstruye con los pagos y notas de crédito registrados hasta esa fecha,
+para ver la cartera tal como estaba ese día.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DateField, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from apps.documentos.models import DocumentoVenta, Pago, NotaCredito
+
+# (clave, etiqueta, días vencidos desde, hasta); None = sin límite
+TRAMOS = (
+    ('por_vencer', 'Por vencer', None, 0),
+    ('dias_0_30', '0-30 días', 1, 30),
+    ('dias_31_60', '31-60 días', 31, 60),
+    ('dias_61_90', '61-90 días', 61, 90),
+    ('dias_90_mas', 'Más de 90 días', 91, None),
+)
+
+CERO = Value(Decimal('0'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _fin_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia + timedelta(days=1), time.min))
+
+
+def _saldo_al_corte(corte):
+    """Saldo de cada documento con los pagos y notas de crédito hasta `corte` inclusive."""
+    pagado = Coalesce(Subquery(
+        Pago.objects.filter(documento=OuterRef('pk'), fecha_pago__lt=_fin_del_dia(corte))
+        .order_by().values('documento').annotate(suma=Sum('monto_pagado')).values('suma')
+    ), CERO)
+    notas = Coalesce(Subquery(
+        NotaCredito.objects.filter(factura=OuterRef('pk'), fecha_emision__lte=corte)
+        .order_by().values('factura').annotate(suma=Sum('monto')).values('suma')
+    ), CERO)
+    return Greatest(F('total') - pagado - notas, CERO)
+
+
+def facturas_abiertas(corte):
+    """Facturas emitidas hasta `corte` con saldo a esa fecha, anotadas con `saldo` y `vence`."""
+    facturas = (
+        DocumentoVenta.objects.filter(
+            tipo_documento='Factura',
+            fecha_emision__lt=_fin_del_dia(corte),
+        )
+        .exclude(estado='Anulada')
+        .order_by()
+    )
+    if corte >= timezone.localdate():
+        facturas = facturas.filter(saldo_pendiente__gt=0).annotate(saldo=F('saldo_pendiente'))
+    else:
+        facturas = facturas.annotate(saldo=_saldo_al_corte(corte)).filter(saldo__gt=0)
+    return facturas.annotate(
+        vence=Coalesce('fecha_vencimiento', TruncDate('fecha_emision'), output_field=DateField())
+    )
+
+
+def _filtro_tramo(corte, desde, hasta):
+    """Q sobre `vence` para los días vencidos en [desde, hasta]."""
+    condicion = Q()
+    if desde is not None:
+        condicion &= Q(vence__lte=corte - timedelta(days=desde))
+    if hasta is not None:
+        condicion &= Q(vence__gte=corte - timedelta(days=hasta))
+    return condicion
+
+
+def antiguedad_saldos(corte=None):
+    """
+    Retorna {'corte', 'tramos', 'clientes', 'totales'}: `clientes` es una
+    lista de dicts (cliente_id, razon_social, rut, documentos, un monto por
+    tramo y total) ordenada por total descendente; `totales` suma los tramos.
+    """
+    corte = corte or timezone.localdate()
+    montos = {
+        clave: Coalesce(Sum('saldo', filter=_filtro_tramo(corte, desde, hasta)), CERO)
+        for clave, _, desde, hasta in TRAMOS
+    }
+    filas = (
+        facturas_abiertas(corte)
+        .values('cliente_id', 'cliente__razon_social', 'cliente__rut')
+        .annotate(documentos=Count('id'), total=Sum('saldo'), **montos)
+        .order_by('-total', 'cliente__razon_social')
+    )
+
+    clientes = []
+    totales = {clave: Decimal('0') for clave, *_ in TRAMOS}
+    totales.update(total=Decimal('0'), documentos=0)
+    for fila in filas:
+        cliente = {
+            'cliente_id': fila['cliente_id'],
+            'razon_social': fila['cliente__razon_social'],
+            'rut': fila['cliente__rut'],
+            'documentos': fila['documentos'],
+            'total': fila['total'],
+        }
+        for clave, *_ in TRAMOS:
+            cliente[clave] = fila[clave]
+            totales[clave] += fila[clave]
+        totales['total'] += fila['total']
+        totales['documentos'] += fila['documentos']
+        clientes.append(cliente)
+
+    return {
+        'corte': corte,
+        'tramos': [(clave, etiqueta) for clave, etiqueta, *_ in TRAMOS],
+        'clientes': clientes,
+        'totales': totales,
+    }
+
+
+def encabezados_antiguedad():
+    return ['RUT', 'Cliente', 'Documentos'] + [etiqueta for _, etiqueta, *_ in TRAMOS] + ['Total']
+
+
+def filas_antiguedad(resultado):
+    """Filas para la exportación: una por cliente y la de totales al final."""
+    for cliente in resultado['clientes']:
+        yield ([cliente['rut'], cliente['razon_social'], cliente['documentos']]
+               + [cliente[clave] for clave, _ in resultado['tramos']] + [cliente['total']])
+    totales = resultado['totales']
+    yield (['', 'TOTAL', totales['documentos']]
+           + [totales[clave] for clave, _ in resultado['tramos']] + [totales['total']])
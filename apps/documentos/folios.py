@@ -0,0 +1,126 @@
+"""
+Asignación de folios por tipo de documento.
+
+Cada tipo (Factura, Boleta, NotaCredito) tiene una fila en SecuenciaFolio con
+el próximo folio libre. Reservar folios es un UPDATE ... SET siguiente =
+siguiente + n sobre esa única fila: la fila queda bloqueada hasta el commit,
+así que dos checkouts concurrentes nunca reciben el mismo folio y el costo no
+depende de cuántos documentos existan.
+
+Con settings.FOLIOS_TAMANO_BLOQUE > 1 cada proceso reserva un bloque de folios
+y los entrega desde memoria; el resto del bloque solo se guarda si la
+transacción que lo reservó hace commit (si hace rollback, la secuencia también
+vuelve atrás y el bloque se descarta).
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, F, Max
+from django.db.models.functions import Cast
+
+from apps.documentos.models import DocumentoVenta, NotaCredito, SecuenciaFolio
+
+FOLIO_INICIAL = 1000
+FOLIOS_INICIALES = {
+    'NotaCredito': 1,
+}
+
+_lock = threading.Lock()
+_bloques = {}
+_pid = os.getpid()
+
+
+def _ultimo_folio_nota_credito():
+    """Mayor folio numérico de NotaCredito (el campo es texto; se ignoran los no numéricos)."""
+    return (
+        NotaCredito.objects.filter(folio__regex=r'^[0-9]+$')
+        .aggregate(ultimo=Max(Cast('folio', BigIntegerField())))['ultimo']
+    )
+
+
+def folio_inicial(tipo_documento):
+    """Primer folio para un tipo sin secuencia (continúa desde el máximo existente)."""
+    inicial = FOLIOS_INICIALES.get(tipo_documento, FOLIO_INICIAL)
+    if tipo_documento == 'NotaCredito':
+        ultimo = _ultimo_folio_nota_credito()
+    else:
+        ultimo = (
+            DocumentoVenta.objects.filter(tipo_documento=tipo_documento)
+            .aggregate(ultimo=Max('folio'))['ultimo']
+        )
+    if ultimo is not None:
+        return max(ultimo + 1, inicial)
+    return inicial
+
+
+def _crear_secuencia(tipo_documento):
+    try:
+        with transaction.atomic():
+            SecuenciaFolio.objects.create(
+                tipo_documento=tipo_documento,
+                siguiente=folio_inicial(tipo_documento),
+            )
+    except IntegrityError:
+        # Otro proceso la creó primero
+        pass
+
+
+def reservar_bloque(tipo_documento, cantidad=1):
+    """
+    Reserva `cantidad` folios consecutivos de forma atómica.
+    Retorna (inicio, fin): los folios reservados son range(inicio, fin).
+    """
+    if cantidad < 1:
+        raise ValueError("La cantidad de folios a reservar debe ser al menos 1.")
+
+    with transaction.atomic():
+        secuencia = SecuenciaFolio.objects.filter(tipo_documento=tipo_documento)
+        if not secuencia.update(siguiente=F('siguiente') + cantidad):
+            _crear_secuencia(tipo_documento)
+            secuencia.update(siguiente=F('siguiente') + cantidad)
+        fin = secuencia.values_list('siguiente', flat=True).get()
+
+    return fin - cantidad, fin
+
+
+def _guardar_bloque(tipo_documento, inicio, fin):
+    with _lock:
+        _bloques.setdefault(tipo_documento, []).append([inicio, fin])
+
+
+def _tomar_de_bloque(tipo_documento):
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            # Proceso hijo (fork): los bloques del padre no le pertenecen
+            _bloques.clear()
+            _pid = os.getpid()
+
+        rangos = _bloques.get(tipo_documento)
+        while rangos:
+            rango = rangos[0]
+            if rango[0] < rango[1]:
+                folio = rango[0]
+                rango[0] += 1
+                return folio
+            rangos.pop(0)
+    return None
+
+
+def asignar_folio(tipo_documento):
+    """Retorna el siguiente folio para el tipo de documento."""
+    tamano_bloque = getattr(settings, 'FOLIOS_TAMANO_BLOQUE', 1)
+
+    if tamano_bloque <= 1:
+        inicio, _ = reservar_bloque(tipo_documento, 1)
+        return inicio
+
+    folio = _tomar_de_bloque(tipo_documento)
+    if folio is not None:
+        return folio
+
+    inicio, fin = reservar_bloque(tipo_documento, tamano_bloque)
+    transaction.on_commit(lambda: _guardar_bloque(tipo_documento, inicio + 1, fin))
+    return inicio
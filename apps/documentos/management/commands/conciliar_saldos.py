@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from apps.documentos.models import DocumentoVenta, CAMPOS_SALDO
+
+TAMANO_LOTE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara monto_pagado, monto_notas_credito y saldo_pendiente de cada documento '
+        'con sus pagos y notas de crédito; con --reparar corrige las diferencias.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reparar', action='store_true',
+            help='Recalcula los documentos con diferencias (sin esto solo informa).'
+        )
+        parser.add_argument(
+            '--mostrar', type=int, default=20,
+            help='Cantidad de documentos con diferencias a listar.'
+        )
+
+    def handle(self, *args, **options):
+        calculados = DocumentoVenta.saldos_calculados()
+        diferencia = Q()
+        for campo in CAMPOS_SALDO:
+            diferencia |= ~Q(**{campo: F(f'{campo}_real')})
+
+        descuadrados = (
+            DocumentoVenta.objects.annotate(
+                **{f'{campo}_real': expresion for campo, expresion in calculados.items()}
+            )
+            .filter(diferencia)
+            .order_by('id')
+        )
+
+        ids = list(descuadrados.values_list('id', flat=True))
+        if not ids:
+            self.stdout.write(self.style.SUCCESS('Todos los saldos cuadran.'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'{len(ids)} documentos con saldos descuadrados.'))
+        for doc in descuadrados[:options['mostrar']]:
+            cambios = ', '.join(
+                f"{campo} {getattr(doc, campo)} -> {getattr(doc, f'{campo}_real')}"
+                for campo in CAMPOS_SALDO
+            )
+            self.stdout.write(f'  {doc.tipo_documento} #{doc.folio} (id {doc.id}): {cambios}')
+
+        if not options['reparar']:
+            self.stdout.write('Use --reparar para corregirlos.')
+            return
+
+        reparados = 0
+        for inicio in range(0, len(ids), TAMANO_LOTE):
+            reparados += DocumentoVenta.recalcular_saldos(
+                DocumentoVenta.objects.filter(id__in=ids[inicio:inicio + TAMANO_LOTE])
+            )
+        self.stdout.write(self.style.SUCCESS(f'{reparados} documentos recalculados.'))
@@ -1,106 +1,47 @@
-import logging
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.conf import settings
-from apps.documentos.models import DocumentoVenta
-
-# Configurar un logger para ver qué pasa
-logger = logging.getLogger(__name__)
+from apps.documentos.recordatorios import enviar_recordatorios, TAMANO_LOTE
 
 class Command(BaseCommand):
     help = 'Busca facturas por vencer y vencidas, y envía recordatorios por correo.'
 
-    def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('Iniciando tarea de recordatorios de pago...'))
-        
-        hoy = timezone.localdate()
-        
-        # --- 1. Buscar facturas POR VENCER (Ej: vencen en 3 días) ---
-        fecha_limite_pronto = hoy + timedelta(days=3)
-        facturas_por_vencer = DocumentoVenta.objects.filter(
-            tipo_documento='Factura',
-            estado__in=['Emitida', 'Pago Parcial'], # Solo las pendientes
-            fecha_vencimiento=fecha_limite_pronto
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directo', action='store_true',
+            help='Envía los correos ahora en vez de dejarlos en la bandeja de salida.'
         )
-
-        for doc in facturas_por_vencer:
-            self.enviar_correo_recordatorio(doc, 'por_vencer')
-
-        # --- 2. Buscar facturas VENCIDAS ---
-        facturas_vencidas = DocumentoVenta.objects.filter(
-            tipo_documento='Factura',
-            estado__in=['Emitida', 'Pago Parcial'], # Solo las pendientes
-            fecha_vencimiento__lt=hoy  # Fecha de vencimiento es anterior a hoy
+        parser.add_argument(
+            '--hilos', type=int, default=1,
+            help='Con --directo: conexiones SMTP en paralelo (cada hilo envía sus propios lotes).'
+        )
+        parser.add_argument(
+            '--tamano-lote', type=int, default=TAMANO_LOTE,
+            help='Correos enviados por cada conexión SMTP.'
+        )
+        parser.add_argument(
+            '--sin-resumen', action='store_true',
+            help='No envía el resumen de cobranza al correo de la empresa.'
         )
-        
-        for doc in facturas_vencidas:
-            self.enviar_correo_recordatorio(doc, 'vencida')
-
-        # --- 3. (Opcional) Enviar resumen al administrador ---
-        if facturas_por_vencer.count() > 0 or facturas_vencidas.count() > 0:
-            self.enviar_resumen_admin(facturas_por_vencer, facturas_vencidas)
-
-        self.stdout.write(self.style.SUCCESS('Tarea de recordatorios finalizada.'))
-
-    def enviar_correo_recordatorio(self, documento, tipo_plantilla):
-        """
-        Prepara y envía un correo al cliente.
-        """
-        cliente = documento.cliente
-        # Intentamos obtener el email de facturación, si no, el del perfil de usuario
-        email_cliente = documento.cliente.email_facturacion or documento.cliente.user.email
-
-        if not email_cliente:
-            logger.warning(f"Factura #{documento.folio} no tiene email de cliente.")
-            return
 
-        if tipo_plantilla == 'por_vencer':
-            asunto = f"Recordatorio: Tu Factura #{documento.folio} está por vencer"
-            template_txt = 'documentos/email/recordatorio_por_vencer.txt'
-        else: # 'vencida'
-            asunto = f"Aviso de Vencimiento: Tu Factura #{documento.folio} está vencida"
-            template_txt = 'documentos/email/recordatorio_vencida.txt'
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Iniciando tarea de recordatorios de pago...'))
 
-        context = {
-            'cliente_nombre': cliente.razon_social,
-            'folio': documento.folio,
-            'total': documento.total,
-            'fecha_vencimiento': documento.fecha_vencimiento,
-        }
-        
-        cuerpo_mensaje = render_to_string(template_txt, context)
+        resultado = enviar_recordatorios(
+            timezone.localdate(),
+            hilos=max(1, options['hilos']),
+            tamano_lote=max(1, options['tamano_lote']),
+            resumen=not options['sin_resumen'],
+            directo=options['directo'],
+        )
 
-        try:
-            send_mail(
-                asunto,
-                cuerpo_mensaje,
-                settings.DEFAULT_FROM_EMAIL, # Tu email (ej: "ventas@ticashop.cl")
-                [email_cliente],             # Email del destinatario
-                fail_silently=False,
+        if options['directo']:
+            self.stdout.write(
+                f"Enviados: {resultado['enviados']} | Fallidos: {resultado['fallidos']} | "
+                f"Omitidos (sin email): {resultado['omitidos']}"
             )
-            logger.info(f"Correo enviado para Factura #{documento.folio} a {email_cliente}")
-        except Exception as e:
-            logger.error(f"Error al enviar correo para Factura #{documento.folio}: {e}")
-
-    def enviar_resumen_admin(self, por_vencer, vencidas):
-        """
-        Envía un resumen de la cobranza a un correo de la empresa.
-        """
-        asunto = f"Resumen de Cobranza TicaShop - {timezone.localdate()}"
-        context = {
-            'facturas_por_vencer': por_vencer,
-            'facturas_vencidas': vencidas,
-            'total_por_vencer': por_vencer.count(),
-            'total_vencidas': vencidas.count(),
-        }
-        cuerpo_mensaje = render_to_string('documentos/email/resumen_admin.txt', context)
-        
-        send_mail(
-            asunto,
-            cuerpo_mensaje,
-            settings.DEFAULT_FROM_EMAIL,
-            [settings.EMAIL_HOST_USER] # Se auto-envía al email de la empresa
-        )
\ No newline at end of file
+        else:
+            self.stdout.write(
+                f"En bandeja de salida: {resultado['encolados']} | "
+                f"Omitidos (sin email): {resultado['omitidos']}"
+            )
+        self.stdout.write(self.style.SUCCESS('Tarea de recordatorios finalizada.'))
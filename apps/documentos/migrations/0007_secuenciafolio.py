@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:00
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def crear_secuencias(apps, schema_editor):
+    """Inicia cada secuencia en el folio siguiente al máximo ya emitido."""
+    DocumentoVenta = apps.get_model('documentos', 'DocumentoVenta')
+    SecuenciaFolio = apps.get_model('documentos', 'SecuenciaFolio')
+
+    for tipo in ('Factura', 'Boleta'):
+        ultimo = DocumentoVenta.objects.filter(tipo_documento=tipo).aggregate(ultimo=Max('folio'))['ultimo']
+        siguiente = max(ultimo + 1, 1000) if ultimo is not None else 1000
+        SecuenciaFolio.objects.create(tipo_documento=tipo, siguiente=siguiente)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0006_alter_detallenotacredito_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaFolio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_documento', models.CharField(max_length=20, unique=True)),
+                ('siguiente', models.BigIntegerField(default=1000, verbose_name='Siguiente folio')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Folio',
+                'verbose_name_plural': 'Secuencias de Folio',
+                'db_table': 'secuencia_folio',
+            },
+        ),
+        migrations.RunPython(crear_secuencias, migrations.RunPython.noop),
+    ]
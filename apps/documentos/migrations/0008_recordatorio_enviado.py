@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0007_secuenciafolio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordatorioEnviado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('por_vencer', 'Por vencer'), ('vencida', 'Vencida')], max_length=20)),
+                ('fecha', models.DateField(verbose_name='Fecha del recordatorio')),
+                ('estado', models.CharField(choices=[('Enviado', 'Enviado'), ('Fallido', 'Fallido')], max_length=10)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_registro', models.DateTimeField(auto_now=True)),
+                ('documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recordatorios', to='documentos.documentoventa')),
+            ],
+            options={
+                'verbose_name': 'Recordatorio Enviado',
+                'verbose_name_plural': 'Recordatorios Enviados',
+                'db_table': 'recordatorios_enviados',
+                'constraints': [models.UniqueConstraint(fields=('documento', 'tipo', 'fecha'), name='recordatorio_unico_dia')],
+            },
+        ),
+    ]
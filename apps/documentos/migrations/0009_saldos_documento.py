@@ -0,0 +1,55 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:31
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def calcular_saldos(apps, schema_editor):
+    """Llena los montos de los documentos existentes (mismo UPDATE que recalcular_saldos)."""
+    DocumentoVenta = apps.get_model('documentos', 'DocumentoVenta')
+    Pago = apps.get_model('documentos', 'Pago')
+    NotaCredito = apps.get_model('documentos', 'NotaCredito')
+
+    cero = Value(Decimal('0'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+    pagado = Coalesce(Subquery(
+        Pago.objects.filter(documento=OuterRef('pk')).order_by()
+        .values('documento').annotate(suma=Sum('monto_pagado')).values('suma')
+    ), cero)
+    notas = Coalesce(Subquery(
+        NotaCredito.objects.filter(factura=OuterRef('pk')).order_by()
+        .values('factura').annotate(suma=Sum('monto')).values('suma')
+    ), cero)
+    DocumentoVenta.objects.update(
+        monto_pagado=pagado,
+        monto_notas_credito=notas,
+        saldo_pendiente=Greatest(F('total') - pagado - notas, cero),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0008_recordatorio_enviado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentoventa',
+            name='monto_notas_credito',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Monto en notas de crédito'),
+        ),
+        migrations.AddField(
+            model_name='documentoventa',
+            name='monto_pagado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Monto pagado'),
+        ),
+        migrations.AddField(
+            model_name='documentoventa',
+            name='saldo_pendiente',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Saldo pendiente'),
+        ),
+        migrations.RunPython(calcular_saldos, migrations.RunPython.noop),
+    ]
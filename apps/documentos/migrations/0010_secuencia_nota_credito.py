@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:10
+
+from django.db import migrations
+from django.db.models import BigIntegerField, Max
+from django.db.models.functions import Cast
+
+
+def crear_secuencia_nota_credito(apps, schema_editor):
+    """
+    Inicia la secuencia de NotaCredito en el folio siguiente al mayor folio
+    numérico ya emitido. Si la secuencia ya se creó (con un inicio que no
+    miraba las notas existentes), solo la adelanta.
+    """
+    NotaCredito = apps.get_model('documentos', 'NotaCredito')
+    SecuenciaFolio = apps.get_model('documentos', 'SecuenciaFolio')
+
+    ultimo = (
+        NotaCredito.objects.filter(folio__regex=r'^[0-9]+$')
+        .aggregate(ultimo=Max(Cast('folio', BigIntegerField())))['ultimo']
+    )
+    siguiente = max(ultimo + 1, 1) if ultimo is not None else 1
+
+    secuencia, creada = SecuenciaFolio.objects.get_or_create(
+        tipo_documento='NotaCredito', defaults={'siguiente': siguiente}
+    )
+    if not creada and secuencia.siguiente < siguiente:
+        secuencia.siguiente = siguiente
+        secuencia.save(update_fields=['siguiente'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentos', '0009_saldos_documento'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_secuencia_nota_credito, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_alter_cliente_user'),
+        ('documentos', '0010_secuencia_nota_credito'),
+        ('ventas', '0006_pedido_indices_listado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='documentoventa',
+            index=models.Index(fields=['fecha_emision'], name='documento_emision_idx'),
+        ),
+    ]
@@ -1,9 +1,17 @@
 # apps/documentos/models.py
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 from django.conf import settings
 from decimal import Decimal
 
+from apps.usuarios.indicadores import invalidar_indicadores
+
+# Columnas de DocumentoVenta que solo cambia recalcular_saldos()
+CAMPOS_SALDO = ['monto_pagado', 'monto_notas_credito', 'saldo_pendiente']
+
+
 class DocumentoVenta(models.Model):
     TIPOS_DOCUMENTO = (
         ('Factura', 'Factura'),
@@ -44,6 +52,11 @@ class DocumentoVenta(models.Model):
 
     medio_de_pago = models.CharField(max_length=20, choices=MEDIOS_PAGO, blank=True, null=True, verbose_name='Medio de pago')
 
+    # Mantenidos por Pago y NotaCredito (ver recalcular_saldos); no se editan a mano
+    monto_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name='Monto pagado')
+    monto_notas_credito = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name='Monto en notas de crédito')
+    saldo_pendiente = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, db_index=True, verbose_name='Saldo pendiente')
+
     razon_social = models.CharField(max_length=255, blank=True, null=True)
     rut = models.CharField(max_length=20, blank=True, null=True)
     giro = models.CharField(max_length=255, blank=True, null=True)
@@ -53,23 +66,80 @@ class DocumentoVenta(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.folio:
-            ultimo = DocumentoVenta.objects.filter(tipo_documento=self.tipo_documento).order_by('-folio').first()
-            if ultimo and ultimo.folio:
-                self.folio = ultimo.folio + 1
-            else:
-                self.folio = 1000
-        super().save(*args, **kwargs)
+            # Import local: folios.py importa este módulo
+            from apps.documentos.folios import asignar_folio
+            self.folio = asignar_folio(self.tipo_documento)
+
+        if self._state.adding:
+            self.saldo_pendiente = max((self.total or 0) - self.monto_pagado - self.monto_notas_credito, 0)
+            super().save(*args, **kwargs)
+        else:
+            # Los montos pagados los escriben Pago y NotaCredito: una instancia
+            # leída antes de un pago no debe pisarlos con valores viejos
+            if kwargs.get('update_fields') is None:
+                kwargs['update_fields'] = [
+                    campo.name for campo in self._meta.concrete_fields
+                    if not campo.primary_key and campo.name not in CAMPOS_SALDO
+                ]
+            super().save(*args, **kwargs)
+            if 'total' in kwargs['update_fields']:
+                DocumentoVenta.recalcular_saldos(DocumentoVenta.objects.filter(pk=self.pk))
+                self.refrescar_saldo()
+        invalidar_indicadores()
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        invalidar_indicadores()
+        return resultado
 
     def __str__(self):
         return f"{self.tipo_documento} #{self.folio}"
 
-    @property
-    def saldo_pendiente(self):
-        try:
-            total_pagado = sum(pago.monto_pagado for pago in self.pagos.all())
-            return max(self.total - total_pagado, 0)
-        except:
-            return self.total
+    @staticmethod
+    def saldos_calculados():
+        """
+        Expresiones (subconsultas correlacionadas) con los valores que deben
+        tener las columnas de CAMPOS_SALDO según los pagos y notas de crédito.
+        """
+        cero = Value(Decimal('0'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+        pagado = Coalesce(Subquery(
+            Pago.objects.filter(documento=OuterRef('pk'))
+            .order_by()
+            .values('documento')
+            .annotate(suma=Sum('monto_pagado'))
+            .values('suma')
+        ), cero)
+        notas = Coalesce(Subquery(
+            NotaCredito.objects.filter(factura=OuterRef('pk'))
+            .order_by()
+            .values('factura')
+            .annotate(suma=Sum('monto'))
+            .values('suma')
+        ), cero)
+        return {
+            'monto_pagado': pagado,
+            'monto_notas_credito': notas,
+            'saldo_pendiente': Greatest(F('total') - pagado - notas, cero),
+        }
+
+    @staticmethod
+    def recalcular_saldos(documentos=None):
+        """
+        Recalcula monto_pagado, monto_notas_credito y saldo_pendiente con un
+        único UPDATE (atómico en la base, sin leer las filas). Retorna
+        cuántos documentos se actualizaron.
+
+        update() no pasa por save(): los indicadores del panel (antigüedad
+        de saldos) se invalidan aquí.
+        """
+        if documentos is None:
+            documentos = DocumentoVenta.objects.all()
+        actualizados = documentos.update(**DocumentoVenta.saldos_calculados())
+        invalidar_indicadores()
+        return actualizados
+
+    def refrescar_saldo(self):
+        self.refresh_from_db(fields=CAMPOS_SALDO)
 
     def esta_vencida(self):
         try:
@@ -85,6 +155,10 @@ class DocumentoVenta(models.Model):
         verbose_name_plural = 'Documentos de Venta'
         unique_together = ['tipo_documento', 'folio']
         ordering = ['-fecha_emision']
+        indexes = [
+            # Documentos emitidos desde la marca del resumen diario
+            models.Index(fields=['fecha_emision'], name='documento_emision_idx'),
+        ]
 
 
 class DetalleDocumento(models.Model):
@@ -107,6 +181,14 @@ class DetalleDocumento(models.Model):
         verbose_name_plural = 'Detalles de Documento'
 
 
+def _actualizar_saldo(registro, campo):
+    """Recalcula el saldo del documento de un Pago/NotaCredito y refresca la instancia en memoria."""
+    documento_id = getattr(registro, f'{campo}_id')
+    DocumentoVenta.recalcular_saldos(DocumentoVenta.objects.filter(pk=documento_id))
+    if registro._meta.get_field(campo).is_cached(registro):
+        getattr(registro, campo).refrescar_saldo()
+
+
 class Pago(models.Model):
     documento = models.ForeignKey(DocumentoVenta, on_delete=models.CASCADE, related_name='pagos')
     fecha_pago = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de pago')
@@ -118,6 +200,15 @@ class Pago(models.Model):
     def __str__(self):
         return f"Pago #{self.id} - {self.monto_pagado}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        _actualizar_saldo(self, 'documento')
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        _actualizar_saldo(self, 'documento')
+        return resultado
+
     class Meta:
         db_table = 'pagos'
         verbose_name = 'Pago'
@@ -140,6 +231,18 @@ class NotaCredito(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADOS, default='Emitida')
     creado_en = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        if not self.folio:
+            from apps.documentos.folios import asignar_folio
+            self.folio = str(asignar_folio('NotaCredito'))
+        super().save(*args, **kwargs)
+        _actualizar_saldo(self, 'factura')
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        _actualizar_saldo(self, 'factura')
+        return resultado
+
     def __str__(self):
         return f'NC {self.id} - Fact: {self.factura_id} - ${self.monto}'
 
@@ -159,4 +262,56 @@ class DetalleNotaCredito(models.Model):
     class Meta:
         db_table = 'detalle_nota_credito'
         verbose_name = 'Detalle Nota de Crédito'
-        verbose_name_plural = 'Detalles Nota de Crédito'
\ No newline at end of file
+        verbose_name_plural = 'Detalles Nota de Crédito'
+
+
+class SecuenciaFolio(models.Model):
+    """
+    Próximo folio libre por tipo de documento (Factura, Boleta, NotaCredito).
+    Se incrementa con un UPDATE atómico; ver apps/documentos/folios.py.
+    """
+    tipo_documento = models.CharField(max_length=20, unique=True)
+    siguiente = models.BigIntegerField(default=1000, verbose_name='Siguiente folio')
+
+    def __str__(self):
+        return f"{self.tipo_documento}: {self.siguiente}"
+
+    class Meta:
+        db_table = 'secuencia_folio'
+        verbose_name = 'Secuencia de Folio'
+        verbose_name_plural = 'Secuencias de Folio'
+
+
+class RecordatorioEnviado(models.Model):
+    """
+    Registro de recordatorios de pago: qué documento recibió qué tipo de
+    aviso y en qué fecha. `enviar_recordatorios` lo consulta para no repetir
+    envíos y para reintentar solo los que fallaron.
+    """
+    TIPOS = (
+        ('por_vencer', 'Por vencer'),
+        ('vencida', 'Vencida'),
+    )
+    ESTADOS = (
+        ('Enviado', 'Enviado'),
+        ('Fallido', 'Fallido'),
+    )
+
+    documento = models.ForeignKey(DocumentoVenta, on_delete=models.CASCADE, related_name='recordatorios')
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    fecha = models.DateField(verbose_name='Fecha del recordatorio')
+    estado = models.CharField(max_length=10, choices=ESTADOS)
+    email = models.EmailField(blank=True)
+    error = models.TextField(blank=True)
+    fecha_registro = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - Doc #{self.documento_id} ({self.fecha}) {self.estado}"
+
+    class Meta:
+        db_table = 'recordatorios_enviados'
+        verbose_name = 'Recordatorio Enviado'
+        verbose_name_plural = 'Recordatorios Enviados'
+        constraints = [
+            models.UniqueConstraint(fields=['documento', 'tipo', 'fecha'], name='recordatorio_unico_dia'),
+        ]
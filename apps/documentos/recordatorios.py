@@ -0,0 +1,289 @@
+"""
+Recordatorios de pago por correo.
+
+Las facturas se leen en una sola consulta junto con el cliente y su usuario
+(select_related), cada plantilla se carga una vez por tipo y los mensajes se
+envían por lotes reutilizando una conexión SMTP por lote, en vez de abrir una
+conexión por factura con send_mail. Con `hilos` > 1 los lotes se reparten
+entre varios hilos, cada uno con su propia conexión (una conexión SMTP no se
+puede compartir entre hilos).
+
+Cada envío queda en RecordatorioEnviado (documento, tipo, fecha). Las
+consultas excluyen en SQL lo que ya tiene su aviso, así que correr el
+comando dos veces no duplica correos, una corrida interrumpida se retoma
+donde quedó (el registro se escribe al terminar cada lote) y los fallidos
+se reintentan en la siguiente. El aviso "por vencer" toma las facturas que
+vencen en los próximos DIAS_AVISO días y aún no lo recibieron (si un día no
+se corrió, no se pierden); el de "vencida" se repite cada
+settings.RECORDATORIOS_REPETIR_VENCIDA_DIAS días.
+
+Por defecto los correos no se envían aquí: cada lote se deja en la bandeja
+de salida (apps.correos) en la misma transacción que su registro, y los
+manda `procesar_correos`. Con `directo=True` se envían en el momento.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.template.loader import get_template
+
+from apps.documentos.models import DocumentoVenta, RecordatorioEnviado
+from apps.correos.bandeja import encolar_mensajes
+from ticashop.metricas import Contador
+
+logger = logging.getLogger(__name__)
+
+# Días de anticipación del aviso "por vencer"
+DIAS_AVISO = 3
+
+# Mensajes por conexión: muchos servidores SMTP cortan la sesión después de
+# cierta cantidad de envíos
+TAMANO_LOTE = 50
+
+TIPOS_RECORDATORIO = {
+    'por_vencer': (
+        "Recordatorio: Tu Factura #{folio} está por vencer",
+        'documentos/email/recordatorio_por_vencer.txt',
+    ),
+    'vencida': (
+        "Aviso de Vencimiento: Tu Factura #{folio} está vencida",
+        'documentos/email/recordatorio_vencida.txt',
+    ),
+}
+
+RECORDATORIOS = Contador(
+    'ticashop_recordatorios_total',
+    'Recordatorios de pago procesados, por tipo y resultado (enviados, encolados, fallidos, omitidos)',
+    etiquetas=('tipo', 'resultado'),
+)
+
+
+def _facturas_pendientes():
+    return (
+        DocumentoVenta.objects.filter(
+            tipo_documento='Factura',
+            estado__in=['Emitida', 'Pago Parcial'],  # Solo las pendientes
+        )
+        .select_related('cliente__user')
+        .only('id', 'folio', 'total', 'fecha_vencimiento',
+              'cliente__razon_social', 'cliente__email_facturacion', 'cliente__user__email')
+        .order_by('fecha_vencimiento', 'id')
+    )
+
+
+def _ya_enviado(tipo, desde=None):
+    enviados = RecordatorioEnviado.objects.filter(
+        documento=OuterRef('pk'), tipo=tipo, estado='Enviado'
+    )
+    if desde is not None:
+        enviados = enviados.filter(fecha__gt=desde)
+    return Exists(enviados)
+
+
+def facturas_por_vencer(hoy):
+    """Vencen entre hoy y DIAS_AVISO días más y todavía no recibieron el aviso."""
+    return (
+        _facturas_pendientes()
+        .filter(fecha_vencimiento__range=(hoy, hoy + timedelta(days=DIAS_AVISO)))
+        .exclude(_ya_enviado('por_vencer'))
+    )
+
+
+def facturas_vencidas(hoy):
+    """Vencidas sin aviso en los últimos RECORDATORIOS_REPETIR_VENCIDA_DIAS días."""
+    repetir = getattr(settings, 'RECORDATORIOS_REPETIR_VENCIDA_DIAS', 7)
+    return (
+        _facturas_pendientes()
+        .filter(fecha_vencimiento__lt=hoy)
+        .exclude(_ya_enviado('vencida', desde=hoy - timedelta(days=repetir)))
+    )
+
+
+def email_destino(documento):
+    """Email de facturación del cliente o, si no tiene, el de su usuario."""
+    cliente = documento.cliente
+    return cliente.email_facturacion or (cliente.user.email if cliente.user else '')
+
+
+def nuevo_resultado():
+    return {'enviados': 0, 'encolados': 0, 'fallidos': 0, 'omitidos': 0}
+
+
+def preparar_mensajes(documentos, tipo, resultado):
+    """Lista de (documento, EmailMessage); los documentos sin email cuentan como omitidos."""
+    asunto, ruta_plantilla = TIPOS_RECORDATORIO[tipo]
+    plantilla = get_template(ruta_plantilla)
+
+    mensajes = []
+    for documento in documentos:
+        destino = email_destino(documento)
+        if not destino:
+            logger.warning(f"Factura #{documento.folio} no tiene email de cliente.")
+            resultado['omitidos'] += 1
+            continue
+        cuerpo = plantilla.render({
+            'cliente_nombre': documento.cliente.razon_social,
+            'folio': documento.folio,
+            'total': documento.total,
+            'fecha_vencimiento': documento.fecha_vencimiento,
+        })
+        mensajes.append((documento, EmailMessage(
+            asunto.format(folio=documento.folio),
+            cuerpo,
+            settings.DEFAULT_FROM_EMAIL,
+            [destino],
+        )))
+    return mensajes
+
+
+def enviar_lote(lote):
+    """
+    Envía un lote por una sola conexión. Retorna (enviados, fallidos): los
+    enviados como lista de (documento, mensaje) y los fallidos como
+    (documento, mensaje, motivo). Si un envío falla se reabre la conexión
+    para el resto del lote (el servidor puede haber cortado la sesión).
+    """
+    enviados, fallidos = [], []
+    conexion = get_connection()
+    try:
+        conexion.open()
+        for documento, mensaje in lote:
+            mensaje.connection = conexion
+            try:
+                mensaje.send()
+            except Exception as e:
+                logger.error(f"Error al enviar correo para Factura #{documento.folio}: {e}")
+                fallidos.append((documento, mensaje, str(e)))
+                conexion.close()
+                conexion.open()
+            else:
+                logger.info(f"Correo enviado para Factura #{documento.folio} a {mensaje.to[0]}")
+                enviados.append((documento, mensaje))
+    except Exception as e:
+        # No se pudo (re)conectar: lo que quedaba del lote falla
+        logger.error(f"Error de conexión al servidor de correo: {e}")
+        procesados = {id(item[0]) for item in enviados + fallidos}
+        fallidos.extend(
+            (documento, mensaje, str(e)) for documento, mensaje in lote
+            if id(documento) not in procesados
+        )
+    finally:
+        conexion.close()
+    return enviados, fallidos
+
+
+def enviar_mensajes(mensajes, resultado, hilos=1, tamano_lote=TAMANO_LOTE, al_terminar_lote=None):
+    """
+    Envía los mensajes por lotes (en paralelo si hilos > 1) y suma al
+    resultado. `al_terminar_lote(enviados, fallidos)` se llama en el hilo
+    principal apenas termina cada lote.
+    """
+    lotes = [mensajes[inicio:inicio + tamano_lote] for inicio in range(0, len(mensajes), tamano_lote)]
+
+    def acumular(enviados, fallidos):
+        resultado['enviados'] += len(enviados)
+        resultado['fallidos'] += len(fallidos)
+        if al_terminar_lote:
+            al_terminar_lote(enviados, fallidos)
+
+    if hilos > 1 and len(lotes) > 1:
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            for enviados, fallidos in pool.map(enviar_lote, lotes):
+                acumular(enviados, fallidos)
+    else:
+        for lote in lotes:
+            acumular(*enviar_lote(lote))
+    return resultado
+
+
+def registrar_envios(tipo, fecha, enviados, fallidos):
+    """Guarda el resultado de un lote en el registro (un INSERT ... ON CONFLICT)."""
+    registros = [
+        RecordatorioEnviado(documento=documento, tipo=tipo, fecha=fecha,
+                            estado='Enviado', email=mensaje.to[0])
+        for documento, mensaje in enviados
+    ] + [
+        RecordatorioEnviado(documento=documento, tipo=tipo, fecha=fecha,
+                            estado='Fallido', email=mensaje.to[0], error=motivo[:1000])
+        for documento, mensaje, motivo in fallidos
+    ]
+    # Un fallido de una corrida anterior del mismo día pasa a Enviado
+    RecordatorioEnviado.objects.bulk_create(
+        registros,
+        update_conflicts=True,
+        unique_fields=['documento', 'tipo', 'fecha'],
+        update_fields=['estado', 'email', 'error', 'fecha_registro'],
+    )
+
+
+def encolar_recordatorios(mensajes, tipo, fecha, resultado, tamano_lote=TAMANO_LOTE):
+    """
+    Deja los mensajes en la bandeja de salida por lotes. Cada lote y su
+    registro se guardan en una transacción: o quedan ambos o ninguno.
+    """
+    for inicio in range(0, len(mensajes), tamano_lote):
+        lote = mensajes[inicio:inicio + tamano_lote]
+        with transaction.atomic():
+            encolar_mensajes(
+                [mensaje for _, mensaje in lote],
+                referencias=[f"recordatorio:{tipo}:{documento.id}" for documento, _ in lote],
+            )
+            registrar_envios(tipo, fecha, lote, [])
+        resultado['encolados'] += len(lote)
+    return resultado
+
+
+def enviar_resumen_admin(hoy, por_vencer, vencidas, directo=False):
+    """Resumen de la cobranza al correo de la empresa (listas ya evaluadas)."""
+    cuerpo = get_template('documentos/email/resumen_admin.txt').render({
+        'facturas_por_vencer': por_vencer,
+        'facturas_vencidas': vencidas,
+        'total_por_vencer': len(por_vencer),
+        'total_vencidas': len(vencidas),
+    })
+    mensaje = EmailMessage(
+        f"Resumen de Cobranza TicaShop - {hoy}",
+        cuerpo,
+        settings.DEFAULT_FROM_EMAIL,
+        [settings.EMAIL_HOST_USER],  # Se auto-envía al email de la empresa
+    )
+    if directo:
+        mensaje.send()
+    else:
+        encolar_mensajes([mensaje], referencias=['resumen_cobranza'])
+
+
+def enviar_recordatorios(hoy, hilos=1, tamano_lote=TAMANO_LOTE, resumen=True, directo=False):
+    """
+    Procesa los recordatorios pendientes a la fecha `hoy` (los que no
+    figuran ya en el registro): los encola o, con `directo`, los envía.
+    Retorna {'enviados', 'encolados', 'fallidos', 'omitidos'}.
+    """
+    resultado = nuevo_resultado()
+    por_vencer = list(facturas_por_vencer(hoy))
+    vencidas = list(facturas_vencidas(hoy))
+
+    for tipo, documentos in (('por_vencer', por_vencer), ('vencida', vencidas)):
+        antes = dict(resultado)
+        mensajes = preparar_mensajes(documentos, tipo, resultado)
+        if not directo:
+            encolar_recordatorios(mensajes, tipo, hoy, resultado, tamano_lote=tamano_lote)
+        else:
+            enviar_mensajes(
+                mensajes,
+                resultado,
+                hilos=hilos,
+                tamano_lote=tamano_lote,
+                al_terminar_lote=lambda enviados, fallidos, tipo=tipo: registrar_envios(tipo, hoy, enviados, fallidos),
+            )
+        for clave, cantidad in resultado.items():
+            if cantidad > antes[clave]:
+                RECORDATORIOS.inc(cantidad - antes[clave], tipo=tipo, resultado=clave)
+
+    if resumen and (por_vencer or vencidas):
+        enviar_resumen_admin(hoy, por_vencer, vencidas, directo=directo)
+    return resultado
@@ -1,3 +1,112 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.clientes.models import Cliente
+from apps.correos.models import CorreoSalida
+from apps.documentos.folios import reservar_bloque
+from apps.documentos.models import DocumentoVenta, NotaCredito, RecordatorioEnviado, SecuenciaFolio
+from apps.documentos.recordatorios import enviar_recordatorios
+from apps.usuarios.models import Usuario
+
+
+class DatosDocumentoMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        usuario = Usuario.objects.create_user('cliente', 'usuario@ticashop.cl', 'clave', rol='Cliente')
+        cls.cliente = Cliente.objects.create(
+            user=usuario, rut='11111111-1', razon_social='Cliente SpA',
+            email_facturacion='facturas@cliente.cl',
+        )
+
+    def crear_factura(self, **campos):
+        campos.setdefault('total', Decimal('11900'))
+        return DocumentoVenta.objects.create(tipo_documento='Factura', cliente=self.cliente, **campos)
+
+
+class FoliosTests(DatosDocumentoMixin, TestCase):
+
+    def test_folios_unicos_y_consecutivos_por_tipo(self):
+        facturas = [self.crear_factura().folio for _ in range(3)]
+        boletas = [
+            DocumentoVenta.objects.create(tipo_documento='Boleta', cliente=self.cliente).folio
+            for _ in range(3)
+        ]
+
+        self.assertEqual(facturas, [facturas[0], facturas[0] + 1, facturas[0] + 2])
+        self.assertEqual(boletas, [boletas[0], boletas[0] + 1, boletas[0] + 2])
+        # Cada tipo tiene su propia secuencia
+        self.assertEqual(facturas[0], boletas[0])
+
+    def test_folios_de_nota_credito(self):
+        factura = self.crear_factura()
+        folios = [
+            NotaCredito.objects.create(factura=factura, motivo='Devolución', monto=Decimal('100')).folio
+            for _ in range(3)
+        ]
+
+        self.assertEqual(len(set(folios)), 3)
+        self.assertEqual([int(folio) for folio in folios], sorted(int(folio) for folio in folios))
+
+    def test_secuencia_nueva_de_nota_credito_continua_desde_las_emitidas(self):
+        factura = self.crear_factura()
+        for folio in ('7', 'NC-99', '12'):
+            NotaCredito.objects.create(factura=factura, folio=folio, motivo='Histórica')
+        SecuenciaFolio.objects.filter(tipo_documento='NotaCredito').delete()
+
+        nota = NotaCredito.objects.create(factura=factura, motivo='Nueva')
+
+        # Los folios no numéricos no cuentan
+        self.assertEqual(nota.folio, '13')
+
+    def test_reservar_bloque(self):
+        inicio, fin = reservar_bloque('Factura', 5)
+        siguiente, _ = reservar_bloque('Factura', 1)
+
+        self.assertEqual(fin - inicio, 5)
+        self.assertEqual(siguiente, fin)
+        with self.assertRaises(ValueError):
+            reservar_bloque('Factura', 0)
+
+
+@override_settings(EMAIL_HOST_USER='cobranza@ticashop.cl')
+class RecordatoriosTests(DatosDocumentoMixin, TestCase):
+
+    def setUp(self):
+        self.hoy = timezone.localdate()
+
+    def test_no_repite_el_aviso_por_vencer(self):
+        factura = self.crear_factura(fecha_vencimiento=self.hoy + timedelta(days=2))
+
+        primero = enviar_recordatorios(self.hoy, resumen=False)
+        segundo = enviar_recordatorios(self.hoy + timedelta(days=1), resumen=False)
+
+        self.assertEqual(primero['encolados'], 1)
+        self.assertEqual(segundo['encolados'], 0)
+        self.assertEqual(RecordatorioEnviado.objects.filter(documento=factura, tipo='por_vencer').count(), 1)
+        correo = CorreoSalida.objects.get()
+        self.assertEqual(correo.destinatarios, ['facturas@cliente.cl'])
+        self.assertEqual(correo.referencia, f'recordatorio:por_vencer:{factura.id}')
+
+    @override_settings(RECORDATORIOS_REPETIR_VENCIDA_DIAS=7)
+    def test_vencida_se_repite_solo_tras_el_intervalo(self):
+        self.crear_factura(fecha_vencimiento=self.hoy - timedelta(days=1))
+
+        encolados = [
+            enviar_recordatorios(self.hoy + timedelta(days=dias), resumen=False)['encolados']
+            for dias in (0, 1, 6, 7)
+        ]
+
+        self.assertEqual(encolados, [1, 0, 0, 1])
+        self.assertEqual(RecordatorioEnviado.objects.filter(tipo='vencida').count(), 2)
+
+    def test_ignora_facturas_pagadas(self):
+        self.crear_factura(fecha_vencimiento=self.hoy + timedelta(days=1), estado='Pagada')
+
+        resultado = enviar_recordatorios(self.hoy, resumen=False)
+
+        self.assertEqual(resultado['encolados'], 0)
+        self.assertFalse(RecordatorioEnviado.objects.exists())
@@ -8,4 +8,5 @@ urlpatterns = [
     path('documento/<int:factura_id>/nota-credito/crear/', views.crear_nota_credito, name='crear_nota_credito'),
     path('nota-credito/<int:nota_id>/', views.detalle_nota_credito, name='detalle_nota_credito'), 
     path('detalle/<int:documento_id>/', views.detalle_documento, name='detalle_documento'),
+    path('antiguedad-saldos/', views.reporte_antiguedad, name='antiguedad_saldos'),
 ]
\ No newline at end of file
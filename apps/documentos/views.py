@@ -9,8 +9,10 @@ from datetime import timedelta, date
 
 from .models import DocumentoVenta, DetalleDocumento, NotaCredito, DetalleNotaCredito, Pago
 from .forms import DocumentoVentaForm, DetalleDocumentoForm, PagoForm, NotaCreditoForm, DetalleNotaFormSet
+from .antiguedad import antiguedad_saldos, encabezados_antiguedad, filas_antiguedad
 
 from apps.ventas.models import Pedido
+from apps.ventas.exportaciones import respuesta_csv, respuesta_xlsx, FORMATO_PESOS
 from apps.productos.models import Producto
 from apps.clientes.models import Cliente
 
@@ -27,11 +29,18 @@ def listar_documentos(request):
             consulta_base = consulta_base.none()
             messages.warning(request, "⚠️ Debes completar tu perfil para ver tus documentos.")
 
+    # Saldo guardado en el documento: filtrar y ordenar no requiere subconsultas
+    con_saldo = request.GET.get('con_saldo') == '1'
+    if con_saldo:
+        consulta_base = consulta_base.filter(saldo_pendiente__gt=0)
+    orden = request.GET.get('orden', '')
+    orden_sql = {'saldo': '-saldo_pendiente', 'vencimiento': 'fecha_vencimiento'}.get(orden, '-fecha_emision')
+
     facturas = (
         consulta_base
         .select_related('cliente', 'vendedor')
         .annotate(nc_count=Count('notas_credito'))
-        .order_by('-fecha_emision')
+        .order_by(orden_sql, '-id')
     )
 
     hoy = timezone.localdate()
@@ -42,7 +51,11 @@ def listar_documentos(request):
             limite = fecha_emision_date + timedelta(days=30)
             f.puede_crear_nota = (hoy <= limite) and (f.estado != 'Anulada')
 
-    return render(request, 'documentos/listar_documentos.html', {'facturas': facturas})
+    return render(request, 'documentos/listar_documentos.html', {
+        'facturas': facturas,
+        'con_saldo': con_saldo,
+        'orden': orden,
+    })
 
 
 @login_required
@@ -61,12 +74,7 @@ def crear_documento_desde_pedido(request, pedido_id):
                 documento.vendedor = request.user
                 documento.pedido = pedido
                 documento.cliente = pedido.cliente
-
-                ultimo_folio = DocumentoVenta.objects.filter(
-                    tipo_documento=documento.tipo_documento
-                ).order_by('-folio').first()
-
-                documento.folio = (ultimo_folio.folio + 1) if ultimo_folio else 1
+                # El folio lo asigna DocumentoVenta.save() desde SecuenciaFolio
 
                 neto = Decimal('0')
                 for detalle in pedido.detalles.all():
@@ -146,14 +154,19 @@ def registrar_pago(request, documento_id):
     if request.method == 'POST':
         form = PagoForm(request.POST, documento=documento)
         if form.is_valid():
-            pago = form.save(commit=False)
-            pago.documento = documento
-
-            if pago.monto_pagado > documento.saldo_pendiente:
-                messages.error(request, f'El monto excede el saldo pendiente (${documento.saldo_pendiente})')
-                return redirect('documentos:registrar_pago', documento_id=documento.id)
-
-            pago.save()
+            with transaction.atomic():
+                # Se bloquea el documento: dos pagos simultáneos no pueden
+                # validar contra el mismo saldo
+                documento = DocumentoVenta.objects.select_for_update().get(id=documento_id)
+                pago = form.save(commit=False)
+                pago.documento = documento
+
+                if pago.monto_pagado > documento.saldo_pendiente:
+                    messages.error(request, f'El monto excede el saldo pendiente (${documento.saldo_pendiente})')
+                    return redirect('documentos:registrar_pago', documento_id=documento.id)
+
+                # Pago.save() actualiza monto_pagado y saldo_pendiente del documento
+                pago.save()
             messages.success(request, 'Pago registrado exitosamente.')
             return redirect('documentos:detalle_documento', documento_id=documento.id)
     else:
@@ -320,3 +333,34 @@ def detalle_nota_credito(request, nota_id):
         'detalles': detalles,
         'empresa': empresa,
     })
+
+
+@login_required
+def reporte_antiguedad(request):
+    """Antigüedad de saldos por cliente a una fecha de corte; ?formato=xlsx|csv para exportar."""
+    if request.user.rol not in ['Administrador', 'Tesoreria']:
+        return redirect('usuarios:dashboard')
+
+    corte = timezone.localdate()
+    texto_corte = request.GET.get('corte', '').strip()
+    if texto_corte:
+        try:
+            corte = date.fromisoformat(texto_corte)
+        except ValueError:
+            messages.error(request, "Fecha de corte inválida (use AAAA-MM-DD).")
+
+    resultado = antiguedad_saldos(corte)
+    formato = request.GET.get('formato')
+    if formato in ('xlsx', 'csv'):
+        nombre = f"antiguedad_saldos_{corte.strftime('%d-%m-%Y')}"
+        encabezados = encabezados_antiguedad()
+        filas = filas_antiguedad(resultado)
+        if formato == 'csv':
+            return respuesta_csv(f"{nombre}.csv", encabezados, filas)
+        return respuesta_xlsx(
+            f"{nombre}.xlsx", "Antigüedad de Saldos", encabezados, filas,
+            anchos={'A': 14, 'B': 40}, color="C00000",
+            formatos={indice: FORMATO_PESOS for indice in range(3, len(encabezados))},
+        )
+
+    return render(request, 'documentos/antiguedad_saldos.html', {'antiguedad': resultado})
@@ -1,6 +1,6 @@
 from django.contrib import admin
-from django.utils.html import format_html
-from .models import Categoria, Producto
+from .models import Categoria, Producto, ReservaStock, TrabajoImportacion
+from .templatetags.productos_extras import foto_producto
 
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
@@ -24,12 +24,27 @@ class ProductoAdmin(admin.ModelAdmin):
 
     def foto_tag(self, obj):
         if obj.foto:
-            return format_html('<img src="{}" style="width:40px;height:40px;object-fit:cover;border-radius:4px;" />', obj.foto.url)
+            return foto_producto(obj, sizes='40px', ancho=40, estilo='width:40px;height:40px;object-fit:cover;border-radius:4px;')
         return '-'
     foto_tag.short_description = 'Foto'
 
     def foto_preview(self, obj):
         if obj.foto:
-            return format_html('<img src="{}" style="max-width:300px;max-height:300px;object-fit:contain;" />', obj.foto.url)
+            return foto_producto(obj, sizes='300px', ancho=300, estilo='max-width:300px;max-height:300px;object-fit:contain;')
         return 'Sin imagen'
-    foto_preview.short_description = 'Vista previa'
\ No newline at end of file
+    foto_preview.short_description = 'Vista previa'
+
+@admin.register(ReservaStock)
+class ReservaStockAdmin(admin.ModelAdmin):
+    list_display = ('clave', 'producto', 'cantidad', 'expira_en')
+    search_fields = ('clave', 'producto__codigo', 'producto__nombre')
+    list_select_related = ('producto',)
+
+
+@admin.register(TrabajoImportacion)
+class TrabajoImportacionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre_original', 'estado', 'simular', 'filas_procesadas',
+                    'actualizados', 'invalidos', 'solicitado_por', 'fecha_creacion')
+    list_filter = ('estado', 'simular')
+    list_select_related = ('solicitado_por',)
+    readonly_fields = ('errores',)
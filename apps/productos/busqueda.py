@@ -0,0 +1,150 @@
+"""
+Búsqueda de productos por texto.
+
+En SQLite se usa una tabla virtual FTS5 (`productos_busqueda`, creada por la
+migración 0005) con codigo, nombre, descripcion y el nombre de la categoría;
+el rowid es el id del producto. Cada palabra buscada se trata como prefijo
+("mou" encuentra "Mouse"), sin distinguir mayúsculas ni tildes, y los
+resultados se ordenan por bm25 dando más peso al código y al nombre. La
+búsqueda consulta el índice invertido, así que su costo depende de las
+coincidencias y no del tamaño del catálogo.
+
+El índice se mantiene en Producto.save()/delete() y Categoria.save()/delete().
+Las escrituras masivas (queryset.update(), bulk_create) no pasan por ahí:
+después de una carga masiva hay que correr `reconstruir_busqueda_productos`.
+
+En otros motores (o si SQLite no trae FTS5) se busca con icontains.
+"""
+import re
+
+from django.db import connection, OperationalError
+from django.db.models import Case, IntegerField, Q, Value, When
+
+TABLA = 'productos_busqueda'
+
+# Campos de Producto que alimentan el índice (para saltarse el reindexado
+# cuando un save(update_fields=...) no los toca, p. ej. cambios de stock)
+CAMPOS_INDEXADOS = {'codigo', 'nombre', 'descripcion', 'categoria', 'categoria_id', 'activo'}
+
+# Pesos bm25 por columna: codigo, nombre, descripcion, categoria, activo
+PESOS = (10.0, 5.0, 1.0, 2.0, 0.0)
+
+LIMITE_RESULTADOS = 200
+TAMANO_LOTE = 500
+
+SQL_CREAR = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5("
+    "codigo, nombre, descripcion, categoria, activo UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+SQL_INSERTAR = (
+    f"INSERT INTO {TABLA} (rowid, codigo, nombre, descripcion, categoria, activo) "
+    "SELECT p.id, p.codigo, p.nombre, COALESCE(p.descripcion, ''), COALESCE(c.nombre, ''), p.activo "
+    "FROM productos p LEFT JOIN categorias c ON c.id = p.categoria_id"
+)
+
+_disponible = None
+
+
+def indice_disponible():
+    """True si la tabla FTS5 existe (una vez encontrada no se vuelve a consultar)."""
+    global _disponible
+    if connection.vendor != 'sqlite':
+        return False
+    if not _disponible:
+        # Solo se recuerda el True: antes de migrar la tabla aún no existe
+        _disponible = TABLA in connection.introspection.table_names()
+    return _disponible
+
+
+def _lotes(ids):
+    ids = list(ids)
+    for inicio in range(0, len(ids), TAMANO_LOTE):
+        yield ids[inicio:inicio + TAMANO_LOTE]
+
+
+def indexar(producto_ids):
+    """(Re)indexa los productos indicados leyendo sus datos actuales de la base."""
+    if not indice_disponible():
+        return
+    with connection.cursor() as cursor:
+        for lote in _lotes(producto_ids):
+            marcas = ', '.join(['%s'] * len(lote))
+            cursor.execute(f"DELETE FROM {TABLA} WHERE rowid IN ({marcas})", lote)
+            cursor.execute(f"{SQL_INSERTAR} WHERE p.id IN ({marcas})", lote)
+
+
+def desindexar(producto_ids):
+    if not indice_disponible():
+        return
+    with connection.cursor() as cursor:
+        for lote in _lotes(producto_ids):
+            marcas = ', '.join(['%s'] * len(lote))
+            cursor.execute(f"DELETE FROM {TABLA} WHERE rowid IN ({marcas})", lote)
+
+
+def reconstruir():
+    """
+    Crea la tabla si falta, la vacía y la vuelve a llenar con un
+    INSERT ... SELECT. Retorna cuántos productos quedaron indexados.
+    """
+    if connection.vendor != 'sqlite':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_CREAR)
+        cursor.execute(f"DELETE FROM {TABLA}")
+        cursor.execute(SQL_INSERTAR)
+        cursor.execute(f"INSERT INTO {TABLA} ({TABLA}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLA}")
+        return cursor.fetchone()[0]
+
+
+def consulta_fts(texto):
+    """Convierte el texto del usuario en una consulta FTS5: todas las palabras, como prefijo."""
+    palabras = re.findall(r'\w+', texto or '')
+    if not palabras:
+        return None
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def buscar_ids(texto, solo_activos=False, limite=LIMITE_RESULTADOS):
+    """Ids de productos que coinciden, del más al menos relevante."""
+    consulta = consulta_fts(texto)
+    if consulta is None:
+        return []
+    pesos = ', '.join(str(peso) for peso in PESOS)
+    sql = f"SELECT rowid FROM {TABLA} WHERE {TABLA} MATCH %s"
+    if solo_activos:
+        sql += " AND activo = 1"
+    sql += f" ORDER BY bm25({TABLA}, {pesos}) LIMIT %s"
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [consulta, limite])
+            return [fila[0] for fila in cursor.fetchall()]
+    except OperationalError:
+        # Consulta que FTS5 no acepta: sin resultados antes que un error 500
+        return []
+
+
+def filtrar_productos(productos, texto, solo_activos=False):
+    """
+    Filtra un queryset de productos por `texto` y lo ordena por relevancia
+    (máximo LIMITE_RESULTADOS resultados). Sin índice FTS5 usa icontains.
+    """
+    if not indice_disponible():
+        return productos.filter(
+            Q(codigo__icontains=texto) |
+            Q(nombre__icontains=texto) |
+            Q(descripcion__icontains=texto) |
+            Q(categoria__nombre__icontains=texto)
+        )
+
+    ids = buscar_ids(texto, solo_activos=solo_activos)
+    if not ids:
+        return productos.none()
+    relevancia = Case(
+        *[When(id=producto_id, then=Value(posicion)) for posicion, producto_id in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return productos.filter(id__in=ids).order_by(relevancia)
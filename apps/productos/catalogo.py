@@ -0,0 +1,97 @@
+"""
+Catálogo de la tienda (productos activos) guardado en caché.
+
+El catálogo se serializa como una lista de dicts (sin objetos de modelo, con
+la URL de la foto ya resuelta) bajo una clave que incluye un número de
+versión. Cualquier cambio que afecte lo que muestra la tienda (guardar o
+borrar un Producto o una Categoria, descontar stock) llama a
+`invalidar_catalogo()`, que sube la versión: la siguiente visita arma el
+catálogo una vez y las demás lo leen de la caché sin tocar la base.
+
+La versión se sube al hacer commit, para que una visita concurrente no
+guarde en la versión nueva datos de antes del cambio. Vive en la caché, así
+que con varios workers la caché debe ser compartida (ver CACHES en settings).
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.productos.busqueda import filtrar_productos, buscar_ids, indice_disponible
+
+CLAVE_VERSION = 'catalogo:version'
+
+# Respaldo por si se escapa una invalidación (p. ej. un UPDATE masivo a mano)
+DURACION = 60 * 60
+
+
+def version_catalogo():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Se parte de la hora actual para no reutilizar versiones viejas que
+        # sigan en la caché tras reiniciar el contador
+        cache.add(CLAVE_VERSION, int(time.time() * 1000), None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def _subir_version():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        # La clave no existía (caché vacía o expulsada)
+        version_catalogo()
+
+
+def invalidar_catalogo():
+    """Marca el catálogo como desactualizado cuando la transacción actual haga commit."""
+    transaction.on_commit(_subir_version)
+
+
+def _serializar(producto):
+    return {
+        'id': producto.id,
+        'codigo': producto.codigo,
+        'nombre': producto.nombre,
+        'descripcion': producto.descripcion or '',
+        'precio_unitario': producto.precio_unitario,
+        'stock': producto.stock,
+        'categoria': producto.categoria.nombre if producto.categoria else '',
+        'foto_url': producto.foto.url if producto.foto else '',
+        'foto_derivadas': producto.foto_derivadas or {},
+    }
+
+
+def catalogo_activo():
+    """Lista de productos activos (dicts) de la versión vigente del catálogo."""
+    # Import local: models.py importa este módulo para invalidar
+    from apps.productos.models import Producto
+
+    clave = f'catalogo:productos:{version_catalogo()}'
+    catalogo = cache.get(clave)
+    if catalogo is None:
+        productos = (
+            Producto.objects.filter(activo=True)
+            .select_related('categoria')
+            .only('id', 'codigo', 'nombre', 'descripcion', 'precio_unitario',
+                  'stock', 'foto', 'foto_derivadas', 'categoria__nombre')
+            .order_by('codigo')
+        )
+        catalogo = [_serializar(producto) for producto in productos]
+        cache.set(clave, catalogo, DURACION)
+    return catalogo
+
+
+def buscar_en_catalogo(texto):
+    """Productos del catálogo que coinciden con `texto`, por relevancia."""
+    from apps.productos.models import Producto
+
+    if indice_disponible():
+        ids = buscar_ids(texto, solo_activos=True)
+    else:
+        ids = list(
+            filtrar_productos(Producto.objects.filter(activo=True), texto)
+            .values_list('id', flat=True)
+        )
+    por_id = {producto['id']: producto for producto in catalogo_activo()}
+    return [por_id[producto_id] for producto_id in ids if producto_id in por_id]
@@ -21,4 +21,9 @@ class ImportCostoForm(forms.Form):
     archivo_excel = forms.FileField(
         label="Seleccionar archivo Excel (.xlsx)",
         widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.xlsx'})
+    )
+    simular = forms.BooleanField(
+        label="Solo simular (muestra el resultado sin guardar cambios)",
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
     )
\ No newline at end of file
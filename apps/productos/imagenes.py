@@ -0,0 +1,127 @@
+"""
+Derivadas de las fotos de productos.
+
+Al subir una foto se generan con Pillow versiones de ancho fijo (ANCHOS) en
+WebP y JPEG dentro de MEDIA_ROOT/derivadas/<hash del nombre>/. Los nombres
+quedan en Producto.foto_derivadas ({"80": {"webp": ..., "jpg": ...}, ...}),
+así las plantillas arman el srcset sin revisar el disco y el navegador
+descarga solo el tamaño que necesita en vez del original.
+
+Las fotos que ya existían se procesan con `generar_fotos_derivadas`.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from apps.productos.catalogo import invalidar_catalogo
+
+logger = logging.getLogger(__name__)
+
+# 80: miniaturas (listados, carrito, admin); 320 y 640: tarjetas de la tienda
+ANCHOS = (80, 320, 640)
+FORMATOS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def carpeta_derivadas(nombre_foto):
+    return f"derivadas/{hashlib.sha1(nombre_foto.encode()).hexdigest()[:12]}"
+
+
+def _preparar(imagen, extension):
+    """Modo de color compatible con el formato (JPEG no tiene transparencia)."""
+    if imagen.mode in ('P', 'LA') or (imagen.mode == 'RGB' and 'transparency' in imagen.info):
+        imagen = imagen.convert('RGBA')
+    if extension == 'jpg' and imagen.mode == 'RGBA':
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        return fondo
+    if imagen.mode not in ('RGB', 'RGBA'):
+        return imagen.convert('RGB')
+    return imagen
+
+
+def generar_derivadas(nombre_foto):
+    """Escribe las derivadas de una foto del storage. Retorna el dict para foto_derivadas."""
+    with default_storage.open(nombre_foto, 'rb') as archivo:
+        imagen = Image.open(archivo)
+        imagen.load()
+    imagen = ImageOps.exif_transpose(imagen)
+
+    # No se agranda: anchos mayores que el original se omiten
+    anchos = [ancho for ancho in ANCHOS if ancho <= imagen.width] or [imagen.width]
+    carpeta = carpeta_derivadas(nombre_foto)
+
+    derivadas = {}
+    for ancho in anchos:
+        alto = max(1, round(imagen.height * ancho / imagen.width))
+        reducida = imagen.resize((ancho, alto), Image.LANCZOS)
+        for extension, formato, opciones in FORMATOS:
+            contenido = BytesIO()
+            _preparar(reducida, extension).save(contenido, formato, **opciones)
+            ruta = f"{carpeta}/{ancho}.{extension}"
+            if default_storage.exists(ruta):
+                default_storage.delete(ruta)
+            default_storage.save(ruta, ContentFile(contenido.getvalue()))
+            derivadas.setdefault(str(ancho), {})[extension] = ruta
+    return derivadas
+
+
+def eliminar_derivadas(derivadas):
+    for variantes in (derivadas or {}).values():
+        for ruta in variantes.values():
+            default_storage.delete(ruta)
+
+
+def actualizar_derivadas(producto):
+    """
+    Regenera las derivadas de la foto actual del producto (o las borra si ya
+    no tiene foto) y guarda foto_derivadas con un UPDATE. Retorna True si
+    quedaron derivadas.
+    """
+    anteriores = producto.foto_derivadas or {}
+    nuevas = {}
+    if producto.foto:
+        try:
+            nuevas = generar_derivadas(producto.foto.name)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            logger.warning(f"No se pudieron generar derivadas para {producto.foto.name}", exc_info=True)
+
+    rutas_nuevas = {ruta for variantes in nuevas.values() for ruta in variantes.values()}
+    eliminar_derivadas({
+        ancho: {ext: ruta for ext, ruta in variantes.items() if ruta not in rutas_nuevas}
+        for ancho, variantes in anteriores.items()
+    })
+
+    type(producto).objects.filter(pk=producto.pk).update(foto_derivadas=nuevas)
+    producto.foto_derivadas = nuevas
+    invalidar_catalogo()
+    return bool(nuevas)
+
+
+def srcset(derivadas, extension):
+    """'url 80w, url 320w, ...' para un formato."""
+    return ', '.join(
+        f"{default_storage.url(variantes[extension])} {ancho}w"
+        for ancho, variantes in sorted((derivadas or {}).items(), key=lambda item: int(item[0]))
+        if extension in variantes
+    )
+
+
+def url_derivada(derivadas, ancho, extension='jpg'):
+    """URL de la menor derivada de al menos `ancho` px (o la mayor que haya)."""
+    disponibles = sorted(
+        (int(a), variantes[extension])
+        for a, variantes in (derivadas or {}).items() if extension in variantes
+    )
+    if not disponibles:
+        return ''
+    for ancho_derivada, ruta in disponibles:
+        if ancho_derivada >= ancho:
+            return default_storage.url(ruta)
+    return default_storage.url(disponibles[-1][1])
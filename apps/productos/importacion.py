@@ -0,0 +1,189 @@
+"""
+Importación masiva de costos y precios desde Excel.
+
+La planilla se lee en modo read-only de openpyxl (fila por fila, sin cargar
+el libro completo). Las filas se validan y convierten en una sola pasada y se
+procesan por lotes: un SELECT ... WHERE codigo IN (...) por lote y una
+actualización en bloque de los productos que realmente cambian. Con `simular=True` se
+arma el mismo reporte sin escribir nada.
+
+Formato: fila 1 de encabezados; columna A = CODIGO, B = COSTO_NETO,
+C = PRECIO_VENTA (B y C opcionales: una celda vacía no modifica ese valor).
+"""
+from decimal import Decimal, InvalidOperation
+
+import openpyxl
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.productos.models import Producto
+from apps.productos.catalogo import invalidar_catalogo
+
+TAMANO_LOTE = 1000
+
+# Límite de DecimalField(max_digits=10, decimal_places=2)
+MONTO_MAXIMO = Decimal('99999999.99')
+
+
+class ValorInvalido(ValueError):
+    pass
+
+
+def nuevo_resultado(simular=False):
+    return {
+        'simulacion': simular,
+        'filas': 0,
+        'actualizados': [],
+        'sin_cambios': [],
+        'no_encontrados': [],
+        'invalidos': [],  # (número de fila, código, motivo)
+    }
+
+
+def normalizar_codigo(valor):
+    """Código como texto; 1001.0 (celda numérica) se lee como '1001'."""
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def convertir_monto(valor):
+    """Decimal con 2 decimales, None si la celda está vacía. Lanza ValorInvalido."""
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        return None
+    texto = str(valor).strip().replace('$', '').replace(' ', '')
+    if ',' in texto and '.' not in texto:
+        texto = texto.replace(',', '.')
+    try:
+        monto = Decimal(texto)
+        if not monto.is_finite():
+            raise InvalidOperation
+        monto = monto.quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValorInvalido(f"'{valor}' no es un número")
+    if monto < 0:
+        raise ValorInvalido(f"{monto} es negativo")
+    if monto > MONTO_MAXIMO:
+        raise ValorInvalido(f"{monto} excede el máximo permitido")
+    return monto
+
+
+def leer_filas(archivo):
+    """Genera (número de fila, valores) desde la fila 2 de la hoja activa."""
+    wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for numero, fila in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2):
+            yield numero, fila
+    finally:
+        wb.close()
+
+
+def contar_filas(archivo):
+    """Filas de datos según la dimensión guardada en la hoja (None si no la trae)."""
+    wb = openpyxl.load_workbook(archivo, read_only=True)
+    try:
+        maximo = wb.active.max_row
+    finally:
+        wb.close()
+    return max(maximo - 1, 0) if maximo else None
+
+
+def _aplicar_lote(lote, resultado, simular):
+    """lote = {codigo: (costo, precio)}. Un SELECT y, si hay cambios, un UPDATE en bloque."""
+    productos = Producto.objects.filter(codigo__in=lote.keys()).only(
+        'id', 'codigo', 'costo_unitario', 'precio_unitario'
+    )
+    encontrados = set()
+    cambiados = []
+    ahora = timezone.now()
+
+    for producto in productos:
+        encontrados.add(producto.codigo)
+        costo, precio = lote[producto.codigo]
+        cambia = False
+        if costo is not None and costo != producto.costo_unitario:
+            producto.costo_unitario = costo
+            cambia = True
+        if precio is not None and precio != producto.precio_unitario:
+            producto.precio_unitario = precio
+            cambia = True
+
+        if cambia:
+            producto.fecha_actualizacion = ahora
+            cambiados.append(producto)
+            resultado['actualizados'].append(producto.codigo)
+        else:
+            resultado['sin_cambios'].append(producto.codigo)
+
+    resultado['no_encontrados'].extend(codigo for codigo in lote if codigo not in encontrados)
+
+    if cambiados and not simular:
+        actualizar_en_bloque(cambiados, ['costo_unitario', 'precio_unitario', 'fecha_actualizacion'])
+
+
+def actualizar_en_bloque(productos, campos):
+    """
+    UPDATE ... WHERE id = %s preparado una vez y ejecutado con executemany.
+    Equivale a bulk_update, pero sin armar un CASE WHEN por fila en Python
+    (con bulk_update, 13 mil productos tardaban ~10 s solo en construir SQL).
+    Los valores pasan por get_db_prep_save, igual que en save().
+    """
+    campos = [Producto._meta.get_field(nombre) for nombre in campos]
+    quote = connection.ops.quote_name
+    sql = (
+        f"UPDATE {quote(Producto._meta.db_table)} SET "
+        + ', '.join(f"{quote(campo.column)} = %s" for campo in campos)
+        + f" WHERE {quote(Producto._meta.pk.column)} = %s"
+    )
+    parametros = [
+        [campo.get_db_prep_save(getattr(producto, campo.attname), connection) for campo in campos]
+        + [producto.pk]
+        for producto in productos
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, parametros)
+
+
+def importar_costos(archivo, simular=False, tamano_lote=TAMANO_LOTE, al_avanzar=None):
+    """
+    Importa la planilla y retorna el reporte (ver nuevo_resultado). Cada lote
+    se aplica en su propia transacción; `al_avanzar(resultado)` se llama
+    después de cada lote (para mostrar progreso).
+    """
+    resultado = nuevo_resultado(simular)
+    lote = {}
+
+    for numero, fila in leer_filas(archivo):
+        if not fila or not normalizar_codigo(fila[0]):
+            continue
+        resultado['filas'] += 1
+        codigo = normalizar_codigo(fila[0])
+        try:
+            costo = convertir_monto(fila[1] if len(fila) > 1 else None)
+            precio = convertir_monto(fila[2] if len(fila) > 2 else None)
+        except ValorInvalido as e:
+            resultado['invalidos'].append((numero, codigo, str(e)))
+            continue
+        if costo is None and precio is None:
+            resultado['invalidos'].append((numero, codigo, "sin costo ni precio"))
+            continue
+
+        # Si un código se repite, gana la última fila
+        lote[codigo] = (costo, precio)
+        if len(lote) >= tamano_lote:
+            _aplicar_lote(lote, resultado, simular)
+            lote = {}
+            if al_avanzar:
+                al_avanzar(resultado)
+
+    if lote:
+        _aplicar_lote(lote, resultado, simular)
+        if al_avanzar:
+            al_avanzar(resultado)
+
+    if resultado['actualizados'] and not simular:
+        # La actualización en bloque no pasa por Producto.save()
+        invalidar_catalogo()
+    return resultado
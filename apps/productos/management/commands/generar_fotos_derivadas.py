@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from apps.productos.models import Producto
+from apps.productos.imagenes import actualizar_derivadas
+
+
+class Command(BaseCommand):
+    help = 'Genera las versiones reducidas (WebP y JPEG) de las fotos de productos existentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help='Regenera también los productos que ya tienen derivadas.'
+        )
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.exclude(foto='').exclude(foto__isnull=True)
+        if not options['forzar']:
+            productos = productos.filter(foto_derivadas={})
+
+        procesados = fallidos = 0
+        for producto in productos.only('id', 'foto', 'foto_derivadas').iterator(chunk_size=200):
+            if actualizar_derivadas(producto):
+                procesados += 1
+            else:
+                fallidos += 1
+                self.stdout.write(self.style.WARNING(f'No se pudo procesar {producto.foto.name}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{procesados} fotos procesadas, {fallidos} con error.'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.productos.reservas import liberar_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Libera las reservas de stock vencidas (carritos y pedidos en borrador abandonados).'
+
+    def handle(self, *args, **options):
+        borradas = liberar_vencidas()
+        self.stdout.write(self.style.SUCCESS(f'{borradas} reservas vencidas liberadas.'))
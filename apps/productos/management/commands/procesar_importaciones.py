@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.productos.trabajos import procesar_pendientes, purgar, reencolar_abandonados
+
+
+class Command(BaseCommand):
+    help = 'Procesa en segundo plano las planillas de costos y precios subidas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Sigue esperando trabajos nuevos en vez de terminar al vaciar la cola.'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=2.0,
+            help='Segundos de espera entre revisiones de la cola en modo continuo.'
+        )
+        parser.add_argument(
+            '--purgar-dias', type=int, default=None,
+            help='Borra antes los trabajos y planillas con más de N días.'
+        )
+
+    def handle(self, *args, **options):
+        if options['purgar_dias'] is not None:
+            borrados = purgar(options['purgar_dias'])
+            self.stdout.write(f'{borrados} trabajos antiguos eliminados.')
+
+        while True:
+            # En cada vuelta: en modo continuo también recoge lo que deje otro worker caído
+            reencolados = reencolar_abandonados()
+            if reencolados:
+                self.stdout.write(f'{reencolados} trabajos abandonados vuelven a la cola.')
+            procesados = procesar_pendientes()
+            if procesados:
+                self.stdout.write(self.style.SUCCESS(f'{procesados} importaciones procesadas.'))
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.productos.busqueda import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de productos (después de cargas masivas).'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write('El índice FTS5 solo existe en SQLite; la búsqueda usa icontains.')
+            return
+        indexados = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'{indexados} productos indexados.'))
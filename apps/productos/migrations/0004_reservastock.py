@@ -0,0 +1,32 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0003_alter_producto_foto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, verbose_name='Carrito o pedido')),
+                ('cantidad', models.PositiveIntegerField(default=1)),
+                ('expira_en', models.DateTimeField(verbose_name='Expira en')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='productos.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Stock',
+                'verbose_name_plural': 'Reservas de Stock',
+                'db_table': 'reservas_stock',
+                'indexes': [models.Index(fields=['producto', 'expira_en'], name='reserva_producto_expira_idx'), models.Index(fields=['expira_en'], name='reserva_expira_idx')],
+                'unique_together': {('clave', 'producto')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 21:10
+
+from django.db import migrations, OperationalError
+
+
+def crear_indice(apps, schema_editor):
+    """Tabla FTS5 para la búsqueda de productos (solo SQLite con FTS5)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS productos_busqueda USING fts5("
+            "codigo, nombre, descripcion, categoria, activo UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        # SQLite compilado sin FTS5: la búsqueda usa icontains
+        return
+    schema_editor.execute(
+        "INSERT INTO productos_busqueda (rowid, codigo, nombre, descripcion, categoria, activo) "
+        "SELECT p.id, p.codigo, p.nombre, COALESCE(p.descripcion, ''), COALESCE(c.nombre, ''), p.activo "
+        "FROM productos p LEFT JOIN categorias c ON c.id = p.categoria_id"
+    )
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS productos_busqueda")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_reservastock'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0005_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='foto_derivadas',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
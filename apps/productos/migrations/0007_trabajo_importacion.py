@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0006_producto_foto_derivadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('costos', 'Costos y precios')], default='costos', max_length=20)),
+                ('archivo', models.CharField(max_length=255, verbose_name='Archivo en disco')),
+                ('nombre_original', models.CharField(max_length=255)),
+                ('simular', models.BooleanField(default=False)),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Procesando', 'Procesando'), ('Listo', 'Listo'), ('Error', 'Error')], default='Pendiente', max_length=20)),
+                ('total_filas', models.IntegerField(blank=True, null=True, verbose_name='Filas estimadas')),
+                ('filas_procesadas', models.IntegerField(default=0)),
+                ('actualizados', models.IntegerField(default=0)),
+                ('sin_cambios', models.IntegerField(default=0)),
+                ('no_encontrados', models.IntegerField(default=0)),
+                ('invalidos', models.IntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=dict)),
+                ('filas_por_segundo', models.FloatField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Importación',
+                'verbose_name_plural': 'Trabajos de Importación',
+                'db_table': 'trabajos_importacion',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='importacion_estado_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+
+from apps.productos import busqueda, imagenes
+from apps.productos.catalogo import invalidar_catalogo
 
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
@@ -7,6 +10,19 @@ class Categoria(models.Model):
     
     def __str__(self):
         return self.nombre
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # El nombre de la categoría es parte del índice de búsqueda
+        busqueda.indexar(self.producto_set.values_list('id', flat=True))
+        invalidar_catalogo()
+
+    def delete(self, *args, **kwargs):
+        producto_ids = list(self.producto_set.values_list('id', flat=True))
+        resultado = super().delete(*args, **kwargs)
+        busqueda.indexar(producto_ids)
+        invalidar_catalogo()
+        return resultado
     
     class Meta:
         db_table = 'categorias'
@@ -19,6 +35,8 @@ class Producto(models.Model):
     nombre = models.CharField(max_length=255)
     descripcion = models.TextField(blank=True, null=True, verbose_name='Descripción')
     foto = models.ImageField(upload_to='images/', blank=True, null=True, verbose_name='Foto')
+    # Versiones reducidas de la foto (ver apps/productos/imagenes.py)
+    foto_derivadas = models.JSONField(default=dict, blank=True, editable=False)
     
 
     categoria = models.ForeignKey(
@@ -64,6 +82,45 @@ class Producto(models.Model):
     
     def __str__(self):
         return f"{self.codigo} - {self.nombre}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Foto persistida, para regenerar las derivadas solo si cambia
+        if 'foto' in field_names:
+            instancia._foto_guardada = instancia.__dict__.get('foto') or ''
+        return instancia
+
+    def save(self, *args, **kwargs):
+        foto_anterior = '' if self._state.adding else getattr(self, '_foto_guardada', None)
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or busqueda.CAMPOS_INDEXADOS.intersection(update_fields):
+            busqueda.indexar([self.pk])
+
+        # 'foto' no está en __dict__ si se cargó con only()/defer() y no se tocó
+        if 'foto' in self.__dict__ and (update_fields is None or 'foto' in update_fields):
+            foto_actual = self.foto.name if self.foto else ''
+            if foto_actual != foto_anterior:
+                imagenes.actualizar_derivadas(self)
+                self._foto_guardada = foto_actual
+        invalidar_catalogo()
+
+    def delete(self, *args, **kwargs):
+        producto_id = self.pk
+        derivadas = self.foto_derivadas
+        resultado = super().delete(*args, **kwargs)
+        busqueda.desindexar([producto_id])
+        transaction.on_commit(lambda: imagenes.eliminar_derivadas(derivadas))
+        invalidar_catalogo()
+        return resultado
+
+    @property
+    def foto_miniatura_url(self):
+        """Foto reducida para listados (o la original si no hay derivadas)."""
+        if not self.foto:
+            return ''
+        return imagenes.url_derivada(self.foto_derivadas, 80) or self.foto.url
     
     @property
     def tiene_stock_bajo(self):
@@ -81,4 +138,98 @@ class Producto(models.Model):
         db_table = 'productos'
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
-        ordering = ['codigo']
\ No newline at end of file
+        ordering = ['codigo']
+
+class ReservaStock(models.Model):
+    """
+    Unidades apartadas para un carrito de cliente o un pedido en borrador.
+    La reserva deja de contar cuando pasa `expira_en`; ver apps/productos/reservas.py.
+    """
+    clave = models.CharField(max_length=64, verbose_name='Carrito o pedido')
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='reservas',
+        verbose_name='Producto'
+    )
+    cantidad = models.PositiveIntegerField(default=1)
+    expira_en = models.DateTimeField(verbose_name='Expira en')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.clave} - {self.producto_id} x {self.cantidad}"
+
+    class Meta:
+        db_table = 'reservas_stock'
+        verbose_name = 'Reserva de Stock'
+        verbose_name_plural = 'Reservas de Stock'
+        unique_together = ['clave', 'producto']
+        indexes = [
+            models.Index(fields=['producto', 'expira_en'], name='reserva_producto_expira_idx'),
+            models.Index(fields=['expira_en'], name='reserva_expira_idx'),
+        ]
+
+
+class TrabajoImportacion(models.Model):
+    """
+    Planilla subida que procesa en segundo plano el comando
+    `procesar_importaciones`. El archivo queda en settings.IMPORTACIONES_DIR y
+    el avance (filas, contadores, filas con error, velocidad) se guarda en
+    cada lote para que la página de estado lo muestre.
+    """
+    TIPOS = (
+        ('costos', 'Costos y precios'),
+    )
+    ESTADOS = (
+        ('Pendiente', 'Pendiente'),
+        ('Procesando', 'Procesando'),
+        ('Listo', 'Listo'),
+        ('Error', 'Error'),
+    )
+
+    tipo = models.CharField(max_length=20, choices=TIPOS, default='costos')
+    archivo = models.CharField(max_length=255, verbose_name='Archivo en disco')
+    nombre_original = models.CharField(max_length=255)
+    simular = models.BooleanField(default=False)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='Pendiente')
+
+    total_filas = models.IntegerField(null=True, blank=True, verbose_name='Filas estimadas')
+    filas_procesadas = models.IntegerField(default=0)
+    actualizados = models.IntegerField(default=0)
+    sin_cambios = models.IntegerField(default=0)
+    no_encontrados = models.IntegerField(default=0)
+    invalidos = models.IntegerField(default=0)
+    # Primeras filas inválidas y SKU desconocidos (ver trabajos.MAXIMO_DETALLE)
+    errores = models.JSONField(default=dict, blank=True)
+    filas_por_segundo = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    solicitado_por = models.ForeignKey(
+        'usuarios.Usuario',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Importación #{self.id} ({self.nombre_original}) - {self.estado}"
+
+    @property
+    def porcentaje(self):
+        if self.estado == 'Listo':
+            return 100
+        if not self.total_filas:
+            return 0
+        return min(99, int(self.filas_procesadas * 100 / self.total_filas))
+
+    class Meta:
+        db_table = 'trabajos_importacion'
+        verbose_name = 'Trabajo de Importación'
+        verbose_name_plural = 'Trabajos de Importación'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='importacion_estado_idx'),
+        ]
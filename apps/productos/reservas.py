@@ -0,0 +1,106 @@
+"""
+Reservas de stock con expiración para carritos de cliente y pedidos en borrador.
+
+Disponible para vender = stock - suma de reservas vigentes de OTROS carritos o
+pedidos. La suma usa el índice (producto, expira_en) de ReservaStock.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.productos.models import Producto, ReservaStock
+
+
+class ReservaInsuficiente(Exception):
+    """No hay unidades disponibles suficientes para reservar."""
+
+    def __init__(self, producto, disponible):
+        self.producto = producto
+        self.disponible = disponible
+        super().__init__(
+            f"Stock insuficiente para {producto.nombre}. Solo quedan {disponible} unidades disponibles."
+        )
+
+
+def clave_carrito(usuario):
+    return f"carrito:{usuario.pk}"
+
+
+def clave_pedido(pedido):
+    return f"pedido:{pedido.pk}"
+
+
+def _vigentes(ahora=None):
+    return ReservaStock.objects.filter(expira_en__gt=ahora or timezone.now())
+
+
+def anotar_disponible(productos, excluir_clave=None):
+    """Anota `disponible` (stock - reservas vigentes) en un queryset de productos."""
+    reservas = _vigentes().filter(producto=OuterRef('pk'))
+    if excluir_clave:
+        reservas = reservas.exclude(clave=excluir_clave)
+    reservado = (
+        reservas.order_by()
+        .values('producto')
+        .annotate(total=Sum('cantidad'))
+        .values('total')
+    )
+    return productos.annotate(
+        reservado=Coalesce(Subquery(reservado, output_field=IntegerField()), Value(0))
+    ).annotate(disponible=F('stock') - F('reservado'))
+
+
+def reservar(clave, producto, cantidad, minutos=None):
+    """
+    Fija en `cantidad` las unidades reservadas por `clave` para el producto y
+    renueva su expiración. Lanza ReservaInsuficiente si no alcanzan.
+    """
+    if minutos is None:
+        minutos = settings.RESERVA_CARRITO_MINUTOS
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        # Bloquea la fila del producto para que dos reservas concurrentes no
+        # aparten las mismas unidades
+        stock = (
+            Producto.objects.select_for_update()
+            .filter(pk=producto.pk)
+            .values_list('stock', flat=True)
+            .get()
+        )
+        reservado = (
+            _vigentes(ahora).filter(producto=producto)
+            .exclude(clave=clave)
+            .aggregate(total=Coalesce(Sum('cantidad'), 0))['total']
+        )
+        libre = stock - reservado
+        if cantidad > libre:
+            raise ReservaInsuficiente(producto, max(libre, 0))
+
+        ReservaStock.objects.update_or_create(
+            clave=clave,
+            producto=producto,
+            defaults={
+                'cantidad': cantidad,
+                'expira_en': ahora + timedelta(minutes=minutos),
+            }
+        )
+
+
+def liberar(clave, producto=None):
+    """Libera las reservas de un carrito o pedido (o solo las de un producto)."""
+    reservas = ReservaStock.objects.filter(clave=clave)
+    if producto is not None:
+        reservas = reservas.filter(producto=producto)
+    borradas, _ = reservas.delete()
+    return borradas
+
+
+def liberar_vencidas(ahora=None):
+    """Borra en un solo DELETE todas las reservas expiradas. Retorna cuántas."""
+    borradas, _ = ReservaStock.objects.filter(expira_en__lte=ahora or timezone.now()).delete()
+    return borradas
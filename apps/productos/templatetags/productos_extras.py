@@ -0,0 +1,41 @@
+from django import template
+from django.utils.html import format_html
+
+from apps.productos.imagenes import srcset, url_derivada
+
+register = template.Library()
+
+
+def _foto(producto):
+    """(url original, derivadas) de un Producto o de un dict del catálogo en caché."""
+    if isinstance(producto, dict):
+        return producto.get('foto_url') or '', producto.get('foto_derivadas') or {}
+    return (producto.foto.url if producto.foto else ''), producto.foto_derivadas or {}
+
+
+@register.simple_tag
+def foto_producto(producto, sizes='80px', ancho=80, clase='', estilo='', alt=''):
+    """
+    <picture> con srcset WebP y JPEG de las derivadas de la foto; el
+    navegador elige el ancho según `sizes`. `ancho` es el tamaño que se usa
+    como src de respaldo. Sin derivadas se muestra la foto original.
+    """
+    original, derivadas = _foto(producto)
+    if not original:
+        return ''
+    alt = alt or (producto.get('nombre', '') if isinstance(producto, dict) else producto.nombre)
+
+    if not derivadas:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy">',
+            original, alt, clase, estilo
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" style="{}" loading="lazy">'
+        '</picture>',
+        srcset(derivadas, 'webp'), sizes,
+        url_derivada(derivadas, ancho), srcset(derivadas, 'jpg'), sizes,
+        alt, clase, estilo,
+    )
@@ -1,3 +1,305 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.productos import busqueda, trabajos
+from apps.productos.importacion import MONTO_MAXIMO, ValorInvalido, convertir_monto, importar_costos
+from apps.productos.models import Categoria, Producto, TrabajoImportacion
+from apps.usuarios.models import Usuario
+
+
+def planilla(filas, nombre='costos.xlsx'):
+    """Planilla subida con encabezados y las filas (codigo, costo, precio) dadas."""
+    wb = openpyxl.Workbook()
+    hoja = wb.active
+    hoja.append(['CODIGO', 'COSTO_NETO', 'PRECIO_VENTA'])
+    for fila in filas:
+        hoja.append(list(fila))
+    contenido = BytesIO()
+    wb.save(contenido)
+    return SimpleUploadedFile(nombre, contenido.getvalue())
+
+
+class DirectorioImportacionesMixin:
+    """IMPORTACIONES_DIR apunta a un directorio temporal durante cada prueba."""
+
+    def setUp(self):
+        super().setUp()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajuste = override_settings(IMPORTACIONES_DIR=self.directorio)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+
+class ImportacionCostosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = Producto.objects.create(
+            codigo='1001', nombre='Mouse', precio_unitario=Decimal('1190'),
+            costo_unitario=Decimal('500'), stock=1,
+        )
+
+    def test_convertir_monto(self):
+        casos = [
+            (None, None),
+            ('   ', None),
+            (700, Decimal('700.00')),
+            (1190.5, Decimal('1190.50')),
+            ('1190,5', Decimal('1190.50')),
+            ('$ 1190', Decimal('1190.00')),
+            ('$1190,99', Decimal('1190.99')),
+            ('0', Decimal('0.00')),
+            (str(MONTO_MAXIMO), MONTO_MAXIMO),
+        ]
+        for valor, esperado in casos:
+            with self.subTest(valor=valor):
+                self.assertEqual(convertir_monto(valor), esperado)
+
+    def test_convertir_monto_rechaza(self):
+        casos = [
+            ('abc', 'no es un número'),
+            ('1,190.50', 'no es un número'),
+            ('NaN', 'no es un número'),
+            ('Infinity', 'no es un número'),
+            ('1e30', 'no es un número'),
+            ('-1', 'negativo'),
+            ('$-1190', 'negativo'),
+            ('100000000', 'excede'),
+            (MONTO_MAXIMO + Decimal('0.01'), 'excede'),
+        ]
+        for valor, motivo in casos:
+            with self.subTest(valor=valor):
+                with self.assertRaisesMessage(ValorInvalido, motivo):
+                    convertir_monto(valor)
+
+    def test_simular_reporta_sin_escribir(self):
+        antes = Producto.objects.values('costo_unitario', 'precio_unitario', 'fecha_actualizacion').get()
+
+        with self.assertNumQueries(1):
+            resultado = importar_costos(
+                planilla([(1001.0, '700', '1290'), ('NO-EXISTE', 100, None), ('X-1', -5, None)]),
+                simular=True,
+            )
+
+        self.assertTrue(resultado['simulacion'])
+        self.assertEqual(resultado['filas'], 3)
+        self.assertEqual(resultado['actualizados'], ['1001'])
+        self.assertEqual(resultado['no_encontrados'], ['NO-EXISTE'])
+        self.assertEqual(resultado['invalidos'][0][:2], (4, 'X-1'))
+        self.assertEqual(
+            Producto.objects.values('costo_unitario', 'precio_unitario', 'fecha_actualizacion').get(), antes
+        )
+
+    def test_importar_escribe_y_omite_los_sin_cambios(self):
+        resultado = importar_costos(planilla([('1001', '700,00', None)]))
+
+        self.assertEqual(resultado['actualizados'], ['1001'])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.costo_unitario, Decimal('700'))
+        self.assertEqual(self.producto.precio_unitario, Decimal('1190'))
+        self.assertEqual(importar_costos(planilla([('1001', 700, None)]))['sin_cambios'], ['1001'])
+
+
+class TrabajosImportacionTests(DirectorioImportacionesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Producto.objects.bulk_create([
+            Producto(codigo=f'P{numero}', nombre=f'Producto {numero}',
+                     precio_unitario=Decimal('1000'), costo_unitario=Decimal('500'), stock=1)
+            for numero in range(5)
+        ])
+
+    def test_encolar_guarda_la_planilla_y_un_trabajo_pendiente(self):
+        trabajo = trabajos.encolar_importacion(planilla([('P0', 600, None)]))
+
+        self.assertEqual(trabajo.estado, 'Pendiente')
+        self.assertEqual(trabajo.nombre_original, 'costos.xlsx')
+        self.assertTrue(trabajos.ruta_archivo(trabajo).exists())
+
+    def test_un_trabajo_se_toma_una_sola_vez(self):
+        trabajo = trabajos.encolar_importacion(planilla([]))
+
+        tomado = trabajos.tomar_siguiente()
+
+        self.assertEqual(tomado.id, trabajo.id)
+        self.assertEqual(tomado.estado, 'Procesando')
+        self.assertIsNotNone(tomado.fecha_inicio)
+        self.assertIsNone(trabajos.tomar_siguiente())
+
+    def test_guarda_el_avance_despues_de_cada_lote(self):
+        trabajo = trabajos.encolar_importacion(
+            planilla([(f'P{numero}', 700, None) for numero in range(5)])
+        )
+        avances = []
+
+        def importar_en_lotes_de_dos(ruta, simular, al_avanzar):
+            def registrar(resultado):
+                al_avanzar(resultado)
+                avances.append(
+                    TrabajoImportacion.objects.values_list('filas_procesadas', flat=True).get(pk=trabajo.pk)
+                )
+            return importar_costos(ruta, simular=simular, al_avanzar=registrar, tamano_lote=2)
+
+        with mock.patch.object(trabajos, 'importar_costos', importar_en_lotes_de_dos):
+            self.assertEqual(trabajos.procesar_pendientes(), 1)
+
+        trabajo.refresh_from_db()
+        self.assertEqual(avances, [2, 4, 5])
+        self.assertEqual(trabajo.estado, 'Listo')
+        self.assertEqual(trabajo.total_filas, 5)
+        self.assertEqual(trabajo.actualizados, 5)
+        self.assertEqual(trabajo.porcentaje, 100)
+        self.assertFalse(trabajos.ruta_archivo(trabajo).exists())
+        self.assertEqual(Producto.objects.filter(costo_unitario=Decimal('700')).count(), 5)
+
+    def test_registra_filas_invalidas_y_codigos_desconocidos(self):
+        trabajo = trabajos.encolar_importacion(
+            planilla([('P0', 'abc', None), ('NO-EXISTE', 100, None), ('P1', None, 1500)])
+        )
+
+        trabajos.procesar_pendientes()
+
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.actualizados, trabajo.invalidos, trabajo.no_encontrados), (1, 1, 1))
+        self.assertEqual(trabajo.errores['no_encontrados'], ['NO-EXISTE'])
+        self.assertEqual(trabajo.errores['invalidos'][0][:2], [2, 'P0'])
+
+    def test_planilla_ilegible_marca_error_y_borra_el_archivo(self):
+        trabajo = trabajos.encolar_importacion(SimpleUploadedFile('costos.xlsx', b'esto no es un xlsx'))
+
+        with self.assertLogs('apps.productos.trabajos', 'ERROR'):
+            trabajos.procesar_pendientes()
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'Error')
+        self.assertTrue(trabajo.error)
+        self.assertIsNotNone(trabajo.fecha_fin)
+        self.assertFalse(trabajos.ruta_archivo(trabajo).exists())
+
+    def test_reencola_los_abandonados(self):
+        trabajo = trabajos.encolar_importacion(planilla([]))
+        trabajos.tomar_siguiente()
+
+        self.assertEqual(trabajos.reencolar_abandonados(), 0)
+        TrabajoImportacion.objects.filter(pk=trabajo.pk).update(
+            fecha_inicio=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(trabajos.reencolar_abandonados(), 1)
+        self.assertEqual(trabajos.tomar_siguiente().id, trabajo.id)
+
+    def test_purgar_borra_trabajos_terminados_y_sus_planillas(self):
+        antiguo = trabajos.encolar_importacion(planilla([]))
+        pendiente = trabajos.encolar_importacion(planilla([]))
+        TrabajoImportacion.objects.filter(pk=antiguo.pk).update(estado='Error')
+        TrabajoImportacion.objects.update(fecha_creacion=timezone.now() - timedelta(days=10))
+
+        self.assertEqual(trabajos.purgar(7), 1)
+        self.assertFalse(trabajos.ruta_archivo(antiguo).exists())
+        self.assertTrue(TrabajoImportacion.objects.filter(pk=pendiente.pk).exists())
+
+
+class VistasImportacionTests(DirectorioImportacionesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.administrador = Usuario.objects.create_user('admin', 'admin@ticashop.cl', 'clave', rol='Administrador')
+        cls.vendedor = Usuario.objects.create_user('vendedor', 'vendedor@ticashop.cl', 'clave', rol='Vendedor')
+
+    def test_subir_planilla_la_deja_en_cola(self):
+        self.client.force_login(self.administrador)
+
+        respuesta = self.client.post(
+            reverse('productos:importar_costos'), {'archivo_excel': planilla([]), 'simular': 'on'}
+        )
+
+        trabajo = TrabajoImportacion.objects.get()
+        self.assertRedirects(respuesta, reverse('productos:estado_importacion', args=[trabajo.id]))
+        self.assertTrue(trabajo.simular)
+        self.assertEqual(trabajo.solicitado_por, self.administrador)
+
+    def test_estado_en_json(self):
+        self.client.force_login(self.administrador)
+        trabajo = trabajos.encolar_importacion(planilla([]))
+
+        respuesta = self.client.get(reverse('productos:estado_importacion', args=[trabajo.id]), {'json': 1})
+
+        self.assertEqual(respuesta.json()['estado'], 'Pendiente')
+
+    def test_solo_administradores(self):
+        self.client.force_login(self.vendedor)
+
+        respuesta = self.client.get(reverse('productos:importar_costos'))
+
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertFalse(TrabajoImportacion.objects.exists())
+
+
+class BusquedaProductosTests(TestCase):
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='Periféricos')
+        self.producto = Producto.objects.create(
+            codigo='MOU-1', nombre='Mouse inalámbrico', precio_unitario=Decimal('1190'),
+            costo_unitario=Decimal('500'), stock=5, categoria=self.categoria,
+        )
+
+    def buscar(self, texto):
+        return list(busqueda.filtrar_productos(Producto.objects.all(), texto))
+
+    def test_usa_el_indice_fts5(self):
+        self.assertTrue(busqueda.indice_disponible())
+
+    def test_producto_nuevo_aparece_por_prefijo_y_sin_tildes(self):
+        self.assertEqual(self.buscar('mou'), [self.producto])
+        self.assertEqual(self.buscar('INALAMBRICO'), [self.producto])
+        self.assertEqual(self.buscar('perife'), [self.producto])
+
+    def test_renombrar_actualiza_el_indice(self):
+        self.producto.nombre = 'Teclado mecánico'
+        self.producto.save()
+
+        self.assertEqual(self.buscar('mouse'), [])
+        self.assertEqual(self.buscar('teclado'), [self.producto])
+
+    def test_renombrar_la_categoria_reindexa_sus_productos(self):
+        self.categoria.nombre = 'Accesorios'
+        self.categoria.save()
+
+        self.assertEqual(self.buscar('perifericos'), [])
+        self.assertEqual(self.buscar('accesorios'), [self.producto])
+
+    def test_borrar_lo_saca_del_indice(self):
+        self.producto.delete()
+
+        self.assertEqual(busqueda.buscar_ids('mouse'), [])
+
+    def test_solo_activos(self):
+        self.producto.activo = False
+        self.producto.save()
+
+        self.assertEqual(busqueda.buscar_ids('mouse'), [self.producto.id])
+        self.assertEqual(busqueda.buscar_ids('mouse', solo_activos=True), [])
+
+    def test_ordena_por_relevancia(self):
+        otro = Producto.objects.create(
+            codigo='ALF-1', nombre='Alfombrilla', descripcion='Ideal para mouse gamer',
+            precio_unitario=Decimal('990'), costo_unitario=Decimal('400'), stock=3,
+        )
+
+        # Coincidir en el nombre pesa más que en la descripción
+        self.assertEqual(self.buscar('mouse'), [self.producto, otro])
+
+    def test_texto_sin_palabras_no_encuentra_nada(self):
+        self.assertEqual(busqueda.buscar_ids('  ¿? '), [])
@@ -0,0 +1,110 @@
+"""
+Importaciones de planillas en segundo plano.
+
+La vista copia la planilla subida a settings.IMPORTACIONES_DIR por trozos
+(sin leerla entera en memoria), registra un TrabajoImportacion y responde de
+inmediato. El comando `procesar_importaciones` toma el trabajo y lo procesa
+con importar_costos por lotes; después de cada lote guarda en el trabajo las
+filas procesadas, los contadores, las filas con error y la velocidad, que la
+página de estado consulta cada pocos segundos.
+"""
+import logging
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.productos.models import TrabajoImportacion
+from apps.productos.importacion import importar_costos, contar_filas
+from ticashop import colas
+
+logger = logging.getLogger(__name__)
+
+# Filas inválidas y SKU desconocidos que se guardan para mostrar
+MAXIMO_DETALLE = 200
+
+
+def ruta_archivo(trabajo):
+    return Path(settings.IMPORTACIONES_DIR) / trabajo.archivo
+
+
+def encolar_importacion(archivo_subido, simular=False, usuario=None):
+    """Guarda la planilla en disco y crea el trabajo Pendiente."""
+    directorio = Path(settings.IMPORTACIONES_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    archivo = f"{uuid.uuid4().hex}.xlsx"
+
+    with open(directorio / archivo, 'wb') as destino:
+        for trozo in archivo_subido.chunks():
+            destino.write(trozo)
+
+    return TrabajoImportacion.objects.create(
+        archivo=archivo,
+        nombre_original=archivo_subido.name[:255],
+        simular=simular,
+        solicitado_por=usuario,
+    )
+
+
+def tomar_siguiente():
+    return colas.tomar_siguiente(TrabajoImportacion)
+
+
+def _avance(resultado, inicio):
+    """Campos del trabajo a partir del reporte parcial de importar_costos."""
+    segundos = time.monotonic() - inicio
+    return {
+        'filas_procesadas': resultado['filas'],
+        'actualizados': len(resultado['actualizados']),
+        'sin_cambios': len(resultado['sin_cambios']),
+        'no_encontrados': len(resultado['no_encontrados']),
+        'invalidos': len(resultado['invalidos']),
+        'errores': {
+            'invalidos': [list(fila) for fila in resultado['invalidos'][:MAXIMO_DETALLE]],
+            'no_encontrados': resultado['no_encontrados'][:MAXIMO_DETALLE],
+        },
+        'filas_por_segundo': round(resultado['filas'] / segundos, 1) if segundos > 0 else None,
+    }
+
+
+def ejecutar(trabajo):
+    """Procesa la planilla del trabajo y lo marca como Listo (o Error)."""
+    ruta = ruta_archivo(trabajo)
+    inicio = time.monotonic()
+    consulta = TrabajoImportacion.objects.filter(id=trabajo.id)
+
+    def al_avanzar(resultado):
+        # UPDATE directo: la página de estado lo ve sin esperar al final
+        consulta.update(**_avance(resultado, inicio))
+
+    try:
+        total = contar_filas(ruta)
+        consulta.update(total_filas=total)
+        resultado = importar_costos(ruta, simular=trabajo.simular, al_avanzar=al_avanzar)
+    except Exception as e:
+        logger.exception(f"Error en importación #{trabajo.id}")
+        consulta.update(estado='Error', error=str(e), fecha_fin=timezone.now())
+        # La planilla no se reintenta: no tiene sentido guardarla hasta purgar()
+        ruta.unlink(missing_ok=True)
+        trabajo.refresh_from_db()
+        return trabajo
+
+    consulta.update(estado='Listo', fecha_fin=timezone.now(), **_avance(resultado, inicio))
+    ruta.unlink(missing_ok=True)
+    trabajo.refresh_from_db()
+    return trabajo
+
+
+def procesar_pendientes(limite=None):
+    return colas.procesar_pendientes(TrabajoImportacion, ejecutar, limite)
+
+
+def reencolar_abandonados():
+    return colas.reencolar_abandonados(TrabajoImportacion)
+
+
+def purgar(dias):
+    """Borra los trabajos (y sus planillas) con más de `dias` de antigüedad."""
+    return colas.purgar(TrabajoImportacion, dias, ruta_archivo)
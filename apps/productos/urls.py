@@ -8,4 +8,5 @@ urlpatterns = [
     path('editar/<int:producto_id>/', views.editar_producto, name='editar_producto'),
     path('eliminar/<int:producto_id>/', views.eliminar_producto, name='eliminar_producto'),
     path('importar-costos/', views.importar_costos_excel, name='importar_costos'),
+    path('importaciones/<int:trabajo_id>/', views.estado_importacion, name='estado_importacion'),
 ]
\ No newline at end of file
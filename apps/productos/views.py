@@ -1,10 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from .models import Producto
+from django.http import JsonResponse
+from .models import Producto, TrabajoImportacion
+from .busqueda import filtrar_productos
+from .trabajos import encolar_importacion
 from .forms import ProductoForm, ImportCostoForm
-from decimal import Decimal 
-import openpyxl 
 
 
 
@@ -24,7 +25,7 @@ def listar_productos(request):
     # Filtro de búsqueda
     buscar = request.GET.get('buscar')
     if buscar:
-        productos = productos.filter(nombre__icontains=buscar)
+        productos = filtrar_productos(productos, buscar)
 
     return render(request, 'productos/listar_productos.html', {'productos': productos})
 
@@ -81,65 +82,44 @@ def importar_costos_excel(request):
     """
     Vista para subir el Excel y actualizar Costos y Precios de Venta masivamente.
     El Excel espera: Columna A=CODIGO, Columna B=COSTO_NETO, Columna C=PRECIO_VENTA.
+    La planilla se deja en cola y la procesa `procesar_importaciones`.
     """
     if request.method == 'POST':
         form = ImportCostoForm(request.POST, request.FILES)
         if form.is_valid():
-            archivo = request.FILES['archivo_excel']
-            
-            try:
-                wb = openpyxl.load_workbook(archivo)
-                sheet = wb.active
-            except Exception as e:
-                messages.error(request, f"Error al leer el archivo Excel: {e}")
-                return redirect('productos:importar_costos')
-
-            productos_actualizados = 0
-            productos_no_encontrados = []
-            
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if not row or not row[0]:
-                    continue
-
-                codigo_producto = str(row[0]).strip() 
-                
-                costo_neto = row[1] if len(row) > 1 else None     
-                precio_venta = row[2] if len(row) > 2 else None    
-
-                try:
-                    producto = Producto.objects.get(codigo=codigo_producto)
-                    cambios = False
-
-                    if costo_neto is not None:
-                        try:
-                            producto.costo_unitario = Decimal(str(costo_neto))
-                            cambios = True
-                        except:
-                            pass 
-
-                    if precio_venta is not None:
-                        try:
-                            producto.precio_unitario = Decimal(str(precio_venta))
-                            cambios = True
-                        except:
-                            pass 
-
-                    if cambios:
-                        producto.save()
-                        productos_actualizados += 1
-                    
-                except Producto.DoesNotExist:
-                    productos_no_encontrados.append(codigo_producto)
-                except Exception as e:
-                    messages.error(request, f"Error en fila {codigo_producto}: {e}")
-
-            messages.success(request, f" Proceso completado. {productos_actualizados} productos actualizados.")
-            if productos_no_encontrados:
-                messages.warning(request, f" SKU no encontrados: {', '.join(productos_no_encontrados)}")
-            
-            return redirect('productos:listar_productos')
-
+            trabajo = encolar_importacion(
+                request.FILES['archivo_excel'],
+                simular=form.cleaned_data['simular'],
+                usuario=request.user,
+            )
+            messages.info(request, f" Importación #{trabajo.id} en cola. Puedes seguir el avance en esta página.")
+            return redirect('productos:estado_importacion', trabajo_id=trabajo.id)
     else:
         form = ImportCostoForm()
 
-    return render(request, 'productos/importar_costos.html', {'form': form})
\ No newline at end of file
+    recientes = TrabajoImportacion.objects.select_related('solicitado_por')[:10]
+    return render(request, 'productos/importar_costos.html', {'form': form, 'recientes': recientes})
+
+
+@login_required
+@user_passes_test(es_administrador)
+def estado_importacion(request, trabajo_id):
+    trabajo = get_object_or_404(TrabajoImportacion, id=trabajo_id)
+
+    # La página consulta este mismo endpoint con ?json=1 mientras el trabajo avanza
+    if request.GET.get('json'):
+        return JsonResponse({
+            'id': trabajo.id,
+            'estado': trabajo.estado,
+            'porcentaje': trabajo.porcentaje,
+            'total_filas': trabajo.total_filas,
+            'filas_procesadas': trabajo.filas_procesadas,
+            'actualizados': trabajo.actualizados,
+            'sin_cambios': trabajo.sin_cambios,
+            'no_encontrados': trabajo.no_encontrados,
+            'invalidos': trabajo.invalidos,
+            'filas_por_segundo': trabajo.filas_por_segundo,
+            'error': trabajo.error,
+        })
+
+    return render(request, 'productos/estado_importacion.html', {'trabajo': trabajo})
@@ -0,0 +1,137 @@
+"""
+Indicadores (KPI) de los paneles de Administrador, Vendedor y Tesorería.
+
+Cada tabla se consulta una sola vez con agregaciones condicionales
+(Count(..., filter=Q(...))) en vez de un count() por indicador, y el
+resultado se guarda en caché por DURACION segundos bajo una clave con
+versión. Guardar o borrar un Pedido o un DocumentoVenta llama a
+`invalidar_indicadores()`, que sube la versión al hacer commit (igual que
+el catálogo, ver apps/productos/catalogo.py). Los totales de usuarios,
+clientes y productos solo se refrescan al vencer la caché.
+"""
+import time
+from datetime import datetime, time as hora, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+CLAVE_VERSION = 'indicadores:version'
+DURACION = 60
+
+PENDIENTES_COBRO = ['Emitida', 'Pago Parcial']
+DIAS_POR_VENCER = 7
+
+# Clientes con mayor deuda que muestra el panel de Tesorería
+CLIENTES_ANTIGUEDAD = 10
+
+
+def version_indicadores():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, int(time.time() * 1000), None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def _subir_version():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        version_indicadores()
+
+
+def invalidar_indicadores():
+    """Descarta los indicadores en caché cuando la transacción actual haga commit."""
+    transaction.on_commit(_subir_version)
+
+
+def _rango_dia(dia):
+    """[inicio, fin) del día en la zona horaria local (usa el índice de fecha_creacion)."""
+    inicio = timezone.make_aware(datetime.combine(dia, hora.min))
+    return inicio, inicio + timedelta(days=1)
+
+
+def _pedidos(hoy, vendedor=None):
+    from apps.ventas.models import Pedido
+
+    inicio, fin = _rango_dia(hoy)
+    de_hoy = Q(fecha_creacion__gte=inicio, fecha_creacion__lt=fin)
+    if vendedor is not None:
+        return Pedido.objects.aggregate(
+            pedidos_hoy=Count('id', filter=Q(usuario=vendedor) & de_hoy),
+            mis_pedidos=Count('id', filter=Q(usuario=vendedor)),
+        )
+    return Pedido.objects.aggregate(
+        total_pedidos=Count('id'),
+        pedidos_hoy=Count('id', filter=de_hoy),
+        pedidos_pendientes=Count('id', filter=Q(estado='Pendiente')),
+        pedidos_completados=Count('id', filter=Q(estado='Completado')),
+    )
+
+
+def _documentos(hoy):
+    from apps.documentos.models import DocumentoVenta
+
+    return DocumentoVenta.objects.filter(estado__in=PENDIENTES_COBRO).aggregate(
+        facturas_vencidas=Count('id', filter=Q(fecha_vencimiento__lt=hoy)),
+        facturas_por_vencer=Count('id', filter=Q(
+            fecha_vencimiento__range=[hoy, hoy + timedelta(days=DIAS_POR_VENCER)]
+        )),
+    )
+
+
+def _productos():
+    from apps.productos.models import Producto
+
+    return Producto.objects.aggregate(
+        total_productos=Count('id'),
+        productos_activos=Count('id', filter=Q(activo=True)),
+    )
+
+
+def _calcular(rol, usuario, hoy):
+    from apps.usuarios.models import Usuario
+    from apps.clientes.models import Cliente
+
+    if rol == 'Administrador':
+        pedidos = _pedidos(hoy)
+        return {
+            'total_usuarios': Usuario.objects.count(),
+            'total_clientes': Cliente.objects.count(),
+            'total_productos': _productos()['total_productos'],
+            'pedidos_hoy': pedidos['pedidos_hoy'],
+        }
+    if rol == 'Vendedor':
+        return {
+            'total_clientes': Cliente.objects.count(),
+            'total_productos': _productos()['productos_activos'],
+            **_pedidos(hoy, vendedor=usuario),
+        }
+    if rol == 'Tesoreria':
+        from apps.documentos.antiguedad import antiguedad_saldos
+
+        pedidos = _pedidos(hoy)
+        antiguedad = antiguedad_saldos(hoy)
+        antiguedad['clientes'] = antiguedad['clientes'][:CLIENTES_ANTIGUEDAD]
+        return {
+            'total_pedidos': pedidos['total_pedidos'],
+            'pedidos_pendientes': pedidos['pedidos_pendientes'],
+            'pedidos_completados': pedidos['pedidos_completados'],
+            'antiguedad': antiguedad,
+            **_documentos(hoy),
+        }
+    return {}
+
+
+def indicadores(rol, usuario):
+    """Dict de indicadores del panel de `rol` (los del Vendedor son de `usuario`)."""
+    hoy = timezone.localdate()
+    propietario = usuario.id if rol == 'Vendedor' else ''
+    clave = f'indicadores:{version_indicadores()}:{rol}:{propietario}:{hoy.isoformat()}'
+    datos = cache.get(clave)
+    if datos is None:
+        datos = _calcular(rol, usuario, hoy)
+        cache.set(clave, datos, DURACION)
+    return datos
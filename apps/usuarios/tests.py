@@ -1,3 +1,62 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.clientes.models import Cliente
+from apps.documentos.models import DocumentoVenta, Pago
+from apps.usuarios.indicadores import indicadores, version_indicadores
+from apps.usuarios.models import Usuario
+
+
+class IndicadoresTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tesoreria = Usuario.objects.create_user('tesoreria', 'tesoreria@ticashop.cl', 'clave', rol='Tesoreria')
+        usuario = Usuario.objects.create_user('cliente', 'cliente@ticashop.cl', 'clave', rol='Cliente')
+        cls.cliente = Cliente.objects.create(
+            user=usuario, rut='11111111-1', razon_social='Cliente SpA',
+            email_facturacion='cliente@ticashop.cl',
+        )
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.factura = DocumentoVenta.objects.create(
+                tipo_documento='Factura', cliente=self.cliente, total=Decimal('11900'),
+                fecha_emision=timezone.now() - timedelta(days=40),
+                fecha_vencimiento=timezone.localdate() - timedelta(days=10),
+            )
+
+    def saldo_en_panel(self):
+        return indicadores('Tesoreria', self.tesoreria)['antiguedad']['totales']['total']
+
+    def test_se_sirven_desde_cache(self):
+        self.saldo_en_panel()
+
+        with self.assertNumQueries(0):
+            self.saldo_en_panel()
+
+    def test_un_pago_refresca_la_antiguedad_de_saldos(self):
+        self.assertEqual(self.saldo_en_panel(), Decimal('11900'))
+        version = version_indicadores()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Pago.objects.create(documento=self.factura, monto_pagado=Decimal('4000'), metodo_pago='Transferencia')
+
+        self.assertNotEqual(version_indicadores(), version)
+        self.assertEqual(self.saldo_en_panel(), Decimal('7900'))
+
+    def test_recalcular_saldos_invalida_el_panel(self):
+        self.saldo_en_panel()
+        Pago.objects.bulk_create([
+            Pago(documento=self.factura, monto_pagado=Decimal('11900'), metodo_pago='Efectivo')
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DocumentoVenta.recalcular_saldos()
 
-# Create your tests here.
+        self.assertEqual(self.saldo_en_panel(), Decimal('0'))
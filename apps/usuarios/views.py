@@ -3,16 +3,12 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import logout
 from django.contrib import messages
 from django.db import models
-from django.utils import timezone
-from datetime import date
 
 from .models import Usuario
 from .forms import CrearUsuarioForm, EditarUsuarioForm, ClienteRegistrationForm
-from apps.clientes.models import Cliente
+from .indicadores import indicadores
 from apps.productos.models import Producto
-from apps.ventas.models import Pedido
-from apps.documentos.models import DocumentoVenta
-from datetime import timedelta
+from apps.productos.catalogo import catalogo_activo, buscar_en_catalogo
 
 def es_administrador(user):
     """Verifica si el usuario es administrador"""
@@ -23,13 +19,17 @@ def es_administrador(user):
 def dashboard(request):
     
     if not request.user.is_authenticated:
-        total_productos = Producto.objects.filter(activo=True).count()
-        productos = Producto.objects.filter(activo=True)
+        # Catálogo desde la caché (sin consultas mientras no cambie)
+        catalogo = catalogo_activo()
+        total_productos = len(catalogo)
+        buscar = request.GET.get('buscar', '').strip()
+        productos = buscar_en_catalogo(buscar) if buscar else catalogo
         
         context = {
             'usuario': request.user, 
             'total_productos': total_productos,
             'productos': productos,
+            'buscar': buscar,
         }
         return render(request, 'dashboard/cliente_dashboard.html', context)
 
@@ -38,11 +38,6 @@ def dashboard(request):
     rol = usuario.rol.strip() if usuario.rol else ''
     # --- Panel de ADMINISTRADOR ---
     if rol == 'Administrador':
-        total_usuarios = Usuario.objects.count()
-        total_clientes = Cliente.objects.count()
-        total_productos = Producto.objects.count()
-        pedidos_hoy = Pedido.objects.filter(fecha_creacion__date=date.today()).count()
-        
         productos_stock_bajo = Producto.objects.filter(
             stock__lte=models.F('stock_minimo'),
             activo=True
@@ -50,76 +45,43 @@ def dashboard(request):
 
         context = {
             'usuario': usuario,
-            'total_usuarios': total_usuarios,
-            'total_clientes': total_clientes,
-            'total_productos': total_productos,
-            'pedidos_hoy': pedidos_hoy,
             'productos_stock_bajo': productos_stock_bajo,
+            **indicadores(rol, usuario),
         }
         return render(request, 'dashboard/admin_dashboard.html', context)
 
     # --- Panel de VENDEDOR ---
     elif rol == 'Vendedor':
-        total_clientes = Cliente.objects.count()
-        total_productos = Producto.objects.filter(activo=True).count()
-        pedidos_hoy = Pedido.objects.filter(
-            usuario=usuario, 
-            fecha_creacion__date=date.today()
-        ).count()
-        
-        mis_pedidos = Pedido.objects.filter(usuario=usuario).count()
-
         context = {
             'usuario': usuario,
-            'total_clientes': total_clientes,
-            'total_productos': total_productos,
-            'pedidos_hoy': pedidos_hoy,
-            'mis_pedidos': mis_pedidos,
+            **indicadores(rol, usuario),
         }
         return render(request, 'dashboard/vendedor_dashboard.html', context)
     
     # --- Panel de TESORERÍA (opcional) ---
     elif rol == 'Tesoreria':
-        hoy = timezone.localdate()
-
-        # Conteo de Pedidos
-        total_pedidos = Pedido.objects.count()
-        pedidos_pendientes = Pedido.objects.filter(estado='Pendiente').count()
-        pedidos_completados = Pedido.objects.filter(estado='Completado').count()
-        
-        # 1. Alertas de Facturas Vencidas
-        facturas_vencidas = DocumentoVenta.objects.filter(
-            estado__in=['Emitida', 'Pago Parcial'],
-            fecha_vencimiento__lt=hoy
-        )
-        
-        # 2. Alertas de Facturas Por Vencer
-        fecha_limite_futura = hoy + timedelta(days=7)
-        facturas_por_vencer = DocumentoVenta.objects.filter(
-            estado__in=['Emitida', 'Pago Parcial'],
-            fecha_vencimiento__range=[hoy, fecha_limite_futura]
-        )
-
+        # Conteos de pedidos y alertas de facturas vencidas / por vencer
+        # (próximos 7 días), ver indicadores.py
         context = {
             'usuario': usuario,
-            'total_pedidos': total_pedidos,
-            'pedidos_pendientes': pedidos_pendientes,
-            'pedidos_completados': pedidos_completados,
-            'facturas_vencidas': facturas_vencidas,
-            'facturas_por_vencer': facturas_por_vencer, 
+            **indicadores(rol, usuario),
         }
         return render(request, 'dashboard/tesoreria_dashboard.html', context)
     
 
     elif rol == 'Cliente':
       
-        total_productos = Producto.objects.filter(activo=True).count()
-        productos = Producto.objects.filter(activo=True)
+        # Catálogo desde la caché (sin consultas mientras no cambie)
+        catalogo = catalogo_activo()
+        total_productos = len(catalogo)
+        buscar = request.GET.get('buscar', '').strip()
+        productos = buscar_en_catalogo(buscar) if buscar else catalogo
         
         context = {
             'usuario': usuario,
             'total_productos': total_productos,
             'productos': productos,
+            'buscar': buscar,
         }
         return render(request, 'dashboard/cliente_dashboard.html', context)
 
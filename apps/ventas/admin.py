@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Pedido, DetallePedido
+from .models import Pedido, DetallePedido, ResumenVentaDiaria
 
 class DetallePedidoInline(admin.TabularInline):
     model = DetallePedido
@@ -46,4 +46,12 @@ class PedidoAdmin(admin.ModelAdmin):
 class DetallePedidoAdmin(admin.ModelAdmin):
     list_display = ['pedido', 'producto', 'cantidad', 'precio_unitario_venta', 'subtotal']
     list_filter = ['pedido__estado']
-    search_fields = ['producto__nombre', 'pedido__cliente__razon_social']
\ No newline at end of file
+    search_fields = ['producto__nombre', 'pedido__cliente__razon_social']
+
+
+@admin.register(ResumenVentaDiaria)
+class ResumenVentaDiariaAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'vendedor', 'producto', 'tipo_documento', 'unidades', 'neto', 'utilidad']
+    list_filter = ['tipo_documento', 'fecha']
+    search_fields = ['producto__nombre', 'vendedor__username']
+    list_select_related = ['vendedor', 'producto']
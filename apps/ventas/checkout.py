@@ -0,0 +1,233 @@
+import time
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from apps.ventas.models import Pedido, DetallePedido, ClaveIdempotencia
+from apps.productos.models import Producto
+from apps.documentos.models import DocumentoVenta, DetalleDocumento, Pago
+from apps.productos.reservas import anotar_disponible, liberar
+from apps.productos.catalogo import invalidar_catalogo
+from ticashop.metricas import Histograma
+
+DURACION_CHECKOUT = Histograma(
+    'ticashop_checkout_duracion_segundos',
+    'Duración de la compra del carrito de la tienda, por resultado',
+    etiquetas=('resultado',),
+)
+
+
+class StockInsuficiente(Exception):
+    """Se lanza cuando algún producto del carrito no tiene stock suficiente."""
+
+    def __init__(self, productos):
+        self.productos = productos
+        nombres = ', '.join(p.nombre for p in productos)
+        super().__init__(f"Stock insuficiente para {nombres}.")
+
+
+def normalizar_carrito(cart):
+    """Convierte el carrito de sesión {'id': cantidad} en {id: cantidad} (solo cantidades > 0)."""
+    cantidades = {}
+    for producto_id, cantidad in cart.items():
+        try:
+            cantidad = int(cantidad)
+        except (TypeError, ValueError):
+            continue
+        if cantidad > 0:
+            cantidades[int(producto_id)] = cantidad
+    return cantidades
+
+
+def descontar_stock(cantidades, clave_reserva=None):
+    """
+    Descuenta el stock de todos los productos en UNA sola sentencia UPDATE.
+    El WHERE exige disponible >= cantidad para cada fila, donde disponible es
+    el stock menos las reservas vigentes de OTROS carritos o pedidos (las de
+    `clave_reserva` son las de esta misma compra). Si alguna fila no califica
+    el número de filas afectadas no cuadra y se lanza StockInsuficiente (el
+    llamador debe estar dentro de transaction.atomic() para que el rollback
+    deshaga el descuento parcial).
+    """
+    if not cantidades:
+        return 0
+
+    condicion = Q()
+    for producto_id, cantidad in cantidades.items():
+        condicion |= Q(id=producto_id, disponible__gte=cantidad)
+
+    nuevo_stock = Case(
+        *[When(id=producto_id, then=F('stock') - Value(cantidad))
+          for producto_id, cantidad in cantidades.items()],
+        default=F('stock'),
+        output_field=IntegerField(),
+    )
+
+    productos = anotar_disponible(Producto.objects.all(), excluir_clave=clave_reserva)
+    filas = productos.filter(condicion).update(stock=nuevo_stock)
+    if filas != len(cantidades):
+        insuficientes = [
+            p for p in productos.filter(id__in=cantidades.keys()).only('id', 'nombre', 'stock')
+            if p.disponible < cantidades[p.id]
+        ]
+        raise StockInsuficiente(insuficientes)
+    # El catálogo de la tienda muestra el stock
+    invalidar_catalogo()
+    return filas
+
+
+def calcular_iva(total_bruto):
+    """Separa neto e IVA de un total con IVA incluido."""
+    total_bruto = Decimal(total_bruto).quantize(Decimal('0.00'))
+    neto = (total_bruto / Decimal('1.19')).quantize(Decimal('0.00'))
+    return neto, total_bruto - neto, total_bruto
+
+
+def buscar_checkout_previo(usuario, clave_idempotencia):
+    """Documento creado por un checkout anterior con la misma clave, o None."""
+    if not clave_idempotencia:
+        return None
+    registro = (
+        ClaveIdempotencia.objects.filter(usuario=usuario, clave=clave_idempotencia)
+        .select_related('documento')
+        .first()
+    )
+    return registro.documento if registro else None
+
+
+def procesar_checkout(cliente, usuario, cart, tipo_documento, medio_de_pago,
+                      clave_reserva=None, clave_idempotencia=None):
+    """
+    Confirma el carrito completo con un número constante de sentencias:
+    1 SELECT de productos, 1 UPDATE condicional de stock, 1 INSERT de Pedido,
+    1 bulk INSERT de DetallePedido, 1 INSERT de DocumentoVenta,
+    1 bulk INSERT de DetalleDocumento y 1 INSERT de Pago.
+    Si se indica `clave_reserva`, las reservas de stock del carrito se
+    liberan en la misma transacción. Retorna el DocumentoVenta creado.
+
+    Con `clave_idempotencia`, la clave se inserta al inicio de la transacción:
+    un reintento concurrente con la misma clave queda esperando el índice
+    único y, cuando la primera compra hace commit, recibe su documento en
+    vez de crear otro.
+
+    Cada llamada queda en el histograma ticashop_checkout_duracion_segundos
+    con su resultado (ok, sin_stock, error).
+    """
+    inicio = time.perf_counter()
+    resultado = 'error'
+    try:
+        documento = _registrar_compra(
+            cliente, usuario, cart, tipo_documento, medio_de_pago,
+            clave_reserva, clave_idempotencia
+        )
+        resultado = 'ok'
+        return documento
+    except StockInsuficiente:
+        resultado = 'sin_stock'
+        raise
+    finally:
+        DURACION_CHECKOUT.observe(time.perf_counter() - inicio, resultado=resultado)
+
+
+def _registrar_compra(cliente, usuario, cart, tipo_documento, medio_de_pago,
+                      clave_reserva, clave_idempotencia):
+    cantidades = normalizar_carrito(cart)
+    if not cantidades:
+        raise ValueError("El carrito está vacío.")
+
+    with transaction.atomic():
+        registro = None
+        if clave_idempotencia:
+            try:
+                with transaction.atomic():
+                    registro = ClaveIdempotencia.objects.create(
+                        usuario=usuario, clave=clave_idempotencia
+                    )
+            except IntegrityError:
+                previo = buscar_checkout_previo(usuario, clave_idempotencia)
+                if previo is not None:
+                    return previo
+                raise
+
+        productos = list(
+            Producto.objects.filter(id__in=cantidades.keys())
+            .only('id', 'nombre', 'precio_unitario', 'costo_unitario')
+        )
+        if len(productos) != len(cantidades):
+            raise ValueError("Algunos productos del carrito ya no existen.")
+
+        descontar_stock(cantidades, clave_reserva)
+
+        total_carrito = sum(
+            (p.precio_unitario * cantidades[p.id] for p in productos), Decimal('0')
+        )
+        neto, iva, total_bruto = calcular_iva(total_carrito)
+        fecha_actual = timezone.now()
+
+        pedido = Pedido.objects.create(
+            cliente=cliente,
+            usuario=usuario,
+            total=total_bruto,
+            estado='Pendiente'
+        )
+
+        # bulk_create no llama a save(): el subtotal se calcula aquí y el total
+        # del pedido ya quedó fijado arriba.
+        DetallePedido.objects.bulk_create([
+            DetallePedido(
+                pedido=pedido,
+                producto=p,
+                cantidad=cantidades[p.id],
+                precio_unitario_venta=p.precio_unitario,
+                subtotal=p.precio_unitario * cantidades[p.id],
+            )
+            for p in productos
+        ])
+
+        documento = DocumentoVenta.objects.create(
+            pedido=pedido,
+            tipo_documento=tipo_documento,
+            cliente=cliente,
+            vendedor=usuario,
+            neto=neto,
+            iva=iva,
+            total=total_bruto,
+            fecha_emision=fecha_actual,
+            fecha_vencimiento=fecha_actual.date(),
+            estado='Emitida',
+            medio_de_pago=medio_de_pago,
+            razon_social=cliente.razon_social,
+            rut=cliente.rut,
+            giro=cliente.giro,
+            direccion=cliente.direccion
+        )
+
+        DetalleDocumento.objects.bulk_create([
+            DetalleDocumento(
+                documento=documento,
+                producto=p,
+                cantidad=cantidades[p.id],
+                precio_unitario_venta=p.precio_unitario,
+                subtotal=p.precio_unitario * cantidades[p.id],
+                costo_unitario_venta=p.costo_unitario,
+            )
+            for p in productos
+        ])
+
+        Pago.objects.create(
+            documento=documento,
+            monto_pagado=total_bruto,
+            metodo_pago=medio_de_pago,
+            referencia="Pago E-Commerce"
+        )
+
+        if clave_reserva:
+            liberar(clave_reserva)
+
+        if registro is not None:
+            registro.documento = documento
+            registro.save(update_fields=['documento'])
+
+    return documento
@@ -0,0 +1,516 @@
+"""
+Datos sintéticos para pruebas de volumen.
+
+Genera, a partir de una semilla, usuarios de cada rol, clientes (empresas y
+personas con RUT válido), proveedores, categorías, productos y un historial
+de pedidos con sus documentos de venta, pagos y notas de crédito. Con la misma
+semilla y los mismos parámetros sobre una base vacía se obtienen los mismos
+datos (las fechas se cuentan hacia atrás desde hoy).
+
+Las filas se insertan con ids asignados aquí y un INSERT preparado una vez y
+ejecutado con executemany (ver insertar_en_bloque), en una transacción por
+lote de pedidos. Así las llaves foráneas se conocen sin releer la base y las
+fechas históricas quedan tal cual: bulk_create las pisaría con la hora actual
+en los campos auto_now/auto_now_add.
+
+Como no se pasa por save(), lo que normalmente mantienen los modelos se
+calcula aquí: total del pedido, neto/IVA, saldos del documento y folios (se
+reservan por bloque en SecuenciaFolio). Al terminar se reconstruye el índice
+de búsqueda de productos y, si ya existía, el resumen diario de ventas.
+
+Los correos quedan en example.com: los recordatorios de cobranza de estos
+datos no llegan a nadie.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.usuarios.models import Usuario
+from apps.usuarios.indicadores import invalidar_indicadores
+from apps.clientes.models import Cliente, Proveedor
+from apps.clientes.forms import digito_verificador
+from apps.productos.models import Categoria, Producto
+from apps.productos.busqueda import reconstruir
+from apps.productos.catalogo import invalidar_catalogo
+from apps.ventas.models import Pedido, DetallePedido, MarcaResumen
+from apps.ventas.checkout import calcular_iva
+from apps.ventas.resumen import NOMBRE_MARCA, actualizar_resumen
+from apps.documentos.models import (
+    DocumentoVenta, DetalleDocumento, Pago, NotaCredito, DetalleNotaCredito
+)
+from apps.documentos.folios import reservar_bloque
+
+# Pedidos por transacción
+TAMANO_LOTE = 2000
+
+# Contraseña de todos los usuarios generados (el hash se calcula una vez)
+CONTRASENA = 'ticashop'
+
+DIAS_PLAZO_FACTURA = 30
+
+# Pedidos más recientes que esto pueden seguir Pendientes o en proceso
+DIAS_PEDIDOS_ABIERTOS = 10
+
+NOMBRES = (
+    'Camila', 'Valentina', 'Javiera', 'Francisca', 'Catalina', 'Fernanda', 'Constanza',
+    'Daniela', 'Carolina', 'Isidora', 'Matías', 'Sebastián', 'Benjamín', 'Vicente',
+    'Joaquín', 'Tomás', 'Nicolás', 'Felipe', 'Diego', 'Cristóbal', 'Rodrigo', 'Ignacio',
+)
+APELLIDOS = (
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva',
+    'Martínez', 'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández',
+    'Torres', 'Araya', 'Flores', 'Espinoza', 'Valenzuela', 'Castillo', 'Tapia',
+    'Reyes', 'Gutiérrez', 'Castro', 'Pizarro', 'Álvarez', 'Vásquez', 'Sánchez', 'Fernández',
+)
+RUBROS = ('Comercial', 'Distribuidora', 'Inversiones', 'Servicios', 'Importadora', 'Tecnología', 'Constructora')
+SOCIEDADES = ('SpA', 'Ltda.', 'S.A.', 'EIRL')
+GIROS = (
+    'Venta al por menor de computadores', 'Servicios de ingeniería', 'Asesorías informáticas',
+    'Comercio al por mayor', 'Educación', 'Actividades de contabilidad', 'Transporte de carga',
+    'Construcción de edificios', 'Servicios de salud', 'Venta de artículos de oficina',
+)
+CALLES = (
+    'Av. Providencia', 'Av. Apoquindo', 'Av. Libertador Bernardo O\'Higgins', 'Los Leones',
+    'Av. Vicuña Mackenna', 'San Martín', 'Av. Grecia', 'Av. Pajaritos', 'Colón', 'Prat',
+)
+# (comuna, ciudad)
+COMUNAS = (
+    ('Santiago', 'Santiago'), ('Providencia', 'Santiago'), ('Las Condes', 'Santiago'),
+    ('Ñuñoa', 'Santiago'), ('Maipú', 'Santiago'), ('La Florida', 'Santiago'),
+    ('Viña del Mar', 'Viña del Mar'), ('Valparaíso', 'Valparaíso'),
+    ('Concepción', 'Concepción'), ('Temuco', 'Temuco'), ('Antofagasta', 'Antofagasta'),
+)
+MARCAS = ('Lenovo', 'HP', 'Dell', 'Asus', 'Acer', 'Samsung', 'LG', 'Logitech', 'Kingston', 'TP-Link', 'Epson', 'Genius')
+# (categoría, tipos de producto, precio mínimo, precio máximo), precios con IVA
+CATEGORIAS = (
+    ('Computadores', ('Notebook', 'PC de escritorio', 'All-in-One'), 350000, 1800000),
+    ('Monitores', ('Monitor', 'Monitor curvo'), 90000, 600000),
+    ('Periféricos', ('Mouse', 'Teclado', 'Webcam', 'Audífonos'), 5000, 90000),
+    ('Almacenamiento', ('Disco SSD', 'Disco duro externo', 'Pendrive', 'Tarjeta microSD'), 6000, 250000),
+    ('Redes', ('Router', 'Switch', 'Access point', 'Cable UTP'), 4000, 300000),
+    ('Impresión', ('Impresora multifuncional', 'Tóner', 'Cartucho de tinta'), 12000, 450000),
+    ('Componentes', ('Memoria RAM', 'Fuente de poder', 'Tarjeta de video', 'Placa madre'), 25000, 900000),
+    ('Accesorios', ('Mochila para notebook', 'Base refrigerante', 'Hub USB', 'Adaptador HDMI'), 3000, 45000),
+)
+MEDIOS_PAGO = [medio for medio, _ in DocumentoVenta.MEDIOS_PAGO]
+# Unidades por línea: la mayoría compra 1 o 2
+CANTIDADES = (1, 2, 3, 4, 5, 10)
+PESOS_CANTIDADES = (55, 20, 10, 6, 5, 4)
+
+
+def parametros_por_defecto(pedidos):
+    """Tamaño del resto de las tablas en proporción a la cantidad de pedidos."""
+    productos = max(50, min(pedidos // 20, 20000))
+    return {
+        'clientes': max(20, pedidos // 15),
+        'productos': productos,
+        'proveedores': max(5, productos // 50),
+        'vendedores': max(2, min(pedidos // 10000, 50)),
+    }
+
+
+def proximo_id(modelo):
+    return (modelo.objects.aggregate(ultimo=Max('pk'))['ultimo'] or 0) + 1
+
+
+def insertar_en_bloque(modelo, objetos):
+    """
+    INSERT de todas las columnas (id incluido) preparado una vez y ejecutado
+    con executemany. Los valores pasan por get_db_prep_save, igual que en
+    save(), pero sin pre_save: los campos auto_now se toman del objeto.
+    """
+    if not objetos:
+        return 0
+    # La conexión real y no el proxy django.db.connection: get_db_prep_save la
+    # consulta por cada valor y el proxy pasa cada vez por un asgiref Local
+    conexion = connections[router.db_for_write(modelo)]
+    campos = modelo._meta.concrete_fields
+    quote = conexion.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote(modelo._meta.db_table)} "
+        f"({', '.join(quote(campo.column) for campo in campos)}) "
+        f"VALUES ({', '.join(['%s'] * len(campos))})"
+    )
+    preparar = [(campo.attname, campo.get_db_prep_save) for campo in campos]
+    parametros = [
+        [prep(getattr(objeto, attname), conexion) for attname, prep in preparar]
+        for objeto in objetos
+    ]
+    with conexion.cursor() as cursor:
+        cursor.executemany(sql, parametros)
+    return len(objetos)
+
+
+def _pesos_acumulados(cantidad, rng, exponente=0.8):
+    """Popularidad tipo Pareto en orden aleatorio: pocos concentran muchas compras."""
+    pesos = [1 / (posicion + 1) ** exponente for posicion in range(cantidad)]
+    rng.shuffle(pesos)
+    acumulados = []
+    total = 0
+    for peso in pesos:
+        total += peso
+        acumulados.append(total)
+    return acumulados
+
+
+def _redondear_pesos(monto):
+    return Decimal(monto).quantize(Decimal('1'))
+
+
+class GeneradorDatos:
+    def __init__(self, semilla=1, dias=365, lineas_max=10, tamano_lote=TAMANO_LOTE):
+        self.rng = random.Random(semilla)
+        self.dias = dias
+        self.lineas_max = lineas_max
+        self.tamano_lote = tamano_lote
+        self.ahora = timezone.now().replace(microsecond=0)
+        self.hoy = timezone.localdate()
+        self.contrasena = make_password(CONTRASENA)
+        self.conteo = {}
+        self.ids = {}
+        # cliente id -> (comuna, ciudad) de su dirección
+        self.ubicaciones = {}
+
+    def _nuevos_ids(self, modelo, cantidad):
+        inicio = self.ids.get(modelo) or proximo_id(modelo)
+        self.ids[modelo] = inicio + cantidad
+        return range(inicio, inicio + cantidad)
+
+    def _insertar(self, modelo, objetos):
+        nombre = modelo.__name__
+        self.conteo[nombre] = self.conteo.get(nombre, 0) + insertar_en_bloque(modelo, objetos)
+
+    def _fecha(self, fraccion):
+        """Fecha y hora hábil a `fraccion` (0 a 1) del período, del más antiguo a hoy."""
+        dia = timezone.localtime(self.ahora - timedelta(days=self.dias * (1 - fraccion)))
+        hora = self.rng.randint(9, 19) * 3600 + self.rng.randint(0, 3599)
+        fecha = dia.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(seconds=hora)
+        return min(fecha, self.ahora)
+
+    def _nombre_persona(self):
+        return (
+            self.rng.choice(NOMBRES),
+            f"{self.rng.choice(APELLIDOS)} {self.rng.choice(APELLIDOS)}",
+        )
+
+    def _direccion(self):
+        comuna, ciudad = self.rng.choice(COMUNAS)
+        return f"{self.rng.choice(CALLES)} {self.rng.randint(100, 9999)}, {comuna}", comuna, ciudad
+
+    def _usuario(self, pk, rol, nombre, apellido, fecha):
+        username = f"{rol.lower()}{pk}"
+        return Usuario(
+            id=pk,
+            password=self.contrasena,
+            username=username,
+            first_name=nombre,
+            last_name=apellido,
+            email=f"{username}@example.com",
+            is_staff=rol == 'Administrador',
+            date_joined=fecha,
+            rol=rol,
+            telefono=f"+569{self.rng.randint(10000000, 99999999)}",
+            fecha_actualizacion=fecha,
+        )
+
+    def crear_personal(self, vendedores):
+        """Administrador, tesorería y vendedores."""
+        roles = ['Administrador', 'Tesoreria', 'Tesoreria'] + ['Vendedor'] * vendedores
+        usuarios = []
+        for pk, rol in zip(self._nuevos_ids(Usuario, len(roles)), roles):
+            usuarios.append(self._usuario(pk, rol, *self._nombre_persona(), self._fecha(0)))
+        self._insertar(Usuario, usuarios)
+        self.vendedores = [usuario.id for usuario in usuarios if usuario.rol == 'Vendedor']
+
+    def crear_clientes(self, cantidad):
+        """Empresas (factura, RUT 76-77 millones) y personas (boleta); la mitad con cuenta en la tienda."""
+        usuarios = []
+        clientes = []
+        con_cuenta = [self.rng.random() < 0.5 for _ in range(cantidad)]
+        ids_usuario = iter(self._nuevos_ids(Usuario, sum(con_cuenta)))
+        for pk, tiene_cuenta in zip(self._nuevos_ids(Cliente, cantidad), con_cuenta):
+            nombre, apellidos = self._nombre_persona()
+            direccion, comuna, ciudad = self._direccion()
+            self.ubicaciones[pk] = (comuna, ciudad)
+            empresa = self.rng.random() < 0.6
+            if empresa:
+                cuerpo = 76000000 + pk
+                razon_social = f"{self.rng.choice(RUBROS)} {apellidos.split()[0]} {self.rng.choice(SOCIEDADES)}"
+                giro = self.rng.choice(GIROS)
+            else:
+                cuerpo = 5000000 + pk
+                razon_social = f"{nombre} {apellidos}"
+                giro = None
+
+            usuario_id = None
+            if tiene_cuenta:
+                usuario_id = next(ids_usuario)
+                usuarios.append(self._usuario(usuario_id, 'Cliente', nombre, apellidos, self._fecha(0)))
+            clientes.append(Cliente(
+                id=pk,
+                user_id=usuario_id,
+                rut=f"{cuerpo}{digito_verificador(cuerpo)}",
+                razon_social=razon_social,
+                giro=giro,
+                direccion=direccion,
+                email_facturacion=f"cliente{pk}@example.com",
+            ))
+        self._insertar(Usuario, usuarios)
+        self._insertar(Cliente, clientes)
+        self.clientes = clientes
+        self.pesos_clientes = _pesos_acumulados(len(clientes), self.rng)
+
+    def crear_proveedores(self, cantidad):
+        proveedores = []
+        for pk in self._nuevos_ids(Proveedor, cantidad):
+            cuerpo = 96000000 + pk
+            proveedores.append(Proveedor(
+                id=pk,
+                rut=f"{cuerpo}{digito_verificador(cuerpo)}",
+                razon_social=f"{self.rng.choice(RUBROS)} {self.rng.choice(MARCAS)} Chile {self.rng.choice(SOCIEDADES)}",
+                email_contacto=f"proveedor{pk}@example.com",
+                telefono=f"+562{self.rng.randint(20000000, 29999999)}",
+            ))
+        self._insertar(Proveedor, proveedores)
+        self.proveedores = [proveedor.id for proveedor in proveedores]
+
+    def crear_categorias(self):
+        """Las categorías de CATEGORIAS que aún no existen (el nombre es único)."""
+        existentes = dict(Categoria.objects.values_list('nombre', 'id'))
+        nuevas = [nombre for nombre, *_ in CATEGORIAS if nombre not in existentes]
+        categorias = [
+            Categoria(id=pk, nombre=nombre, descripcion=f"Productos de {nombre.lower()}")
+            for pk, nombre in zip(self._nuevos_ids(Categoria, len(nuevas)), nuevas)
+        ]
+        self._insertar(Categoria, categorias)
+        existentes.update((categoria.nombre, categoria.id) for categoria in categorias)
+        self.categorias = existentes
+
+    def crear_productos(self, cantidad):
+        productos = []
+        for pk in self._nuevos_ids(Producto, cantidad):
+            categoria, tipos, minimo, maximo = self.rng.choice(CATEGORIAS)
+            tipo = self.rng.choice(tipos)
+            marca = self.rng.choice(MARCAS)
+            # Más productos baratos que caros dentro de cada categoría
+            precio = _redondear_pesos(minimo + (maximo - minimo) * self.rng.random() ** 2)
+            costo = (precio / Decimal('1.19') * Decimal(self.rng.uniform(0.55, 0.8))).quantize(Decimal('0.01'))
+            fecha = self._fecha(self.rng.random() * 0.2)
+            productos.append(Producto(
+                id=pk,
+                codigo=f"SIN-{pk:07d}",
+                nombre=f"{tipo} {marca} {self.rng.choice('ABCDEFGHKMPRSTVXZ')}{self.rng.randint(100, 999)}",
+                descripcion=f"{tipo} marca {marca}, categoría {categoria.lower()}.",
+                categoria_id=self.categorias[categoria],
+                proveedor_id=self.rng.choice(self.proveedores),
+                precio_unitario=precio,
+                costo_unitario=costo,
+                stock=self.rng.randint(0, 500),
+                stock_minimo=self.rng.choice((0, 5, 10, 20)),
+                activo=self.rng.random() < 0.95,
+                fecha_creacion=fecha,
+                fecha_actualizacion=fecha,
+            ))
+        self._insertar(Producto, productos)
+        self.productos = productos
+        self.pesos_productos = _pesos_acumulados(len(productos), self.rng)
+
+    def _estado_pedido(self, fecha):
+        if (self.ahora - fecha).days > DIAS_PEDIDOS_ABIERTOS:
+            return self.rng.choices(('Enviado', 'Completado', 'Cancelado'), (88, 7, 5))[0]
+        return self.rng.choices(('Pendiente', 'Procesando', 'Enviado', 'Cancelado'), (30, 30, 37, 3))[0]
+
+    def _lineas(self):
+        """[(producto, cantidad)] sin productos repetidos."""
+        elegidos = self.rng.choices(
+            self.productos, cum_weights=self.pesos_productos, k=self.rng.randint(1, self.lineas_max)
+        )
+        unicos = {producto.id: producto for producto in elegidos}
+        return [
+            (producto, self.rng.choices(CANTIDADES, PESOS_CANTIDADES)[0])
+            for producto in unicos.values()
+        ]
+
+    def _cobranza(self, documento, notas):
+        """Pagos del documento y su estado: boletas al contado, facturas según su antigüedad."""
+        emision = documento.fecha_emision
+        por_cobrar = documento.total - documento.monto_notas_credito
+        if documento.tipo_documento == 'Boleta':
+            return 'Pagada', [(emision, por_cobrar)]
+
+        vencida = documento.fecha_vencimiento < self.hoy
+        azar = self.rng.random()
+        if azar < (0.82 if vencida else 0.4):
+            fecha_pago = min(emision + timedelta(days=self.rng.randint(0, 45), hours=2), self.ahora)
+            return ('Devuelta Parcial' if notas else 'Pagada'), [(fecha_pago, por_cobrar)]
+        if azar < (0.9 if vencida else 0.5):
+            abono = _redondear_pesos(por_cobrar * Decimal(self.rng.uniform(0.3, 0.7)))
+            fecha_pago = min(emision + timedelta(days=self.rng.randint(0, 30), hours=2), self.ahora)
+            return 'Pago Parcial', [(fecha_pago, abono)]
+        return ('Vencida' if vencida else 'Emitida'), []
+
+    def crear_lote(self, fracciones):
+        """Pedidos (con documentos, pagos y notas de crédito) en las posiciones `fracciones` del período."""
+        pedidos, lineas_pedido, documentos, lineas_documento = [], [], [], []
+        pagos, notas, lineas_nota = [], [], []
+
+        clientes = self.rng.choices(self.clientes, cum_weights=self.pesos_clientes, k=len(fracciones))
+        ids_pedido = self._nuevos_ids(Pedido, len(fracciones))
+        for pk, fraccion, cliente in zip(ids_pedido, fracciones, clientes):
+            fecha = self._fecha(fraccion)
+            estado = self._estado_pedido(fecha)
+            # Compra en la tienda (el cliente con cuenta) o pedido tomado por un vendedor
+            en_tienda = cliente.user_id is not None and self.rng.random() < 0.5
+            usuario_id = cliente.user_id if en_tienda else self.rng.choice(self.vendedores)
+
+            lineas = self._lineas()
+            total = sum((producto.precio_unitario * cantidad for producto, cantidad in lineas), Decimal('0'))
+            # Último cambio de estado: hasta 3 días después de la compra
+            actualizado = fecha if estado == 'Pendiente' else fecha + timedelta(hours=self.rng.randint(0, 72))
+            pedidos.append(Pedido(
+                id=pk, cliente_id=cliente.id, usuario_id=usuario_id, total=total, estado=estado,
+                direccion_despacho=cliente.direccion, fecha_creacion=fecha,
+                fecha_actualizacion=min(actualizado, self.ahora),
+            ))
+            for producto, cantidad in lineas:
+                lineas_pedido.append(DetallePedido(
+                    pedido_id=pk, producto_id=producto.id, cantidad=cantidad,
+                    precio_unitario_venta=producto.precio_unitario,
+                    subtotal=producto.precio_unitario * cantidad,
+                ))
+            if estado == 'Cancelado':
+                continue
+
+            tipo = 'Factura' if cliente.giro and self.rng.random() < 0.9 else 'Boleta'
+            comuna, ciudad = self.ubicaciones[cliente.id]
+            neto, iva, total_bruto = calcular_iva(total)
+            documentos.append((DocumentoVenta(
+                tipo_documento=tipo, cliente_id=cliente.id, vendedor_id=usuario_id, pedido_id=pk,
+                neto=neto, iva=iva, total=total_bruto, fecha_emision=fecha,
+                fecha_vencimiento=fecha.date() + timedelta(days=DIAS_PLAZO_FACTURA if tipo == 'Factura' else 0),
+                medio_de_pago='Transferencia' if tipo == 'Factura' else self.rng.choice(MEDIOS_PAGO),
+                razon_social=cliente.razon_social, rut=cliente.rut, giro=cliente.giro,
+                direccion=cliente.direccion, comuna=comuna, ciudad=ciudad,
+            ), lineas))
+
+        # Ids y folios de los documentos del lote
+        for pk, (documento, _) in zip(self._nuevos_ids(DocumentoVenta, len(documentos)), documentos):
+            documento.id = pk
+        for tipo in ('Factura', 'Boleta'):
+            del_tipo = [documento for documento, _ in documentos if documento.tipo_documento == tipo]
+            if del_tipo:
+                inicio, _ = reservar_bloque(tipo, len(del_tipo))
+                for folio, documento in enumerate(del_tipo, start=inicio):
+                    documento.folio = folio
+
+        for documento, lineas in documentos:
+            for producto, cantidad in lineas:
+                lineas_documento.append(DetalleDocumento(
+                    documento_id=documento.id, producto_id=producto.id, cantidad=cantidad,
+                    precio_unitario_venta=producto.precio_unitario,
+                    subtotal=producto.precio_unitario * cantidad,
+                    costo_unitario_venta=producto.costo_unitario,
+                ))
+
+            # Algunas facturas tienen una devolución de una de sus líneas
+            devolucion = None
+            if documento.tipo_documento == 'Factura' and len(lineas) > 1 and self.rng.random() < 0.03:
+                devolucion = self.rng.choice(lineas)
+                producto, cantidad = devolucion
+                documento.monto_notas_credito = producto.precio_unitario * cantidad
+                notas.append((NotaCredito(
+                    factura_id=documento.id,
+                    fecha_emision=documento.fecha_emision.date() + timedelta(days=self.rng.randint(1, 20)),
+                    usuario_id=documento.vendedor_id,
+                    motivo="Devolución de producto",
+                    monto=documento.monto_notas_credito,
+                    estado='Aplicada',
+                    creado_en=documento.fecha_emision,
+                ), devolucion))
+
+            documento.estado, cobros = self._cobranza(documento, devolucion)
+            for fecha_pago, monto in cobros:
+                pagos.append(Pago(
+                    documento_id=documento.id, fecha_pago=fecha_pago, monto_pagado=monto,
+                    metodo_pago=documento.medio_de_pago,
+                    referencia="Pago E-Commerce" if documento.tipo_documento == 'Boleta' else f"Transferencia {documento.folio}",
+                ))
+                documento.monto_pagado += monto
+            documento.saldo_pendiente = max(
+                documento.total - documento.monto_pagado - documento.monto_notas_credito, Decimal('0')
+            )
+
+        if notas:
+            inicio, _ = reservar_bloque('NotaCredito', len(notas))
+            ids_nota = self._nuevos_ids(NotaCredito, len(notas))
+            for pk, folio, (nota, (producto, cantidad)) in zip(ids_nota, range(inicio, inicio + len(notas)), notas):
+                nota.id = pk
+                nota.folio = str(folio)
+                nota.fecha_emision = min(nota.fecha_emision, self.hoy)
+                lineas_nota.append(DetalleNotaCredito(
+                    nota_id=pk, producto_id=producto.id, descripcion=producto.nombre,
+                    cantidad=cantidad, precio_unitario=producto.precio_unitario, subtotal=nota.monto,
+                ))
+
+        self._asignar_ids(DetallePedido, lineas_pedido)
+        self._asignar_ids(DetalleDocumento, lineas_documento)
+        self._asignar_ids(Pago, pagos)
+        self._asignar_ids(DetalleNotaCredito, lineas_nota)
+
+        self._insertar(Pedido, pedidos)
+        self._insertar(DetallePedido, lineas_pedido)
+        self._insertar(DocumentoVenta, [documento for documento, _ in documentos])
+        self._insertar(DetalleDocumento, lineas_documento)
+        self._insertar(Pago, pagos)
+        self._insertar(NotaCredito, [nota for nota, _ in notas])
+        self._insertar(DetalleNotaCredito, lineas_nota)
+
+    def _asignar_ids(self, modelo, objetos):
+        for pk, objeto in zip(self._nuevos_ids(modelo, len(objetos)), objetos):
+            objeto.id = pk
+
+    def crear_pedidos(self, cantidad, al_avanzar=None):
+        """Pedidos repartidos en el período, del más antiguo al más reciente, por lotes."""
+        for inicio in range(0, cantidad, self.tamano_lote):
+            fin = min(inicio + self.tamano_lote, cantidad)
+            fracciones = [(posicion + self.rng.random()) / cantidad for posicion in range(inicio, fin)]
+            with transaction.atomic():
+                self.crear_lote(fracciones)
+            if al_avanzar:
+                al_avanzar(fin, cantidad)
+
+
+def generar_datos(pedidos, clientes, productos, proveedores, vendedores,
+                  semilla=1, dias=365, lineas_max=10, tamano_lote=TAMANO_LOTE, al_avanzar=None):
+    """
+    Genera el conjunto completo y retorna {nombre del modelo: filas insertadas}.
+    `al_avanzar(pedidos generados, total)` se llama después de cada lote.
+    """
+    generador = GeneradorDatos(semilla=semilla, dias=dias, lineas_max=lineas_max, tamano_lote=tamano_lote)
+    with transaction.atomic():
+        generador.crear_personal(vendedores)
+        generador.crear_clientes(clientes)
+        generador.crear_proveedores(proveedores)
+        generador.crear_categorias()
+        generador.crear_productos(productos)
+    generador.crear_pedidos(pedidos, al_avanzar=al_avanzar)
+
+    # Con ids explícitos las secuencias de PostgreSQL no avanzan solas
+    modelos = list(generador.ids)
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), modelos):
+            cursor.execute(sql)
+
+    reconstruir()
+    invalidar_catalogo()
+    invalidar_indicadores()
+    if MarcaResumen.objects.filter(nombre=NOMBRE_MARCA, marca__isnull=False).exists():
+        # Las fechas de actualización son históricas: la pasada incremental no las vería
+        actualizar_resumen(completo=True)
+    return generador.conteo
@@ -0,0 +1,356 @@
+"""
+Exportaciones de reportes (XLSX y CSV) con memoria constante.
+
+Las filas llegan desde un generador que recorre el queryset con
+.iterator(chunk_size=...), sin cargar todos los objetos en memoria:
+- CSV: se envía al cliente fila por fila con StreamingHttpResponse.
+- XLSX: se escribe con el Workbook write-only de openpyxl a un archivo
+  temporal (el formato zip no permite enviar bytes antes de cerrarlo) y se
+  responde con FileResponse, que lo lee por bloques.
+"""
+import csv
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, NullIf, Round, TruncMonth
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+
+from apps.ventas.models import Pedido
+from apps.documentos.models import DetalleDocumento
+
+TAMANO_LOTE = 2000
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: retorna la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(encabezados, filas):
+    """Generador de líneas CSV (con BOM para que Excel reconozca UTF-8)."""
+    escritor = csv.writer(_Eco(), delimiter=';')
+    yield '\ufeff' + escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def respuesta_csv(nombre_archivo, encabezados, filas):
+    response = StreamingHttpResponse(
+        generar_csv(encabezados, filas),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
+
+
+def escribir_xlsx(destino, titulo, encabezados, filas, anchos=None, color='4472C4', formatos=None):
+    """
+    Escribe un XLSX en modo write-only (memoria constante) en `destino`
+    (ruta o archivo). `formatos` es {índice_columna: number_format}.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo)
+
+    for letra, ancho in (anchos or {}).items():
+        ws.column_dimensions[letra].width = ancho
+
+    header_fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    header_alignment = Alignment(horizontal="center", vertical="center")
+
+    fila_encabezado = []
+    for texto in encabezados:
+        celda = WriteOnlyCell(ws, value=texto)
+        celda.fill = header_fill
+        celda.font = header_font
+        celda.alignment = header_alignment
+        fila_encabezado.append(celda)
+    ws.append(fila_encabezado)
+
+    formatos = formatos or {}
+    for fila in filas:
+        if formatos:
+            fila = list(fila)
+            for indice, formato in formatos.items():
+                celda = WriteOnlyCell(ws, value=fila[indice])
+                celda.number_format = formato
+                fila[indice] = celda
+        ws.append(fila)
+
+    wb.save(destino)
+
+
+def respuesta_xlsx(nombre_archivo, titulo, encabezados, filas, **opciones):
+    archivo = tempfile.TemporaryFile(suffix='.xlsx')
+    escribir_xlsx(archivo, titulo, encabezados, filas, **opciones)
+    archivo.seek(0)
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=nombre_archivo,
+        content_type=CONTENT_TYPE_XLSX,
+    )
+
+
+# --- Filtros comunes (vistas y trabajos en segundo plano) ---
+
+def filtro_vendedor(prefijo, vendedor):
+    """Q que busca el vendedor por username, nombre o apellido."""
+    return (
+        Q(**{f'{prefijo}__username__icontains': vendedor}) |
+        Q(**{f'{prefijo}__first_name__icontains': vendedor}) |
+        Q(**{f'{prefijo}__last_name__icontains': vendedor})
+    )
+
+
+def pedidos_exportables(fecha_desde=None, fecha_hasta=None, vendedor=None):
+    """Pedidos enviados del período, más recientes primero."""
+    pedidos = Pedido.objects.filter(estado='Enviado').order_by('-fecha_creacion')
+    if fecha_desde:
+        pedidos = pedidos.filter(fecha_creacion__date__gte=fecha_desde)
+    if fecha_hasta:
+        pedidos = pedidos.filter(fecha_creacion__date__lte=fecha_hasta)
+    if vendedor:
+        pedidos = pedidos.filter(filtro_vendedor('usuario', vendedor))
+    return pedidos
+
+
+def detalles_exportables(fecha_desde=None, fecha_hasta=None, vendedor=None):
+    """Líneas de documentos de pedidos enviados, por fecha de emisión."""
+    detalles = DetalleDocumento.objects.filter(
+        documento__pedido__estado='Enviado'
+    ).order_by('-documento__fecha_emision')
+    if fecha_desde:
+        detalles = detalles.filter(documento__fecha_emision__date__gte=fecha_desde)
+    if fecha_hasta:
+        detalles = detalles.filter(documento__fecha_emision__date__lte=fecha_hasta)
+    if vendedor:
+        detalles = detalles.filter(filtro_vendedor('documento__vendedor', vendedor))
+    return detalles
+
+
+# --- Reporte de ventas (exportar_ventas_excel) ---
+
+ENCABEZADOS_VENTAS = ['Pedido #', 'Cliente', 'RUT', 'Vendedor', 'Fecha', 'Estado', 'Total']
+ANCHOS_VENTAS = {'A': 12, 'B': 30, 'C': 15, 'D': 25, 'E': 20, 'F': 15, 'G': 15}
+FORMATO_PESOS = '"$"#,##0'
+
+
+def filas_ventas(pedidos):
+    """Filas del reporte de ventas leídas por lotes, solo con las columnas necesarias."""
+    columnas = pedidos.values_list(
+        'id', 'cliente__razon_social', 'cliente__rut',
+        'usuario__first_name', 'usuario__last_name', 'usuario__username',
+        'fecha_creacion', 'estado', 'documentoventa__total',
+    )
+    for (pedido_id, razon_social, rut, nombre, apellido, username,
+         fecha, estado, total) in columnas.iterator(chunk_size=TAMANO_LOTE):
+        vendedor = f"{nombre or ''} {apellido or ''}".strip() or username or ''
+        yield [
+            pedido_id,
+            razon_social,
+            rut,
+            vendedor,
+            timezone.localtime(fecha).strftime('%d/%m/%Y %H:%M'),
+            estado,
+            total or 0,
+        ]
+
+
+# --- Reporte de rentabilidad (exportar_reporte_rentabilidad) ---
+
+ENCABEZADOS_RENTABILIDAD = [
+    'Fecha Venta', 'Documento', 'Folio', 'Vendedor', 'Cliente',
+    'Proveedor', 'Producto (SKU)', 'Cantidad',
+    'Valor Costo (Unit.)', 'Valor Venta (Unit. Neto)',
+    'Costo Total', 'Venta Total (Neta)', 'Utilidad', 'Margen (%)'
+]
+FORMATO_MARGEN = '0.00"%"'
+
+AGRUPACIONES_RENTABILIDAD = {
+    'mes': ('Mes', 'mes'),
+    'vendedor': ('Vendedor', 'documento__vendedor__username'),
+    'proveedor': ('Proveedor', 'producto__proveedor__razon_social'),
+    'producto': ('Producto (SKU)', 'producto__nombre'),
+    'categoria': ('Categoría', 'producto__categoria__nombre'),
+}
+
+
+def _decimal(max_digits=14):
+    return DecimalField(max_digits=max_digits, decimal_places=2)
+
+
+def _margen(utilidad, venta_neta):
+    """Margen % = utilidad / venta neta * 100 (0 si no hay venta)."""
+    return Case(
+        When(**{f'{venta_neta}__gt': 0},
+             then=Round(F(utilidad) * Value(Decimal('100')) / F(venta_neta), 2, output_field=_decimal())),
+        default=Value(Decimal('0')),
+        output_field=_decimal(),
+    )
+
+
+def anotar_rentabilidad(detalles):
+    """
+    Anota en SQL las columnas de rentabilidad de cada DetalleDocumento
+    (precio neto = bruto / 1.19, costo al momento de la venta o costo actual).
+    """
+    return detalles.annotate(
+        costo_unit=Coalesce(
+            NullIf(F('costo_unitario_venta'), Value(Decimal('0'))),
+            NullIf(F('producto__costo_unitario'), Value(Decimal('0'))),
+            Value(Decimal('0')),
+            output_field=_decimal(),
+        ),
+        venta_neta_unit=Round(
+            ExpressionWrapper(F('precio_unitario_venta') / Value(Decimal('1.19')), output_field=_decimal()),
+            2, output_field=_decimal(),
+        ),
+    ).annotate(
+        costo_total=ExpressionWrapper(F('costo_unit') * F('cantidad'), output_field=_decimal()),
+        venta_neta_total=ExpressionWrapper(F('venta_neta_unit') * F('cantidad'), output_field=_decimal()),
+    ).annotate(
+        utilidad=ExpressionWrapper(F('venta_neta_total') - F('costo_total'), output_field=_decimal()),
+    ).annotate(
+        margen=_margen('utilidad', 'venta_neta_total'),
+    )
+
+
+def filas_rentabilidad(detalles):
+    """Filas detalladas (una por línea vendida), calculadas en la base de datos."""
+    columnas = anotar_rentabilidad(detalles).values_list(
+        'documento__fecha_emision', 'documento__tipo_documento', 'documento__folio',
+        'documento__vendedor__username', 'documento__cliente__razon_social',
+        'producto__proveedor__razon_social', 'producto__nombre', 'cantidad',
+        'costo_unit', 'venta_neta_unit', 'costo_total', 'venta_neta_total',
+        'utilidad', 'margen',
+    )
+    for fila in columnas.iterator(chunk_size=TAMANO_LOTE):
+        fecha, tipo, folio, vendedor, cliente, proveedor, *resto = fila
+        yield [
+            timezone.localtime(fecha).strftime('%d/%m/%Y') if fecha else '',
+            tipo,
+            folio,
+            vendedor or 'N/A',
+            cliente,
+            proveedor or 'N/A',
+            *resto,
+        ]
+
+
+def encabezados_rentabilidad_agrupada(agrupar):
+    return [AGRUPACIONES_RENTABILIDAD[agrupar][0], 'Cantidad', 'Costo Total',
+            'Venta Total (Neta)', 'Utilidad', 'Margen (%)']
+
+
+def filas_rentabilidad_agrupada(detalles, agrupar):
+    """Totales por mes, vendedor, proveedor o producto con GROUP BY en la base de datos."""
+    _, campo = AGRUPACIONES_RENTABILIDAD[agrupar]
+    detalles = anotar_rentabilidad(detalles.order_by())
+    if agrupar == 'mes':
+        detalles = detalles.annotate(mes=TruncMonth('documento__fecha_emision'))
+
+    grupos = (
+        detalles.values(campo)
+        .annotate(
+            total_cantidad=Sum('cantidad'),
+            total_costo=Sum('costo_total'),
+            total_venta=Sum('venta_neta_total'),
+            total_utilidad=Sum('utilidad'),
+        )
+        .annotate(total_margen=_margen('total_utilidad', 'total_venta'))
+        .order_by(campo)
+        .values_list(campo, 'total_cantidad', 'total_costo', 'total_venta',
+                     'total_utilidad', 'total_margen')
+    )
+    for clave, *resto in grupos.iterator(chunk_size=TAMANO_LOTE):
+        if agrupar == 'mes':
+            clave = clave.strftime('%m/%Y') if clave else ''
+        yield [clave or 'N/A', *resto]
+
+
+# --- Reportes completos (usados por las vistas y por los trabajos) ---
+
+TIPOS_REPORTE = ('ventas', 'rentabilidad')
+
+
+def preparar_reporte(tipo, fecha_desde=None, fecha_hasta=None, vendedor=None, agrupar=None):
+    """
+    Arma la definición de un reporte: nombre de archivo, título, encabezados,
+    generador de filas y opciones de formato XLSX. Las filas no se leen hasta
+    que alguien recorre el generador.
+    """
+    hoy = date.today().strftime('%d-%m-%Y')
+
+    if tipo == 'ventas':
+        pedidos = pedidos_exportables(fecha_desde, fecha_hasta, vendedor)
+        return {
+            'nombre_base': f"ventas_{hoy}",
+            'titulo': "Ventas",
+            'encabezados': ENCABEZADOS_VENTAS,
+            'filas': filas_ventas(pedidos),
+            'opciones': {'anchos': ANCHOS_VENTAS, 'color': "4472C4", 'formatos': {6: FORMATO_PESOS}},
+        }
+
+    if tipo == 'rentabilidad':
+        detalles = detalles_exportables(fecha_desde, fecha_hasta, vendedor)
+        nombre_base = f"reporte_rentabilidad_{hoy}"
+        if agrupar in AGRUPACIONES_RENTABILIDAD:
+            # Import local: resumen.py usa las anotaciones de este módulo
+            from apps.ventas.resumen import (
+                resumen_disponible, resumen_exportable, filas_resumen_agrupado
+            )
+            if resumen_disponible():
+                filas = filas_resumen_agrupado(
+                    resumen_exportable(fecha_desde, fecha_hasta, vendedor), agrupar
+                )
+            else:
+                filas = filas_rentabilidad_agrupada(detalles, agrupar)
+            return {
+                'nombre_base': f"{nombre_base}_por_{agrupar}",
+                'titulo': "Reporte de Rentabilidad",
+                'encabezados': encabezados_rentabilidad_agrupada(agrupar),
+                'filas': filas,
+                'opciones': {'color': "1F4E78", 'formatos': {
+                    2: FORMATO_PESOS, 3: FORMATO_PESOS, 4: FORMATO_PESOS, 5: FORMATO_MARGEN}},
+            }
+        return {
+            'nombre_base': nombre_base,
+            'titulo': "Reporte de Rentabilidad",
+            'encabezados': ENCABEZADOS_RENTABILIDAD,
+            'filas': filas_rentabilidad(detalles),
+            'opciones': {'color': "1F4E78", 'formatos': {13: FORMATO_MARGEN}},
+        }
+
+    raise ValueError(f"Tipo de reporte desconocido: {tipo}")
+
+
+def responder_reporte(reporte, formato='xlsx'):
+    """Respuesta HTTP en streaming (CSV) o desde archivo temporal (XLSX)."""
+    if formato == 'csv':
+        return respuesta_csv(f"{reporte['nombre_base']}.csv", reporte['encabezados'], reporte['filas'])
+    return respuesta_xlsx(
+        f"{reporte['nombre_base']}.xlsx", reporte['titulo'],
+        reporte['encabezados'], reporte['filas'], **reporte['opciones']
+    )
+
+
+def escribir_reporte(reporte, formato, destino):
+    """Escribe el reporte en la ruta `destino` (usado por los trabajos en segundo plano)."""
+    if formato == 'csv':
+        with open(destino, 'w', encoding='utf-8', newline='') as archivo:
+            for linea in generar_csv(reporte['encabezados'], reporte['filas']):
+                archivo.write(linea)
+    else:
+        escribir_xlsx(destino, reporte['titulo'], reporte['encabezados'],
+                      reporte['filas'], **reporte['opciones'])
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.ventas.resumen import actualizar_resumen
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza el resumen diario de ventas con los pedidos y productos modificados '
+        'desde la última ejecución (pensado para cron cada pocos minutos, o --continuo). '
+        'Los reportes solo leen el resumen: sin este comando no se actualiza.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo', action='store_true',
+            help='Reconstruye todo el resumen (recomendado una vez al día, recoge pedidos borrados).'
+        )
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Sigue actualizando cada --intervalo segundos en vez de terminar.'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=60.0,
+            help='Segundos de espera entre pasadas en modo continuo.'
+        )
+
+    def handle(self, *args, **options):
+        completo = options['completo']
+        while True:
+            resultado = actualizar_resumen(completo=completo)
+            if resultado['dias'] is None:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Resumen reconstruido: {resultado['filas']} filas."
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{len(resultado['dias'])} días recalculados, {resultado['filas']} filas."
+                ))
+            if not options['continuo']:
+                break
+            # Solo la primera pasada es completa
+            completo = False
+            time.sleep(options['intervalo'])
@@ -0,0 +1,75 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ventas.datos_sinteticos import (
+    CONTRASENA, TAMANO_LOTE, generar_datos, parametros_por_defecto
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos reproducibles (usuarios, clientes, proveedores, productos, '
+        'pedidos, documentos, pagos y notas de crédito) para pruebas de volumen. '
+        'Con --pedidos 180000 se llega a cerca de un millón de líneas de pedido.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=1000, help='Cantidad de pedidos.')
+        parser.add_argument(
+            '--lineas-max', type=int, default=10,
+            help='Máximo de productos por pedido (el promedio queda cerca de la mitad).'
+        )
+        parser.add_argument('--clientes', type=int, help='Por defecto, uno cada 15 pedidos.')
+        parser.add_argument('--productos', type=int, help='Por defecto, uno cada 20 pedidos (50 a 20.000).')
+        parser.add_argument('--proveedores', type=int, help='Por defecto, uno cada 50 productos.')
+        parser.add_argument('--vendedores', type=int, help='Por defecto, uno cada 10.000 pedidos (2 a 50).')
+        parser.add_argument('--dias', type=int, default=365, help='Días de historia hacia atrás desde hoy.')
+        parser.add_argument('--semilla', type=int, default=1, help='Semilla del generador aleatorio.')
+        parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE, help='Pedidos por transacción.')
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help='Permite generar datos con DEBUG=False (¡no usar en producción!).'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['forzar']:
+            raise CommandError('DEBUG=False: esto parece producción. Use --forzar si de verdad quiere generar datos.')
+        if options['pedidos'] < 0 or options['lineas_max'] < 1 or options['tamano_lote'] < 1:
+            raise CommandError('--pedidos no puede ser negativo y --lineas-max y --tamano-lote deben ser al menos 1.')
+
+        parametros = parametros_por_defecto(options['pedidos'])
+        for nombre in parametros:
+            if options[nombre] is not None:
+                parametros[nombre] = options[nombre]
+        if min(parametros.values()) < 1:
+            raise CommandError('Se necesita al menos un cliente, un producto, un proveedor y un vendedor.')
+
+        self.stdout.write(
+            f"Generando {options['pedidos']} pedidos, {parametros['clientes']} clientes, "
+            f"{parametros['productos']} productos, {parametros['proveedores']} proveedores y "
+            f"{parametros['vendedores']} vendedores (semilla {options['semilla']})..."
+        )
+        inicio = time.monotonic()
+
+        def al_avanzar(generados, total):
+            segundos = time.monotonic() - inicio
+            self.stdout.write(f"  {generados}/{total} pedidos ({segundos:.0f} s)")
+
+        conteo = generar_datos(
+            options['pedidos'],
+            semilla=options['semilla'],
+            dias=options['dias'],
+            lineas_max=options['lineas_max'],
+            tamano_lote=options['tamano_lote'],
+            al_avanzar=al_avanzar,
+            **parametros,
+        )
+
+        for modelo, filas in conteo.items():
+            self.stdout.write(f"  {modelo}: {filas}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Datos generados en {time.monotonic() - inicio:.0f} s. "
+            f"Los usuarios generados entran con la contraseña '{CONTRASENA}'."
+        ))
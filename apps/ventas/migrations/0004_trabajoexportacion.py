@@ -0,0 +1,41 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0003_claveidempotencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoExportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ventas', 'Ventas'), ('rentabilidad', 'Rentabilidad')], max_length=20)),
+                ('parametros', models.JSONField(default=dict)),
+                ('clave', models.CharField(max_length=40, verbose_name='Clave de filtros')),
+                ('huella', models.CharField(max_length=40, verbose_name='Huella de datos')),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Procesando', 'Procesando'), ('Listo', 'Listo'), ('Error', 'Error')], default='Pendiente', max_length=20)),
+                ('archivo', models.CharField(blank=True, max_length=255, verbose_name='Archivo generado')),
+                ('nombre_archivo', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Exportación',
+                'verbose_name_plural': 'Trabajos de Exportación',
+                'db_table': 'trabajos_exportacion',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['clave', 'huella'], name='exportacion_clave_idx'), models.Index(fields=['estado', 'fecha_creacion'], name='exportacion_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_reservastock'),
+        ('ventas', '0004_trabajoexportacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaResumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('marca', models.DateTimeField(blank=True, null=True)),
+                ('fecha_ejecucion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Marca de Resumen',
+                'verbose_name_plural': 'Marcas de Resumen',
+                'db_table': 'marcas_resumen',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha de emisión')),
+                ('tipo_documento', models.CharField(max_length=7)),
+                ('unidades', models.IntegerField(default=0)),
+                ('total_bruto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('neto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('costo', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('utilidad', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='productos.categoria')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='productos.producto')),
+                ('vendedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Venta Diaria',
+                'verbose_name_plural': 'Resumen de Ventas Diarias',
+                'db_table': 'resumen_venta_diaria',
+                'indexes': [models.Index(fields=['fecha'], name='resumen_venta_fecha_idx'), models.Index(fields=['vendedor', 'fecha'], name='resumen_venta_vendedor_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,11 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Round
+from django.utils import timezone
+
+from apps.usuarios.indicadores import invalidar_indicadores
 
 class Pedido(models.Model):
     ESTADOS_PEDIDO = (
@@ -46,13 +53,93 @@ class Pedido(models.Model):
     
     def __str__(self):
         return f"Pedido #{self.id} - {self.cliente.razon_social}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidar_indicadores()
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        invalidar_indicadores()
+        return resultado
     
     def calcular_total(self):
-        """Calcula el total sumando los subtotales de los detalles"""
-        total = sum(detalle.subtotal for detalle in self.detalles.all())
+        """Recalcula el total desde los detalles (una agregación y un UPDATE)"""
+        total = self.detalles.aggregate(
+            total=Coalesce(Sum('subtotal'), Value(Decimal('0')))
+        )['total']
+        Pedido.objects.filter(pk=self.pk).update(total=total)
         self.total = total
-        self.save()
         return total
+
+    @staticmethod
+    def recalcular_totales(pedidos=None):
+        """
+        Recalcula en SQL el total de muchos pedidos a la vez con un único
+        UPDATE ... SET total = (SELECT SUM(subtotal) ...), y luego total,
+        neto, IVA y saldo de sus documentos con otro UPDATE que lee ese total.
+        Sirve para reparar totales tras cargas masivas (bulk_create no llama
+        a save()). Retorna la cantidad de pedidos actualizados.
+        """
+        if pedidos is None:
+            pedidos = Pedido.objects.all()
+        suma_detalles = (
+            DetallePedido.objects.filter(pedido=OuterRef('pk'))
+            .order_by()
+            .values('pedido')
+            .annotate(suma=Sum('subtotal'))
+            .values('suma')
+        )
+        actualizados = pedidos.update(
+            total=Coalesce(Subquery(suma_detalles), Value(Decimal('0')))
+        )
+
+        # Import local para evitar el import circular ventas <-> documentos
+        from apps.documentos.models import DocumentoVenta
+        nuevo_total = Subquery(
+            Pedido.objects.filter(pk=OuterRef('pedido_id')).values('total')[:1]
+        )
+        neto = Round(nuevo_total / Decimal('1.19'), 2)
+        DocumentoVenta.objects.filter(pedido__in=pedidos.values('pk')).update(
+            total=nuevo_total,
+            neto=neto,
+            iva=nuevo_total - neto,
+            saldo_pendiente=Greatest(
+                nuevo_total - F('monto_pagado') - F('monto_notas_credito'), Value(Decimal('0'))
+            ),
+        )
+        # Los saldos cambian sin pasar por save() (antigüedad de saldos del panel)
+        invalidar_indicadores()
+        return actualizados
+
+    @staticmethod
+    def aplicar_delta_total(pedido_id, delta):
+        """
+        Ajusta por diferencia el total del pedido y el de su documento asociado
+        (IVA incluido: neto = total / 1.19). Un UPDATE por tabla, sin releer
+        los detalles.
+        """
+        if not delta:
+            return
+        # update() no dispara auto_now: se marca a mano para que las
+        # exportaciones en caché detecten el cambio
+        Pedido.objects.filter(pk=pedido_id).update(
+            total=F('total') + delta, fecha_actualizacion=timezone.now()
+        )
+
+        # Import local para evitar el import circular ventas <-> documentos
+        from apps.documentos.models import DocumentoVenta
+        nuevo_total = F('total') + delta
+        neto = Round(nuevo_total / Decimal('1.19'), 2)
+        DocumentoVenta.objects.filter(pedido_id=pedido_id).update(
+            total=nuevo_total,
+            neto=neto,
+            iva=nuevo_total - neto,
+            saldo_pendiente=Greatest(
+                nuevo_total - F('monto_pagado') - F('monto_notas_credito'), Value(Decimal('0'))
+            ),
+        )
+        invalidar_indicadores()
     
     @property
     def cantidad_items(self):
@@ -64,6 +151,13 @@ class Pedido(models.Model):
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Paginación por cursor del listado de pedidos
+            models.Index(fields=['fecha_creacion', 'id'], name='pedido_fecha_id_idx'),
+            models.Index(fields=['cliente', 'fecha_creacion'], name='pedido_cliente_fecha_idx'),
+            # Pedidos modificados desde la marca del resumen diario
+            models.Index(fields=['fecha_actualizacion'], name='pedido_actualizacion_idx'),
+        ]
 
 class DetallePedido(models.Model):
     pedido = models.ForeignKey(
@@ -91,19 +185,188 @@ class DetallePedido(models.Model):
     def __str__(self):
         return f"{self.producto.nombre} x {self.cantidad}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Valores persistidos, para calcular la diferencia al guardar
+        instancia._pedido_id_guardado = instancia.__dict__.get('pedido_id')
+        instancia._subtotal_guardado = instancia.__dict__.get('subtotal')
+        return instancia
+
     def save(self, *args, **kwargs):
-        """Calcula automáticamente el subtotal al guardar"""
+        """Calcula el subtotal y ajusta el total del pedido por diferencia"""
         self.subtotal = self.cantidad * self.precio_unitario_venta
+
+        pedido_anterior = getattr(self, '_pedido_id_guardado', None)
+        subtotal_anterior = getattr(self, '_subtotal_guardado', None)
+        if self.pk and (pedido_anterior is None or subtotal_anterior is None):
+            pedido_anterior, subtotal_anterior = (
+                DetallePedido.objects.filter(pk=self.pk)
+                .values_list('pedido_id', 'subtotal')
+                .first() or (None, None)
+            )
+
         super().save(*args, **kwargs)
-        self.pedido.calcular_total()
-    
+
+        if pedido_anterior is not None and pedido_anterior != self.pedido_id:
+            Pedido.aplicar_delta_total(pedido_anterior, -(subtotal_anterior or 0))
+            subtotal_anterior = None
+        Pedido.aplicar_delta_total(self.pedido_id, self.subtotal - (subtotal_anterior or 0))
+
+        self._pedido_id_guardado = self.pedido_id
+        self._subtotal_guardado = self.subtotal
+
     def delete(self, *args, **kwargs):
-        """Actualiza el total del pedido al eliminar un detalle"""
-        pedido = self.pedido
-        super().delete(*args, **kwargs)
-        pedido.calcular_total()
+        """Descuenta el subtotal del total del pedido al eliminar un detalle"""
+        pedido_id = self.pedido_id
+        subtotal = getattr(self, '_subtotal_guardado', None)
+        if subtotal is None:
+            subtotal = self.subtotal
+        resultado = super().delete(*args, **kwargs)
+        Pedido.aplicar_delta_total(pedido_id, -(subtotal or 0))
+        return resultado
     
     class Meta:
         db_table = 'detalle_pedido'
         verbose_name = 'Detalle de Pedido'
-        verbose_name_plural = 'Detalles de Pedido'
\ No newline at end of file
+        verbose_name_plural = 'Detalles de Pedido'
+
+class ClaveIdempotencia(models.Model):
+    """
+    Resultado del primer POST de checkout para una clave enviada por el cliente.
+    Los reintentos con la misma clave reciben el mismo documento sin volver a
+    ejecutar la compra.
+    """
+    usuario = models.ForeignKey(
+        'usuarios.Usuario',
+        on_delete=models.CASCADE,
+        related_name='claves_idempotencia'
+    )
+    clave = models.CharField(max_length=64)
+    documento = models.ForeignKey(
+        'documentos.DocumentoVenta',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.usuario_id}:{self.clave}"
+
+    class Meta:
+        db_table = 'claves_idempotencia'
+        verbose_name = 'Clave de Idempotencia'
+        verbose_name_plural = 'Claves de Idempotencia'
+        unique_together = ['usuario', 'clave']
+
+
+class TrabajoExportacion(models.Model):
+    """
+    Exportación generada fuera del request por el worker
+    `procesar_exportaciones`. El archivo queda en disco y se reutiliza mientras
+    la clave (tipo + filtros) y la huella de los datos del período no cambien.
+    """
+    TIPOS = (
+        ('ventas', 'Ventas'),
+        ('rentabilidad', 'Rentabilidad'),
+    )
+    ESTADOS = (
+        ('Pendiente', 'Pendiente'),
+        ('Procesando', 'Procesando'),
+        ('Listo', 'Listo'),
+        ('Error', 'Error'),
+    )
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    parametros = models.JSONField(default=dict)
+    clave = models.CharField(max_length=40, verbose_name='Clave de filtros')
+    huella = models.CharField(max_length=40, verbose_name='Huella de datos')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='Pendiente')
+    archivo = models.CharField(max_length=255, blank=True, verbose_name='Archivo generado')
+    nombre_archivo = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    solicitado_por = models.ForeignKey(
+        'usuarios.Usuario',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Exportación #{self.id} ({self.tipo}) - {self.estado}"
+
+    class Meta:
+        db_table = 'trabajos_exportacion'
+        verbose_name = 'Trabajo de Exportación'
+        verbose_name_plural = 'Trabajos de Exportación'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['clave', 'huella'], name='exportacion_clave_idx'),
+            models.Index(fields=['estado', 'fecha_creacion'], name='exportacion_estado_idx'),
+        ]
+
+
+class ResumenVentaDiaria(models.Model):
+    """
+    Ventas pre-agregadas por día, vendedor, producto y tipo de documento
+    (solo pedidos enviados, como los reportes). La mantiene el comando
+    `actualizar_resumen_ventas` y la leen los reportes agrupados.
+    """
+    fecha = models.DateField(verbose_name='Fecha de emisión')
+    vendedor = models.ForeignKey(
+        'usuarios.Usuario',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    producto = models.ForeignKey(
+        'productos.Producto',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    categoria = models.ForeignKey(
+        'productos.Categoria',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    tipo_documento = models.CharField(max_length=7)
+    unidades = models.IntegerField(default=0)
+    total_bruto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    neto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    utilidad = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.fecha} - {self.producto_id} x {self.unidades}"
+
+    class Meta:
+        db_table = 'resumen_venta_diaria'
+        verbose_name = 'Resumen de Venta Diaria'
+        verbose_name_plural = 'Resumen de Ventas Diarias'
+        indexes = [
+            models.Index(fields=['fecha'], name='resumen_venta_fecha_idx'),
+            models.Index(fields=['vendedor', 'fecha'], name='resumen_venta_vendedor_idx'),
+        ]
+
+
+class MarcaResumen(models.Model):
+    """Hasta qué `fecha_actualizacion` de pedidos y productos está incorporado un resumen."""
+    nombre = models.CharField(max_length=50, unique=True)
+    marca = models.DateTimeField(null=True, blank=True)
+    fecha_ejecucion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.marca}"
+
+    class Meta:
+        db_table = 'marcas_resumen'
+        verbose_name = 'Marca de Resumen'
+        verbose_name_plural = 'Marcas de Resumen'
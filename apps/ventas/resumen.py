@@ -0,0 +1,225 @@
+"""
+Resumen diario de ventas (ResumenVentaDiaria).
+
+Una fila por día de emisión, vendedor, producto y tipo de documento con
+unidades, bruto, neto, costo y utilidad, calculados con las mismas
+anotaciones que el reporte de rentabilidad. Los reportes agrupados por mes,
+vendedor, proveedor, producto o categoría leen estas filas en vez de recorrer
+todas las líneas de DetalleDocumento del período.
+
+La actualización es incremental y la hace solo el comando
+`actualizar_resumen_ventas` (cron o --continuo); los reportes únicamente
+leen. MarcaResumen guarda la mayor `fecha_actualizacion` de pedidos y
+productos ya incorporada y en cada pasada solo se recalculan los días de
+emisión de los pedidos modificados (o documentos emitidos) después de esa
+marca, y los días con líneas sin costo guardado de productos modificados
+después de ella (esas líneas usan el costo actual del producto). Borrar un
+pedido no mueve la marca, por eso conviene una reconstrucción completa
+periódica (`--completo`).
+"""
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from apps.ventas.models import Pedido, ResumenVentaDiaria, MarcaResumen
+from apps.documentos.models import DocumentoVenta, DetalleDocumento
+from apps.productos.models import Producto
+from apps.ventas.exportaciones import (
+    TAMANO_LOTE, anotar_rentabilidad, filtro_vendedor
+)
+
+NOMBRE_MARCA = 'ventas_diarias'
+
+# Se vuelve a mirar un poco antes de la marca para no perder pedidos (o
+# productos) cuya transacción hizo commit después de leerla
+SOLAPAMIENTO = timedelta(minutes=5)
+
+AGRUPACIONES_RESUMEN = {
+    'mes': 'mes',
+    'vendedor': 'vendedor__username',
+    'proveedor': 'producto__proveedor__razon_social',
+    'producto': 'producto__nombre',
+    'categoria': 'categoria__nombre',
+}
+
+
+def _lineas_agrupadas(dias=None):
+    """GROUP BY día/vendedor/producto/tipo sobre las líneas de pedidos enviados."""
+    detalles = DetalleDocumento.objects.filter(
+        documento__pedido__estado='Enviado',
+        documento__fecha_emision__isnull=False,
+    ).order_by()
+    if dias is not None:
+        detalles = detalles.filter(documento__fecha_emision__date__in=dias)
+
+    return (
+        anotar_rentabilidad(detalles)
+        .annotate(dia=TruncDate('documento__fecha_emision'))
+        .values('dia', 'documento__vendedor_id', 'producto_id',
+                'producto__categoria_id', 'documento__tipo_documento')
+        .annotate(
+            total_unidades=Sum('cantidad'),
+            total_bruto_dia=Sum('subtotal'),
+            total_neto=Sum('venta_neta_total'),
+            total_costo=Sum('costo_total'),
+            total_utilidad=Sum('utilidad'),
+        )
+    )
+
+
+def _insertar(grupos):
+    """Inserta los grupos por lotes con bulk_create. Retorna cuántas filas."""
+    insertadas = 0
+    lote = []
+    for grupo in grupos.iterator(chunk_size=TAMANO_LOTE):
+        lote.append(ResumenVentaDiaria(
+            fecha=grupo['dia'],
+            vendedor_id=grupo['documento__vendedor_id'],
+            producto_id=grupo['producto_id'],
+            categoria_id=grupo['producto__categoria_id'],
+            tipo_documento=grupo['documento__tipo_documento'],
+            unidades=grupo['total_unidades'] or 0,
+            total_bruto=grupo['total_bruto_dia'] or 0,
+            neto=grupo['total_neto'] or 0,
+            costo=grupo['total_costo'] or 0,
+            utilidad=grupo['total_utilidad'] or 0,
+        ))
+        if len(lote) >= TAMANO_LOTE:
+            ResumenVentaDiaria.objects.bulk_create(lote)
+            insertadas += len(lote)
+            lote = []
+    if lote:
+        ResumenVentaDiaria.objects.bulk_create(lote)
+        insertadas += len(lote)
+    return insertadas
+
+
+def _dias(documentos):
+    return set(
+        documentos.filter(fecha_emision__isnull=False)
+        .annotate(dia=TruncDate('fecha_emision'))
+        .order_by()
+        .values_list('dia', flat=True)
+        .distinct()
+    )
+
+
+def dias_modificados(desde):
+    """
+    Días de emisión con pedidos modificados o documentos emitidos después de
+    `desde`, más los días con líneas sin costo guardado de productos
+    modificados después de `desde`. Una consulta por condición, para que
+    cada una use su índice (un OR entre tablas no puede).
+    """
+    productos = Producto.objects.filter(fecha_actualizacion__gt=desde).values('pk')
+    lineas_costo_actual = DetalleDocumento.objects.filter(
+        Q(costo_unitario_venta__isnull=True) | Q(costo_unitario_venta=0),
+        producto__in=productos,
+    ).values('documento_id')
+    return (
+        _dias(DocumentoVenta.objects.filter(pedido__fecha_actualizacion__gt=desde))
+        | _dias(DocumentoVenta.objects.filter(fecha_emision__gt=desde))
+        | _dias(DocumentoVenta.objects.filter(pk__in=lineas_costo_actual))
+    )
+
+
+def actualizar_resumen(completo=False):
+    """
+    Incorpora al resumen los cambios desde la última marca (o lo reconstruye
+    entero con `completo=True` o si nunca se ha calculado). La fila de la
+    marca se bloquea, así que dos actualizaciones concurrentes se turnan.
+    Retorna {'dias': días recalculados (None = todos), 'filas': filas insertadas}.
+    """
+    with transaction.atomic():
+        marca, _ = MarcaResumen.objects.select_for_update().get_or_create(nombre=NOMBRE_MARCA)
+        # La nueva marca se lee ANTES de recorrer los datos: lo que cambie
+        # durante la pasada entra en la siguiente
+        ultimas = [
+            modelo.objects.aggregate(ultima=Max('fecha_actualizacion'))['ultima']
+            for modelo in (Pedido, Producto)
+        ]
+        nueva_marca = max((ultima for ultima in ultimas if ultima is not None), default=None)
+
+        if completo or marca.marca is None:
+            ResumenVentaDiaria.objects.all().delete()
+            resultado = {'dias': None, 'filas': _insertar(_lineas_agrupadas())}
+        else:
+            dias = dias_modificados(marca.marca - SOLAPAMIENTO)
+            filas = 0
+            if dias:
+                ResumenVentaDiaria.objects.filter(fecha__in=dias).delete()
+                filas = _insertar(_lineas_agrupadas(dias))
+            resultado = {'dias': sorted(dias), 'filas': filas}
+
+        if nueva_marca is not None and (marca.marca is None or nueva_marca > marca.marca):
+            marca.marca = nueva_marca
+        elif marca.marca is None:
+            # Sin pedidos todavía: cualquier pedido futuro queda después de ahora
+            marca.marca = timezone.now()
+        marca.save()
+
+    return resultado
+
+
+def resumen_disponible():
+    """
+    True si los reportes pueden leer del resumen: está habilitado en settings
+    y ya se calculó alguna vez. Solo lee: los cambios los incorpora el comando
+    `actualizar_resumen_ventas`, así que el resumen va atrasado a lo más un
+    intervalo del cron.
+    """
+    if not getattr(settings, 'REPORTES_USAR_RESUMEN_DIARIO', True):
+        return False
+    return MarcaResumen.objects.filter(nombre=NOMBRE_MARCA, marca__isnull=False).exists()
+
+
+def resumen_exportable(fecha_desde=None, fecha_hasta=None, vendedor=None):
+    """Filas del resumen del período, con los mismos filtros que los reportes."""
+    resumen = ResumenVentaDiaria.objects.order_by()
+    if fecha_desde:
+        resumen = resumen.filter(fecha__gte=fecha_desde)
+    if fecha_hasta:
+        resumen = resumen.filter(fecha__lte=fecha_hasta)
+    if vendedor:
+        resumen = resumen.filter(filtro_vendedor('vendedor', vendedor))
+    return resumen
+
+
+def _margen(utilidad, venta_neta):
+    """Margen % redondeado a 2 decimales (0 si no hay venta)."""
+    if not venta_neta:
+        return Decimal('0')
+    margen = Decimal(utilidad) * 100 / Decimal(venta_neta)
+    return margen.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def filas_resumen_agrupado(resumen, agrupar):
+    """
+    Mismas columnas que filas_rentabilidad_agrupada, sumando días ya agregados.
+    El margen se calcula aquí (son pocas filas): en SQLite los montos enteros
+    del resumen se guardan como INTEGER y la división en SQL quedaría entera.
+    """
+    campo = AGRUPACIONES_RESUMEN[agrupar]
+    if agrupar == 'mes':
+        resumen = resumen.annotate(mes=TruncMonth('fecha'))
+
+    grupos = (
+        resumen.values(campo)
+        .annotate(
+            total_cantidad=Sum('unidades'),
+            total_costo=Sum('costo'),
+            total_venta=Sum('neto'),
+            total_utilidad=Sum('utilidad'),
+        )
+        .order_by(campo)
+        .values_list(campo, 'total_cantidad', 'total_costo', 'total_venta', 'total_utilidad')
+    )
+    for clave, cantidad, costo, venta, utilidad in grupos.iterator(chunk_size=TAMANO_LOTE):
+        if agrupar == 'mes':
+            clave = clave.strftime('%m/%Y') if clave else ''
+        yield [clave or 'N/A', cantidad, costo, venta, utilidad, _margen(utilidad, venta)]
@@ -1,3 +1,269 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.messages import get_messages
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.clientes.models import Cliente
+from apps.documentos.models import DetalleDocumento, DocumentoVenta
+from apps.productos.models import Categoria, Producto, ReservaStock
+from apps.productos.reservas import clave_carrito, clave_pedido, reservar
+from apps.usuarios.models import Usuario
+from apps.ventas.checkout import StockInsuficiente, descontar_stock, procesar_checkout
+from apps.ventas.models import ClaveIdempotencia, DetallePedido, Pedido, ResumenVentaDiaria
+from apps.ventas.resumen import actualizar_resumen, resumen_disponible
+
+
+class DatosVentaMixin:
+    """Cliente, vendedor y dos productos (stock 5 y 1) para las pruebas de ventas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user('cliente', 'cliente@ticashop.cl', 'clave', rol='Cliente')
+        cls.vendedor = Usuario.objects.create_user('vendedor', 'vendedor@ticashop.cl', 'clave', rol='Vendedor')
+        cls.cliente = Cliente.objects.create(
+            user=cls.usuario, rut='11111111-1', razon_social='Cliente SpA',
+            email_facturacion='cliente@ticashop.cl',
+        )
+        categoria = Categoria.objects.create(nombre='Redes')
+        cls.mouse = Producto.objects.create(
+            codigo='MOU-1', nombre='Mouse', precio_unitario=Decimal('1190'),
+            costo_unitario=Decimal('500'), stock=5, categoria=categoria,
+        )
+        cls.monitor = Producto.objects.create(
+            codigo='MON-1', nombre='Monitor', precio_unitario=Decimal('119000'),
+            costo_unitario=Decimal('60000'), stock=1, categoria=categoria,
+        )
+
+    def stock(self, producto):
+        return Producto.objects.values_list('stock', flat=True).get(pk=producto.pk)
+
+
+class DescontarStockTests(DatosVentaMixin, TestCase):
+
+    def test_descuenta_todos_los_productos(self):
+        with transaction.atomic():
+            filas = descontar_stock({self.mouse.id: 2, self.monitor.id: 1})
+
+        self.assertEqual(filas, 2)
+        self.assertEqual(self.stock(self.mouse), 3)
+        self.assertEqual(self.stock(self.monitor), 0)
+
+    def test_sobreventa_no_descuenta_nada(self):
+        with self.assertRaises(StockInsuficiente) as error:
+            with transaction.atomic():
+                descontar_stock({self.mouse.id: 2, self.monitor.id: 2})
+
+        self.assertEqual([p.id for p in error.exception.productos], [self.monitor.id])
+        # El rollback deshace también el descuento del producto que sí alcanzaba
+        self.assertEqual(self.stock(self.mouse), 5)
+        self.assertEqual(self.stock(self.monitor), 1)
+
+    def test_respeta_reservas_de_otros_carritos(self):
+        reservar('carrito:otro', self.mouse, 5)
+
+        with self.assertRaises(StockInsuficiente):
+            with transaction.atomic():
+                descontar_stock({self.mouse.id: 3}, clave_carrito(self.usuario))
+
+        self.assertEqual(self.stock(self.mouse), 5)
+
+    def test_usa_la_reserva_propia(self):
+        clave = clave_carrito(self.usuario)
+        reservar('carrito:otro', self.mouse, 2)
+        reservar(clave, self.mouse, 3)
+
+        with transaction.atomic():
+            descontar_stock({self.mouse.id: 3}, clave)
+
+        self.assertEqual(self.stock(self.mouse), 2)
+
+
+class ConfirmarPedidoTests(DatosVentaMixin, TestCase):
+
+    def setUp(self):
+        self.pedido = Pedido.objects.create(cliente=self.cliente, usuario=self.vendedor, estado='Pendiente')
+        DetallePedido.objects.create(
+            pedido=self.pedido, producto=self.mouse, cantidad=3, precio_unitario_venta=Decimal('1190'),
+        )
+        self.client.force_login(self.vendedor)
+
+    def confirmar(self):
+        return self.client.post(reverse('ventas:confirmar_pedido', args=[self.pedido.id]))
+
+    def estado(self):
+        return Pedido.objects.values_list('estado', flat=True).get(pk=self.pedido.pk)
+
+    def test_descuenta_el_stock_y_libera_la_reserva_del_pedido(self):
+        reservar('carrito:otro', self.mouse, 2)
+        reservar(clave_pedido(self.pedido), self.mouse, 3)
+
+        self.confirmar()
+
+        self.assertEqual(self.estado(), 'Procesando')
+        self.assertEqual(self.stock(self.mouse), 2)
+        self.assertFalse(ReservaStock.objects.filter(clave=clave_pedido(self.pedido)).exists())
+
+    def test_respeta_las_reservas_de_otros_carritos(self):
+        reservar('carrito:otro', self.mouse, 4)
+
+        respuesta = self.confirmar()
+
+        self.assertEqual(self.estado(), 'Pendiente')
+        self.assertEqual(self.stock(self.mouse), 5)
+        mensajes = [str(mensaje) for mensaje in get_messages(respuesta.wsgi_request)]
+        self.assertIn('Mouse: Solicitado 3, Disponible 1', mensajes[0])
+
+
+class TotalesPedidoTests(DatosVentaMixin, TestCase):
+
+    def crear_pedido(self):
+        pedido = Pedido.objects.create(cliente=self.cliente, usuario=self.vendedor, total=0)
+        documento = DocumentoVenta.objects.create(
+            tipo_documento='Factura', cliente=self.cliente, pedido=pedido,
+        )
+        return pedido, documento
+
+    def test_save_del_detalle_ajusta_pedido_y_documento(self):
+        pedido, documento = self.crear_pedido()
+        detalle = DetallePedido.objects.create(
+            pedido=pedido, producto=self.mouse, cantidad=2, precio_unitario_venta=Decimal('1190'),
+        )
+        detalle.cantidad = 3
+        detalle.save()
+
+        pedido.refresh_from_db()
+        documento.refresh_from_db()
+        self.assertEqual(pedido.total, Decimal('3570'))
+        self.assertEqual(documento.total, Decimal('3570'))
+        self.assertEqual(documento.neto, Decimal('3000'))
+        self.assertEqual(documento.iva, Decimal('570'))
+        self.assertEqual(documento.saldo_pendiente, Decimal('3570'))
+
+    def test_aplicar_delta_y_recalcular_coinciden(self):
+        pedido, documento = self.crear_pedido()
+        DetallePedido.objects.create(
+            pedido=pedido, producto=self.mouse, cantidad=2, precio_unitario_venta=Decimal('1190'),
+        )
+        pedido.refresh_from_db()
+        documento.refresh_from_db()
+        por_delta = (pedido.total, documento.total, documento.neto, documento.iva, documento.saldo_pendiente)
+
+        # Se desordenan los totales y se reparan desde los detalles
+        Pedido.objects.filter(pk=pedido.pk).update(total=0)
+        DocumentoVenta.objects.filter(pk=documento.pk).update(total=0, neto=0, iva=0, saldo_pendiente=0)
+        self.assertEqual(Pedido.recalcular_totales(Pedido.objects.filter(pk=pedido.pk)), 1)
+
+        pedido.refresh_from_db()
+        documento.refresh_from_db()
+        self.assertEqual(
+            (pedido.total, documento.total, documento.neto, documento.iva, documento.saldo_pendiente),
+            por_delta,
+        )
+
+    def test_recalcular_pedido_sin_detalles_queda_en_cero(self):
+        pedido, documento = self.crear_pedido()
+        Pedido.objects.filter(pk=pedido.pk).update(total=Decimal('1000'))
+
+        Pedido.recalcular_totales()
+
+        pedido.refresh_from_db()
+        documento.refresh_from_db()
+        self.assertEqual(pedido.total, Decimal('0'))
+        self.assertEqual(documento.total, Decimal('0'))
+
+
+class CheckoutIdempotenteTests(DatosVentaMixin, TestCase):
+
+    def comprar(self, clave_idempotencia):
+        return procesar_checkout(
+            self.cliente, self.usuario, {str(self.mouse.id): 2}, 'Boleta', 'Efectivo',
+            clave_reserva=clave_carrito(self.usuario), clave_idempotencia=clave_idempotencia,
+        )
+
+    def test_reintento_retorna_el_documento_original(self):
+        reservar(clave_carrito(self.usuario), self.mouse, 2)
+
+        primero = self.comprar('clave-1')
+        segundo = self.comprar('clave-1')
+
+        self.assertEqual(primero.pk, segundo.pk)
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertEqual(ClaveIdempotencia.objects.get(clave='clave-1').documento_id, primero.pk)
+        self.assertEqual(self.stock(self.mouse), 3)
+        # La compra libera la reserva del carrito
+        self.assertFalse(ReservaStock.objects.filter(clave=clave_carrito(self.usuario)).exists())
+
+    def test_otra_clave_es_otra_compra(self):
+        primero = self.comprar('clave-1')
+        segundo = self.comprar('clave-2')
+
+        self.assertNotEqual(primero.pk, segundo.pk)
+        self.assertEqual(self.stock(self.mouse), 1)
+
+    def test_sin_stock_no_deja_clave_registrada(self):
+        with self.assertRaises(StockInsuficiente):
+            procesar_checkout(
+                self.cliente, self.usuario, {str(self.monitor.id): 2}, 'Boleta', 'Efectivo',
+                clave_idempotencia='clave-1',
+            )
+
+        self.assertFalse(ClaveIdempotencia.objects.exists())
+        self.assertFalse(Pedido.objects.exists())
+
+
+class ResumenDiarioTests(DatosVentaMixin, TestCase):
+
+    def vender(self, costo_unitario_venta):
+        """Venta de hace 3 días (fuera del solapamiento de la marca)."""
+        hace_dias = timezone.now() - timedelta(days=3)
+        pedido = Pedido.objects.create(cliente=self.cliente, usuario=self.vendedor, estado='Enviado')
+        documento = DocumentoVenta.objects.create(
+            tipo_documento='Boleta', cliente=self.cliente, vendedor=self.vendedor,
+            pedido=pedido, fecha_emision=hace_dias,
+        )
+        detalle = DetalleDocumento.objects.create(
+            documento=documento, producto=self.mouse, cantidad=2, precio_unitario_venta=Decimal('1190'),
+        )
+        # save() copia el costo actual; las líneas antiguas o cargadas en bloque pueden no tenerlo
+        DetalleDocumento.objects.filter(pk=detalle.pk).update(costo_unitario_venta=costo_unitario_venta)
+        Pedido.objects.filter(pk=pedido.pk).update(fecha_actualizacion=hace_dias)
+        Producto.objects.filter(pk=self.mouse.pk).update(fecha_actualizacion=hace_dias)
+        return documento
+
+    def costo_resumen(self):
+        return sum(ResumenVentaDiaria.objects.values_list('costo', flat=True))
+
+    def test_cambio_de_costo_recalcula_las_lineas_sin_costo_guardado(self):
+        self.vender(costo_unitario_venta=None)
+        actualizar_resumen(completo=True)
+        self.assertEqual(self.costo_resumen(), Decimal('1000'))
+
+        self.mouse.costo_unitario = Decimal('700')
+        self.mouse.save()
+        actualizar_resumen()
+
+        self.assertEqual(self.costo_resumen(), Decimal('1400'))
+
+    def test_cambio_de_costo_no_toca_las_lineas_con_costo_guardado(self):
+        self.vender(costo_unitario_venta=Decimal('500'))
+        actualizar_resumen(completo=True)
+
+        self.mouse.costo_unitario = Decimal('700')
+        self.mouse.save()
+        resultado = actualizar_resumen()
+
+        self.assertEqual(resultado['dias'], [])
+        self.assertEqual(self.costo_resumen(), Decimal('1000'))
+
+    def test_los_reportes_solo_leen_el_resumen(self):
+        self.assertFalse(resumen_disponible())
+        actualizar_resumen(completo=True)
+        self.vender(costo_unitario_venta=None)
 
-# Create your tests here.
+        with self.assertNumQueries(1):
+            self.assertTrue(resumen_disponible())
+        self.assertFalse(ResumenVentaDiaria.objects.exists())
@@ -0,0 +1,208 @@
+"""
+Trabajos de exportación en segundo plano.
+
+La vista solo registra el TrabajoExportacion; el comando
+`procesar_exportaciones` lo toma, escribe el archivo en
+settings.EXPORTACIONES_DIR y lo marca como Listo. Un trabajo Listo se
+reutiliza para cualquier solicitud con los mismos filtros (clave) mientras la
+huella de los datos del período no cambie, es decir, hasta que entren o se
+modifiquen ventas dentro de ese rango (o cambien los productos y proveedores
+que el reporte de rentabilidad muestra, o avance el resumen diario del que
+leen los reportes agrupados).
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from apps.clientes.models import Proveedor
+from apps.ventas.models import TrabajoExportacion, MarcaResumen
+from apps.ventas.exportaciones import (
+    AGRUPACIONES_RENTABILIDAD, preparar_reporte, escribir_reporte,
+    pedidos_exportables, detalles_exportables
+)
+from apps.ventas.resumen import NOMBRE_MARCA
+from ticashop import colas
+from ticashop.metricas import Histograma
+
+logger = logging.getLogger(__name__)
+
+DURACION_EXPORTACION = Histograma(
+    'ticashop_exportacion_duracion_segundos',
+    'Duración de la generación de exportaciones, por tipo, formato y resultado',
+    etiquetas=('tipo', 'formato', 'resultado'),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+
+def normalizar_parametros(tipo, datos):
+    """Filtros aceptados por cada tipo de reporte, como strings ('' si no vienen)."""
+    parametros = {
+        'fecha_desde': (datos.get('fecha_desde') or '').strip(),
+        'fecha_hasta': (datos.get('fecha_hasta') or '').strip(),
+        'vendedor': (datos.get('vendedor') or '').strip(),
+        'formato': 'csv' if datos.get('formato') == 'csv' else 'xlsx',
+        'agrupar': '',
+    }
+    if tipo == 'rentabilidad':
+        parametros['agrupar'] = (datos.get('agrupar') or '').strip()
+    for campo in ('fecha_desde', 'fecha_hasta'):
+        if parametros[campo]:
+            # Lanza ValueError si la fecha no es YYYY-MM-DD
+            date.fromisoformat(parametros[campo])
+    return parametros
+
+
+def _filtros(parametros):
+    fecha_desde = parametros['fecha_desde'] or None
+    fecha_hasta = parametros['fecha_hasta'] or None
+    return (
+        date.fromisoformat(fecha_desde) if fecha_desde else None,
+        date.fromisoformat(fecha_hasta) if fecha_hasta else None,
+        parametros['vendedor'] or None,
+    )
+
+
+def _hash(valor):
+    return hashlib.sha1(json.dumps(valor, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def calcular_clave(tipo, parametros):
+    return _hash([tipo, parametros])
+
+
+def calcular_huella(tipo, parametros):
+    """
+    Resumen barato (una agregación) de los datos que entran en el reporte:
+    cantidad de filas, suma de montos y última modificación de los pedidos.
+    La rentabilidad además usa el costo actual del producto cuando la línea no
+    lo guardó y muestra el proveedor, y la agrupada lee del resumen diario:
+    también entran la última modificación de los productos, los proveedores y
+    la marca del resumen.
+    """
+    fecha_desde, fecha_hasta, vendedor = _filtros(parametros)
+    if tipo == 'ventas':
+        resumen = pedidos_exportables(fecha_desde, fecha_hasta, vendedor).order_by().aggregate(
+            filas=Count('id'),
+            monto=Sum('documentoventa__total'),
+            ultima=Max('fecha_actualizacion'),
+        )
+    else:
+        resumen = detalles_exportables(fecha_desde, fecha_hasta, vendedor).order_by().aggregate(
+            filas=Count('id'),
+            monto=Sum('subtotal'),
+            ultima=Max('documento__pedido__fecha_actualizacion'),
+            productos=Max('producto__fecha_actualizacion'),
+        )
+        # Proveedor no tiene fecha de modificación; son pocas filas
+        resumen['proveedores'] = list(Proveedor.objects.order_by('id').values_list('id', 'razon_social'))
+        if parametros.get('agrupar') in AGRUPACIONES_RENTABILIDAD:
+            resumen['resumen'] = (
+                MarcaResumen.objects.filter(nombre=NOMBRE_MARCA).values_list('marca', flat=True).first()
+            )
+    return _hash(resumen)
+
+
+def ruta_archivo(trabajo):
+    return Path(settings.EXPORTACIONES_DIR) / trabajo.archivo
+
+
+def archivo_disponible(trabajo):
+    return trabajo.estado == 'Listo' and bool(trabajo.archivo) and ruta_archivo(trabajo).exists()
+
+
+def solicitar_exportacion(tipo, parametros, usuario=None):
+    """
+    Retorna el trabajo que atiende la solicitud: uno Listo con el mismo
+    archivo vigente, uno en curso con los mismos filtros, o uno nuevo Pendiente.
+    """
+    clave = calcular_clave(tipo, parametros)
+    huella = calcular_huella(tipo, parametros)
+    limite_abandono = timezone.now() - timedelta(minutes=colas.MINUTOS_TRABAJO_ABANDONADO)
+
+    candidatos = (
+        TrabajoExportacion.objects.filter(clave=clave, huella=huella)
+        .exclude(estado='Error')
+        .order_by('-fecha_creacion')[:5]
+    )
+    for trabajo in candidatos:
+        if trabajo.estado == 'Pendiente':
+            return trabajo
+        if trabajo.estado == 'Procesando' and trabajo.fecha_inicio and trabajo.fecha_inicio > limite_abandono:
+            return trabajo
+        if archivo_disponible(trabajo):
+            return trabajo
+
+    return TrabajoExportacion.objects.create(
+        tipo=tipo,
+        parametros=parametros,
+        clave=clave,
+        huella=huella,
+        solicitado_por=usuario,
+    )
+
+
+def tomar_siguiente():
+    return colas.tomar_siguiente(TrabajoExportacion)
+
+
+def ejecutar(trabajo):
+    """Genera el archivo del trabajo en disco y lo marca como Listo (o Error)."""
+    parametros = trabajo.parametros
+    fecha_desde, fecha_hasta, vendedor = _filtros(parametros)
+    formato = parametros.get('formato', 'xlsx')
+    inicio = time.perf_counter()
+
+    try:
+        reporte = preparar_reporte(
+            trabajo.tipo, fecha_desde, fecha_hasta, vendedor, parametros.get('agrupar') or None
+        )
+        directorio = Path(settings.EXPORTACIONES_DIR)
+        directorio.mkdir(parents=True, exist_ok=True)
+
+        nombre_archivo = f"{reporte['nombre_base']}.{formato}"
+        archivo = f"{trabajo.id}_{trabajo.clave[:12]}.{formato}"
+        temporal = directorio / f"{archivo}.tmp"
+
+        escribir_reporte(reporte, formato, temporal)
+        os.replace(temporal, directorio / archivo)
+    except Exception as e:
+        logger.exception(f"Error en exportación #{trabajo.id}")
+        trabajo.estado = 'Error'
+        trabajo.error = str(e)
+        trabajo.fecha_fin = timezone.now()
+        trabajo.save(update_fields=['estado', 'error', 'fecha_fin'])
+        DURACION_EXPORTACION.observe(
+            time.perf_counter() - inicio, tipo=trabajo.tipo, formato=formato, resultado='error'
+        )
+        return trabajo
+
+    trabajo.estado = 'Listo'
+    trabajo.archivo = archivo
+    trabajo.nombre_archivo = nombre_archivo
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=['estado', 'archivo', 'nombre_archivo', 'fecha_fin'])
+    DURACION_EXPORTACION.observe(
+        time.perf_counter() - inicio, tipo=trabajo.tipo, formato=formato, resultado='ok'
+    )
+    return trabajo
+
+
+def procesar_pendientes(limite=None):
+    return colas.procesar_pendientes(TrabajoExportacion, ejecutar, limite)
+
+
+def reencolar_abandonados():
+    return colas.reencolar_abandonados(TrabajoExportacion)
+
+
+def purgar(dias):
+    """Borra los trabajos (y sus archivos) con más de `dias` de antigüedad."""
+    return colas.purgar(TrabajoExportacion, dias, ruta_archivo)
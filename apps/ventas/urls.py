@@ -44,4 +44,9 @@ urlpatterns = [
     
     # --- AÑADE ESTA LÍNEA ---
     path('exportar/rentabilidad/', views.exportar_reporte_rentabilidad, name='exportar_reporte_rentabilidad'),
+
+    # Exportaciones en segundo plano (worker: manage.py procesar_exportaciones)
+    path('exportaciones/<str:tipo>/solicitar/', views.solicitar_exportacion, name='solicitar_exportacion'),
+    path('exportaciones/<int:trabajo_id>/', views.estado_exportacion, name='estado_exportacion'),
+    path('exportaciones/<int:trabajo_id>/descargar/', views.descargar_exportacion, name='descargar_exportacion'),
 ]
\ No newline at end of file
@@ -3,17 +3,36 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction, models
 from decimal import Decimal
-from datetime import timedelta, date, datetime
+from datetime import timedelta, date, datetime, timezone as dt_timezone
+import logging
+import time
+import uuid
 from django.utils import timezone
-from django.http import HttpResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from django.db.models import Sum, Count
+from django.http import JsonResponse, FileResponse
+from django.conf import settings
+from django.db.models import Sum, Count, Value, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.core.paginator import Paginator
 
-from apps.ventas.models import Pedido, DetallePedido
+from apps.ventas.models import Pedido, DetallePedido, TrabajoExportacion
 from apps.productos.models import Producto
 from apps.clientes.models import Cliente
+from apps.usuarios.models import Usuario
 from apps.documentos.models import DocumentoVenta, DetalleDocumento, Pago
+from apps.ventas.checkout import (
+    procesar_checkout, buscar_checkout_previo, descontar_stock, StockInsuficiente
+)
+from apps.ventas.exportaciones import (
+    preparar_reporte, responder_reporte, pedidos_exportables, CONTENT_TYPE_XLSX
+)
+from apps.ventas.trabajos import (
+    normalizar_parametros, archivo_disponible, ruta_archivo,
+    solicitar_exportacion as solicitar_exportacion_en_cola
+)
+from ticashop.metricas import Histograma
+from apps.productos.reservas import (
+    anotar_disponible, reservar, liberar, clave_carrito, clave_pedido, ReservaInsuficiente
+)
 
 from apps.ventas.forms import (
     PedidoForm, TipoDocumentoForm, BoletaForm, 
@@ -22,12 +41,21 @@ from apps.ventas.forms import (
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from django.db import transaction
-from django.db.models import F
 from django.utils import timezone
 from decimal import Decimal
 from django.db.models import Q
 from apps.productos.models import Producto
 
+PEDIDOS_POR_PAGINA = 50
+
+logger = logging.getLogger(__name__)
+
+DURACION_CONFIRMACION = Histograma(
+    'ticashop_confirmacion_pedido_duracion_segundos',
+    'Duración de la confirmación de pedidos (descuento de stock), por resultado',
+    etiquetas=('resultado',),
+)
+
 # VISTAS DEL CARRITO DE CLIENTE
 
 @login_required
@@ -51,8 +79,11 @@ def cliente_add_to_cart(request, producto_id):
     else:
         new_quantity = quantity
 
-    if new_quantity > producto.stock:
-        messages.error(request, f'Stock insuficiente para {producto.nombre}. Solo quedan {producto.stock} unidades.')
+    # Aparta las unidades para este carrito (descontando lo reservado por otros)
+    try:
+        reservar(clave_carrito(request.user), producto, new_quantity)
+    except ReservaInsuficiente as e:
+        messages.error(request, str(e))
         return redirect('usuarios:dashboard') 
 
     cart[str(producto_id)] = new_quantity
@@ -105,6 +136,7 @@ def cliente_remove_from_cart(request, producto_id):
     if str(producto_id) in cart:
         del cart[str(producto_id)]
         request.session['cart'] = cart
+        liberar(clave_carrito(request.user), producto=producto_id)
         messages.success(request, 'Producto eliminado del carrito.')
 
     return redirect('ventas:cliente_view_cart')
@@ -120,6 +152,17 @@ def cliente_checkout(request):
     if request.user.rol != 'Cliente':
         return redirect('usuarios:dashboard')
 
+    # Reintento (doble clic o proxy) de una compra ya hecha: se devuelve el
+    # mismo documento sin volver a ejecutar la transacción
+    clave_idempotencia = (
+        request.POST.get('clave_idempotencia') or request.headers.get('Idempotency-Key')
+    ) if request.method == 'POST' else None
+    documento_previo = buscar_checkout_previo(request.user, clave_idempotencia)
+    if documento_previo is not None:
+        request.session.pop('cart', None)
+        messages.info(request, f'Esta compra ya fue procesada: {documento_previo.tipo_documento} #{documento_previo.folio}.')
+        return redirect('documentos:detalle_documento', documento_id=documento_previo.id)
+
     cart = request.session.get('cart', {})
     if not cart:
         messages.warning(request, 'Tu carrito está vacío.')
@@ -163,81 +206,24 @@ def cliente_checkout(request):
             medio_de_pago = form.cleaned_data['medio_de_pago']
             
             try:
-                with transaction.atomic():
-                    # 1. Crear Pedido
-                    nuevo_pedido = Pedido.objects.create(
-                        cliente=cliente_actual_guardado,
-                        usuario=request.user, 
-                        total=total_carrito,
-                        estado='Pendiente'
-                    )
-                    
-                    # 2. Crear DetallePedido y descontar stock
-                    for item in cart_items:
-                        producto = item['producto']
-                        cantidad = item['cantidad']
-                        if producto.stock < cantidad:
-                            raise Exception(f"Stock insuficiente para {producto.nombre}.")
-                        DetallePedido.objects.create(
-                            pedido=nuevo_pedido,
-                            producto=producto,
-                            cantidad=cantidad,
-                            precio_unitario_venta=producto.precio_unitario 
-                        )
-                        producto.stock -= cantidad
-                        producto.save()
-                    
-                    # 3. Calcular totales para Documento
-                    total_bruto = total_carrito.quantize(Decimal('0.00'))
-                    neto_calculado = (total_bruto / Decimal('1.19')).quantize(Decimal('0.00'))
-                    iva_calculado = total_bruto - neto_calculado
-                    fecha_actual = timezone.now()
-
-                    # 4. Crear DocumentoVenta
-                    documento = DocumentoVenta.objects.create(
-                        pedido=nuevo_pedido,
-                        tipo_documento=tipo_documento,
-                        cliente=cliente_actual_guardado,
-                        vendedor=request.user,
-                        neto=neto_calculado,
-                        iva=iva_calculado,
-                        total=total_bruto,
-                        fecha_emision=fecha_actual,
-                        fecha_vencimiento=fecha_actual.date(), 
-                        estado='Emitida', 
-                        medio_de_pago=medio_de_pago,
-                        razon_social=cliente_actual_guardado.razon_social,
-                        rut=cliente_actual_guardado.rut,
-                        giro=cliente_actual_guardado.giro,
-                        direccion=cliente_actual_guardado.direccion
-                    )
-                    
-                    # 5. Crear DetalleDocumento
-                    for item in cart_items:
-                        DetalleDocumento.objects.create(
-                            documento=documento,
-                            producto=item['producto'],
-                            cantidad=item['cantidad'],
-                            precio_unitario_venta=item['producto'].precio_unitario
-                        )
-                        
-                    # 6. Crear Pago
-                    Pago.objects.create(
-                        documento=documento,
-                        monto_pagado=total_bruto,
-                        metodo_pago=medio_de_pago,
-                        referencia="Pago E-Commerce"
-                    )
-                    
-                    # 7. Limpiar carrito y Redirigir (¡PUNTO CORREGIDO!)
-                    del request.session['cart']
-                    messages.success(request, f'¡Compra realizada con éxito! {tipo_documento} #{documento.folio} ha sido generada y pagada. Puedes verla a continuación.')
-                    
-                    # Redirección al detalle del documento recién creado
-                    return redirect('documentos:detalle_documento', documento_id=documento.id)
+                # Pedido, detalles, descuento de stock, documento y pago en una
+                # sola transacción con un número fijo de sentencias
+                documento = procesar_checkout(
+                    cliente_actual_guardado, request.user, cart,
+                    tipo_documento, medio_de_pago,
+                    clave_reserva=clave_carrito(request.user),
+                    clave_idempotencia=clave_idempotencia
+                )
+
+                # Limpiar carrito y Redirigir al detalle del documento recién creado
+                request.session.pop('cart', None)
+                messages.success(request, f'¡Compra realizada con éxito! {tipo_documento} #{documento.folio} ha sido generada y pagada. Puedes verla a continuación.')
+                return redirect('documentos:detalle_documento', documento_id=documento.id)
 
+            except StockInsuficiente as e:
+                messages.error(request, f'Error al procesar el pedido: {str(e)}')
             except Exception as e:
-                print(f"Error al procesar el pedido: {e}") 
+                logger.exception(f"Error al procesar el checkout de {request.user.username}")
                 messages.error(request, f'Error al procesar el pedido: {str(e)}')
         
         else:
@@ -250,6 +236,9 @@ def cliente_checkout(request):
         'form': form,
         'cart_items': cart_items,
         'total_carrito': total_carrito,
+        # Nueva clave por cada render del formulario; los reenvíos del mismo
+        # formulario comparten clave
+        'clave_idempotencia': uuid.uuid4().hex,
     }
     return render(request, 'ventas/checkout.html', context)
 
@@ -257,10 +246,45 @@ def cliente_checkout(request):
 # (Lógica de IVA e
 
 
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _cursor_pedido(pedido):
+    """Cursor opaco '<microsegundos desde 1970>-<id>' de un pedido del listado."""
+    return f"{(pedido.fecha_creacion - _EPOCA) // timedelta(microseconds=1)}-{pedido.id}"
+
+
+def _leer_cursor(valor):
+    """(fecha_creacion, id) de un cursor, o None si no es válido."""
+    try:
+        microsegundos, pedido_id = valor.split('-')
+        return _EPOCA + timedelta(microseconds=int(microsegundos)), int(pedido_id)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
 @login_required
 def listar_pedidos(request):
-    # Inicializar la consulta base
-    pedidos = Pedido.objects.select_related('cliente', 'usuario').prefetch_related('detalles').all()
+    """
+    Listado con paginación por cursor (keyset) sobre (fecha_creacion, id):
+    cada página es un WHERE sobre el índice + LIMIT, así que cuesta lo mismo
+    con 100 pedidos que con 500 mil (OFFSET tendría que saltarse las filas).
+    """
+    # Solo las columnas que muestra la tabla; los items se suman en SQL
+    # únicamente para las filas de la página
+    items = (
+        DetallePedido.objects.filter(pedido=OuterRef('pk'))
+        .order_by()
+        .values('pedido')
+        .annotate(suma=Sum('cantidad'))
+        .values('suma')
+    )
+    pedidos = (
+        Pedido.objects.select_related('cliente', 'usuario')
+        .only('id', 'fecha_creacion', 'total', 'estado',
+              'cliente__razon_social', 'usuario__username')
+        .annotate(total_items=Coalesce(Subquery(items), Value(0)))
+    )
     
     # --- FILTRO DE SEGURIDAD PARA CLIENTES ---
     if request.user.rol == 'Cliente':
@@ -274,18 +298,53 @@ def listar_pedidos(request):
 
     filtro_usuario = request.GET.get('usuario')
     filtro_cliente = request.GET.get('cliente')
+    filtro_estado = request.GET.get('estado')
 
+    # Los icontains se resuelven primero sobre las tablas chicas (usuarios,
+    # clientes) y el listado filtra por id con el índice de la FK
     if filtro_usuario:
-        pedidos = pedidos.filter(usuario__username__icontains=filtro_usuario)
+        pedidos = pedidos.filter(usuario__in=Usuario.objects.filter(
+            username__icontains=filtro_usuario).values('id'))
     if filtro_cliente:
-        pedidos = pedidos.filter(cliente__razon_social__icontains=filtro_cliente)
-    
-    # Ordenar y finalizar
-    pedidos = pedidos.order_by('-fecha_creacion')
+        pedidos = pedidos.filter(cliente__in=Cliente.objects.filter(
+            razon_social__icontains=filtro_cliente).values('id'))
+    if filtro_estado:
+        pedidos = pedidos.filter(estado=filtro_estado)
+
+    despues = _leer_cursor(request.GET.get('despues'))
+    antes = _leer_cursor(request.GET.get('antes'))
+    if antes:
+        # Página anterior: se recorre hacia atrás y se invierte
+        fecha, pedido_id = antes
+        pagina = list(
+            pedidos.filter(Q(fecha_creacion__gt=fecha) | Q(fecha_creacion=fecha, id__gt=pedido_id))
+            .order_by('fecha_creacion', 'id')[:PEDIDOS_POR_PAGINA + 1]
+        )
+        hay_anterior = len(pagina) > PEDIDOS_POR_PAGINA
+        pagina = pagina[:PEDIDOS_POR_PAGINA][::-1]
+        hay_siguiente = True
+    else:
+        if despues:
+            fecha, pedido_id = despues
+            pedidos = pedidos.filter(
+                Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=pedido_id)
+            )
+        pagina = list(pedidos.order_by('-fecha_creacion', '-id')[:PEDIDOS_POR_PAGINA + 1])
+        hay_siguiente = len(pagina) > PEDIDOS_POR_PAGINA
+        pagina = pagina[:PEDIDOS_POR_PAGINA]
+        hay_anterior = despues is not None
+
+    # Filtros actuales para armar los enlaces de paginación
+    filtros = request.GET.copy()
+    for parametro in ('despues', 'antes'):
+        filtros.pop(parametro, None)
 
     context = {
-        'pedidos': pedidos,
-        'estados': Pedido.ESTADOS_PEDIDO 
+        'pedidos': pagina,
+        'estados': Pedido.ESTADOS_PEDIDO,
+        'filtros': filtros.urlencode(),
+        'cursor_siguiente': _cursor_pedido(pagina[-1]) if pagina and hay_siguiente else None,
+        'cursor_anterior': _cursor_pedido(pagina[0]) if pagina and hay_anterior else None,
     }
     return render(request, 'ventas/listar_pedidos.html', context)
 
@@ -453,7 +512,10 @@ def agregar_productos_pedido(request, pedido_id):
     documento = pedido.documentoventa
 
     # Datos para la vista
-    productos = Producto.objects.filter(activo=True).order_by('nombre')
+    # Disponible para vender: descuenta lo reservado por otros carritos y borradores
+    productos = anotar_disponible(
+        Producto.objects.filter(activo=True), excluir_clave=clave_pedido(pedido)
+    ).order_by('nombre')
     detalles = DetallePedido.objects.filter(pedido=pedido).select_related('producto')
 
     carrito = [{
@@ -479,13 +541,10 @@ def agregar_productos_pedido(request, pedido_id):
             try:
                 with transaction.atomic():
 
-                    # 1. Descontar stock
-                    for detalle in detalles:
-                        producto = detalle.producto
-                        if producto.stock < detalle.cantidad:
-                            raise Exception(f"Stock insuficiente para {producto.nombre}. Disponible: {producto.stock}")
-                        producto.stock -= detalle.cantidad
-                        producto.save()
+                    # 1. Descontar stock (un UPDATE condicional) y liberar la reserva del borrador
+                    descontar_stock({d.producto_id: d.cantidad for d in detalles},
+                                    clave_pedido(pedido))
+                    liberar(clave_pedido(pedido))
 
                     # 2. Cambiar estado según documento
                     pedido.estado = 'Procesando' if documento.estado == 'Pagada' else 'Pendiente'
@@ -529,13 +588,18 @@ def agregar_productos_pedido(request, pedido_id):
                         if detalle_existente:
                             nueva_cantidad = detalle_existente.cantidad + cantidad
 
-                            if producto.stock < nueva_cantidad:
-                                mensaje_error = f"⚠️ Stock insuficiente. Ya tiene {detalle_existente.cantidad} unidades."
+                            try:
+                                reservar(clave_pedido(pedido), producto, nueva_cantidad,
+                                         settings.RESERVA_PEDIDO_MINUTOS)
+                            except ReservaInsuficiente as e:
+                                mensaje_error = f"⚠️ {e} Ya tiene {detalle_existente.cantidad} unidades."
                             else:
                                 detalle_existente.cantidad = nueva_cantidad
                                 detalle_existente.save()
                                 messages.success(request, f" Cantidad actualizada: {producto.nombre}")
                         else:
+                            reservar(clave_pedido(pedido), producto, cantidad,
+                                     settings.RESERVA_PEDIDO_MINUTOS)
                             DetallePedido.objects.create(
                                 pedido=pedido,
                                 producto=producto,
@@ -544,11 +608,14 @@ def agregar_productos_pedido(request, pedido_id):
                             )
                             messages.success(request, f" Producto agregado: {producto.nombre}")
 
-                        actualizar_totales_documento(pedido, documento)
+                        # DetallePedido.save() ya ajustó por diferencia los totales
+                        # del pedido y del documento
                         return redirect('ventas:agregar_productos_pedido', pedido_id=pedido.id)
 
                 except ValueError:
                     mensaje_error = " La cantidad debe ser un número válido."
+                except ReservaInsuficiente as e:
+                    mensaje_error = f"⚠️ {e}"
                 except Exception as e:
                     mensaje_error = f" Error al agregar el producto: {str(e)}"
 
@@ -563,23 +630,6 @@ def agregar_productos_pedido(request, pedido_id):
 
 
 
-def actualizar_totales_documento(pedido, documento):
-    """Función auxiliar para recalcular totales (IVA INCLUIDO)"""
-    detalles = DetallePedido.objects.filter(pedido=pedido)
-    
-    total_bruto = sum(d.subtotal for d in detalles)
-    neto_calculado = (total_bruto / Decimal('1.19')).quantize(Decimal('0.00'))
-    iva_calculado = total_bruto - neto_calculado
-    
-    documento.neto = neto_calculado
-    documento.iva = iva_calculado
-    documento.total = total_bruto
-    documento.save()
-    
-    pedido.total = total_bruto 
-    pedido.save()
-
-
 @login_required
 def eliminar_producto_carrito(request, pedido_id, producto_id):
     """Elimina un producto del pedido (del vendedor)"""
@@ -591,10 +641,9 @@ def eliminar_producto_carrito(request, pedido_id, producto_id):
             detalle = DetallePedido.objects.filter(pedido=pedido, producto=producto).first()
             
             if detalle:
+                # delete() descuenta el subtotal del pedido y de su documento
                 detalle.delete() 
-                
-                if hasattr(pedido, 'documentoventa') and pedido.documentoventa:
-                    actualizar_totales_documento(pedido, pedido.documentoventa)
+                liberar(clave_pedido(pedido), producto=producto)
                 
                 messages.success(request, f"Producto eliminado: {producto.nombre}")
             else:
@@ -634,65 +683,32 @@ def detalle_pedido(request, pedido_id):
 def confirmar_pedido(request, pedido_id):
     pedido = get_object_or_404(Pedido, id=pedido_id)
 
-    print(f"[confirmar_pedido] inicio pedido_id={pedido_id}, estado actual={pedido.estado}")
+    logger.info(f"Confirmando pedido #{pedido_id} (estado actual: {pedido.estado})")
 
     if pedido.estado != 'Pendiente':
         messages.warning(request, 'Este pedido ya fue confirmado o procesado.')
         return redirect('ventas:detalle_pedido', pedido_id=pedido.id)
 
-    detalles = DetallePedido.objects.filter(pedido=pedido).select_related('producto')
+    detalles = DetallePedido.objects.filter(pedido=pedido)
 
     if not detalles.exists():
         messages.error(request, 'No se puede confirmar un pedido sin productos.')
         return redirect('ventas:detalle_pedido', pedido_id=pedido.id)
 
-    # ids de productos
-    product_ids = [d.producto.id for d in detalles if d.producto]
-    print("[confirmar_pedido] productos en pedido:", product_ids)
+    cantidades = {}
+    for detalle in detalles:
+        cantidades[detalle.producto_id] = cantidades.get(detalle.producto_id, 0) + detalle.cantidad
+    logger.debug(f"Pedido #{pedido_id}: productos {list(cantidades)}")
 
+    inicio = time.perf_counter()
     try:
         with transaction.atomic():
-            productos_locked = Producto.objects.select_for_update().filter(id__in=product_ids)
-            prod_map = {p.id: p for p in productos_locked}
-
-            # 1) Verificar stock suficiente usando datos bloqueados 
-            insuficientes = []
-            for detalle in detalles:
-                prod = prod_map.get(detalle.producto.id) if detalle.producto else None
-                if not prod:
-                    insuficientes.append((detalle, "Producto no encontrado"))
-                    continue
-                try:
-                    stock_actual = int(prod.stock or 0)
-                except Exception:
-                    stock_actual = 0
-                if detalle.cantidad > stock_actual:
-                    insuficientes.append((detalle, f"Solicitado {detalle.cantidad}, Disponible {stock_actual}"))
-
-            if insuficientes:
-                msg = " No hay suficiente stock:\n" + "\n".join(
-                    f"{it.producto.nombre if it.producto else '??'}: {reason}" for it, reason in insuficientes
-                )
-                print("[confirmar_pedido] insuficientes:", insuficientes)
-                messages.error(request, msg)
-                return redirect('ventas:detalle_pedido', pedido_id=pedido.id)
-
-            # 2) Aplicar decrementos con F() y verificar filas afectadas
-            for detalle in detalles:
-                prod = prod_map.get(detalle.producto.id)
-                descuento = int(detalle.cantidad)
-                print(f"[confirmar_pedido] intentanto decrementar producto {prod.id} -{descuento} (stock antes: {prod.stock})")
-
-                # Realizamos update atómico: solo se decrementa si stock >= descuento
-                rows = Producto.objects.filter(id=prod.id, stock__gte=descuento).update(stock=F('stock') - descuento)
-                if rows == 0:
-                    raise RuntimeError(f"No se pudo decrementar stock para producto {prod.id} (rows affected=0)")
-
-                # Para depuración: obtener nuevo valor
-                nuevo = Producto.objects.get(id=prod.id).stock
-                print(f"[confirmar_pedido] producto {prod.id} stock actualizado -> {nuevo}")
-
-            # 3) Actualizar pedido y documento
+            # 1) Descontar stock en un UPDATE condicional que respeta las
+            #    reservas de otros carritos y pedidos, y liberar las del pedido
+            descontar_stock(cantidades, clave_pedido(pedido))
+            liberar(clave_pedido(pedido))
+
+            # 2) Actualizar pedido y documento
             pedido.estado = 'Procesando'
             pedido.save()
 
@@ -703,13 +719,23 @@ def confirmar_pedido(request, pedido_id):
                     doc.save()
 
             messages.success(request, f'El Pedido #{pedido.id} ha sido confirmado y el stock descontado.')
-            print(f"[confirmar_pedido] OK pedido {pedido.id} confirmado y stock actualizado.")
-
+            logger.info(f"Pedido #{pedido.id} confirmado y stock descontado")
+
+    except StockInsuficiente as e:
+        logger.info(f"Pedido #{pedido.id} sin stock suficiente: {[p.id for p in e.productos]}")
+        messages.error(request, " No hay suficiente stock:\n" + "\n".join(
+            f"{p.nombre}: Solicitado {cantidades[p.id]}, Disponible {max(p.disponible, 0)}"
+            for p in e.productos
+        ))
+        DURACION_CONFIRMACION.observe(time.perf_counter() - inicio, resultado='sin_stock')
+        return redirect('ventas:detalle_pedido', pedido_id=pedido.id)
     except Exception as e:
-        print("[confirmar_pedido] ERROR:", repr(e))
+        logger.exception(f"Error al confirmar el pedido #{pedido.id}")
+        DURACION_CONFIRMACION.observe(time.perf_counter() - inicio, resultado='error')
         messages.error(request, f'Ocurrió un error al confirmar el pedido: {e}')
         return redirect('ventas:detalle_pedido', pedido_id=pedido.id)
 
+    DURACION_CONFIRMACION.observe(time.perf_counter() - inicio, resultado='ok')
     return redirect('ventas:detalle_pedido', pedido_id=pedido.id)
 
 @login_required
@@ -731,62 +757,53 @@ def marcar_pedido_enviado(request, pedido_id):
 # REPORTES Y ESTADÍSTICAS
 
 
-login_required
+@login_required
 def estadisticas_ventas(request):
     if request.user.rol not in ['Administrador', 'Tesoreria']:
         messages.error(request, " No tienes permisos para acceder a esta sección.")
         return redirect('usuarios:dashboard')
 
-    pedidos = (Pedido.objects.filter(estado='Enviado')
-               .select_related('cliente', 'usuario', 'documentoventa')
-               .order_by('-fecha_creacion'))
-
     fecha_desde = request.GET.get('fecha_desde')
     fecha_hasta = request.GET.get('fecha_hasta')
     vendedor_query = request.GET.get('vendedor') 
 
-    # Aplicar filtros de fecha
-    if fecha_desde:
-        pedidos = pedidos.filter(fecha_creacion__date__gte=fecha_desde)
-    if fecha_hasta:
-        pedidos = pedidos.filter(fecha_creacion__date__lte=fecha_hasta)
-
-    # Aplicar filtro por vendedor
-    if vendedor_query:
-        pedidos = pedidos.filter(
-            Q(usuario__username__icontains=vendedor_query) | 
-            Q(usuario__first_name__icontains=vendedor_query) |
-            Q(usuario__last_name__icontains=vendedor_query)
-        )
+    # Mismos filtros que las exportaciones (fechas y vendedor)
+    desde, hasta = _fechas_exportacion(request)
+    pedidos = pedidos_exportables(desde, hasta, vendedor_query)
+
+    # Totales, cantidad y base de comisión (solo ventas de usuarios Vendedor)
+    # en una sola consulta agregada
+    cero = Value(Decimal('0.00'))
+    resumen = pedidos.order_by().aggregate(
+        total_ventas=Count('id'),
+        monto_total=Coalesce(Sum('documentoventa__total'), cero),
+        monto_base_comision=Coalesce(
+            Sum('documentoventa__total', filter=Q(usuario__rol='Vendedor')), cero
+        ),
+    )
 
-    # Inicializar montos usando Decimal para evitar errores de precisión y el TypeError
-    monto_total = Decimal('0.00')
-    monto_base_comision = Decimal('0.00')
-    
-    # CÁLCULO DE TOTALES: Recorremos los pedidos ya filtrados
-    for pedido in pedidos:
-        # Verificamos que el documento de venta y su total existan
-        if hasattr(pedido, 'documentoventa') and pedido.documentoventa and pedido.documentoventa.total is not None:
-            monto_venta = pedido.documentoventa.total
-            
-            # 1. Sumamos al Monto Total (para la tarjeta general)
-            monto_total += monto_venta
-            
-            # 2. Sumamos al Monto Comisionable (solo si el usuario es Vendedor)
-            if pedido.usuario.rol == 'Vendedor':
-                monto_base_comision += monto_venta
-    
+    TASA_COMISION = Decimal('0.01')
+    comision_total = resumen['monto_base_comision'] * TASA_COMISION
 
-    total_ventas = pedidos.count()
-    
+    # Listado paginado: cada página trae solo sus filas (el conteo ya se hizo arriba)
+    paginator = Paginator(
+        pedidos.select_related('cliente', 'usuario', 'documentoventa')
+        .order_by('-fecha_creacion', '-id'),
+        PEDIDOS_POR_PAGINA
+    )
+    paginator.count = resumen['total_ventas']
+    pagina = paginator.get_page(request.GET.get('page'))
 
-    TASA_COMISION = Decimal('0.01')
-    comision_total = monto_base_comision * TASA_COMISION
+    # Filtros actuales para armar los enlaces de paginación
+    filtros = request.GET.copy()
+    filtros.pop('page', None)
 
     context = {
-        'pedidos': pedidos,
-        'total_ventas': total_ventas,
-        'monto_total': monto_total, 
+        'pedidos': pagina,
+        'page_obj': pagina,
+        'filtros': filtros.urlencode(),
+        'total_ventas': resumen['total_ventas'],
+        'monto_total': resumen['monto_total'], 
         'comision_total': comision_total, 
         'fecha_desde': fecha_desde,
         'fecha_hasta': fecha_hasta,
@@ -795,79 +812,33 @@ def estadisticas_ventas(request):
 
     return render(request, 'ventas/estadisticas_ventas.html', context)
 
+
+def _fechas_exportacion(request):
+    """Lee fecha_desde/fecha_hasta (YYYY-MM-DD) del GET; las inválidas se ignoran con aviso."""
+    fechas = []
+    for campo, etiqueta in (('fecha_desde', 'desde'), ('fecha_hasta', 'hasta')):
+        valor = (request.GET.get(campo) or '').strip()
+        fecha = None
+        if valor:
+            try:
+                fecha = datetime.strptime(valor, "%Y-%m-%d").date()
+            except ValueError:
+                messages.error(request, f" Fecha {etiqueta} inválida. Usa formato YYYY-MM-DD.")
+        fechas.append(fecha)
+    return fechas
+
+
 @login_required
 def exportar_ventas_excel(request):
     if request.user.rol not in ['Administrador', 'Tesoreria']:
         messages.error(request, " No tienes permisos para exportar.")
         return redirect('usuarios:dashboard')
 
-    pedidos = (Pedido.objects.filter(estado='Enviado')
-               .select_related('cliente', 'usuario', 'documentoventa')
-               .order_by('-fecha_creacion'))
-
-    fecha_desde_str = request.GET.get('fecha_desde')
-    fecha_hasta_str = request.GET.get('fecha_hasta')
-
-    if fecha_desde_str:
-        try:
-            fecha_desde = datetime.strptime(fecha_desde_str, "%Y-%m-%d").date()
-            pedidos = pedidos.filter(fecha_creacion__date__gte=fecha_desde)
-        except ValueError:
-            messages.error(request, " Fecha desde inválida. Usa formato YYYY-MM-DD.")
-
-    if fecha_hasta_str:
-        try:
-            fecha_hasta = datetime.strptime(fecha_hasta_str, "%Y-%m-%d").date()
-            pedidos = pedidos.filter(fecha_creacion__date__lte=fecha_hasta)
-        except ValueError:
-            messages.error(request, " Fecha hasta inválida. Usa formato YYYY-MM-DD.")
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Ventas"
-
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    header_alignment = Alignment(horizontal="center", vertical="center")
-
-    headers = ['Pedido #', 'Cliente', 'RUT', 'Vendedor', 'Fecha', 'Estado', 'Total']
-    ws.append(headers)
-
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-
-    for pedido in pedidos:
-        total = pedido.documentoventa.total if hasattr(pedido, 'documentoventa') and pedido.documentoventa else 0
-        total_str = f"${total:,.0f}".replace(",", ".") 
-
-        ws.append([
-            pedido.id,
-            pedido.cliente.razon_social,
-            pedido.cliente.rut,
-            pedido.usuario.get_full_name() or pedido.usuario.username,
-            pedido.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
-            pedido.estado,
-            total_str 
-        ])
-
-    ws.column_dimensions['A'].width = 12
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 25
-    ws.column_dimensions['E'].width = 20
-    ws.column_dimensions['F'].width = 15
-    ws.column_dimensions['G'].width = 15
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    filename = f"ventas_{date.today().strftime('%d-%m-%Y')}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    fecha_desde, fecha_hasta = _fechas_exportacion(request)
+    reporte = preparar_reporte('ventas', fecha_desde, fecha_hasta, request.GET.get('vendedor'))
 
-    wb.save(response)
-    return response
+    # Exportación en streaming: filas leídas por lotes, memoria constante
+    return responder_reporte(reporte, request.GET.get('formato', 'xlsx'))
 
 
 @login_required
@@ -897,109 +868,76 @@ def exportar_reporte_rentabilidad(request):
         messages.error(request, "⚠️ No tienes permisos para exportar este reporte.")
         return redirect('usuarios:dashboard')
 
-    # 1. Obtener los detalles de documentos 
-    detalles_vendidos = DetalleDocumento.objects.filter(
-        documento__pedido__estado='Enviado' 
-    ).select_related(
-        'documento__vendedor', 'documento__cliente', 
-        'producto', 'producto__proveedor'
-    ).order_by('-documento__fecha_emision')
+    # Columnas calculadas en SQL; detallado o agrupado en la base de datos
+    # (?agrupar=mes|vendedor|proveedor|producto) y exportado en streaming
+    fecha_desde, fecha_hasta = _fechas_exportacion(request)
+    reporte = preparar_reporte(
+        'rentabilidad', fecha_desde, fecha_hasta,
+        request.GET.get('vendedor'), request.GET.get('agrupar')
+    )
+    return responder_reporte(reporte, request.GET.get('formato', 'xlsx'))
 
-    # 2. Aplicar filtros de fecha 
-    fecha_desde_str = request.GET.get('fecha_desde')
-    fecha_hasta_str = request.GET.get('fecha_hasta')
 
-    # Filtro Fecha Desde
-    if fecha_desde_str and fecha_desde_str.strip(): 
-        try:
-            fecha_desde = datetime.strptime(fecha_desde_str.strip(), "%Y-%m-%d").date()
-            detalles_vendidos = detalles_vendidos.filter(documento__fecha_emision__date__gte=fecha_desde)
-        except ValueError:
-            messages.error(request, "⚠️ Error en la fecha de inicio. Usa el formato YYYY-MM-DD.")
+# EXPORTACIONES EN SEGUNDO PLANO
 
-    # Filtro Fecha Hasta
-    if fecha_hasta_str and fecha_hasta_str.strip(): 
-        try:
-            fecha_hasta = datetime.strptime(fecha_hasta_str.strip(), "%Y-%m-%d").date()
-            detalles_vendidos = detalles_vendidos.filter(documento__fecha_emision__date__lte=fecha_hasta)
-        except ValueError:
-            messages.error(request, "⚠️ Error en la fecha de fin. Usa el formato YYYY-MM-DD.")
-
-    # 3. Crear el Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Reporte de Rentabilidad"
-
-    # Estilos de encabezado
-    header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    headers = [
-        'Fecha Venta', 'Documento', 'Folio', 'Vendedor', 'Cliente', 
-        'Proveedor', 'Producto (SKU)', 'Cantidad', 
-        'Valor Costo (Unit.)', 'Valor Venta (Unit. Neto)', 
-        'Costo Total', 'Venta Total (Neta)', 'Utilidad', 'Margen (%)'
-    ]
-    ws.append(headers)
-
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-
-    # 4. Llenar el Excel con los datos
-    for detalle in detalles_vendidos:
-        
-        # --- Obtener Datos ---
-        documento = detalle.documento
-        producto = detalle.producto
-        cantidad = detalle.cantidad
-
-        vendedor_nombre = documento.vendedor.username if documento.vendedor else 'N/A'
-        cliente_nombre = documento.cliente.razon_social
-        proveedor_nombre = producto.proveedor.razon_social if producto.proveedor else 'N/A'
-        
-        # --- Cálculos de Rentabilidad (Lógica de IVA Inversa) ---
-        precio_venta_bruto_unit = detalle.precio_unitario_venta
-        precio_venta_neto_unit = (precio_venta_bruto_unit / Decimal('1.19')).quantize(Decimal('0.00'))
-        
-        costo_unit = detalle.costo_unitario_venta or producto.costo_unitario or Decimal('0')
-        
-        # Totales por línea
-        costo_total_linea = costo_unit * cantidad
-        venta_neta_total_linea = precio_venta_neto_unit * cantidad
-        
-        # Utilidad y Margen
-        utilidad_linea = venta_neta_total_linea - costo_total_linea
-        margen_linea = 0
-        if venta_neta_total_linea > 0:
-            margen_linea = (utilidad_linea / venta_neta_total_linea) * 100
-
-        # --- Escribir Fila ---
-        ws.append([
-            documento.fecha_emision.strftime('%d/%m/%Y'),
-            documento.tipo_documento,
-            documento.folio,
-            vendedor_nombre,
-            cliente_nombre,
-            proveedor_nombre,
-            producto.nombre, 
-            cantidad,
-            costo_unit,
-            precio_venta_neto_unit,
-            costo_total_linea,
-            venta_neta_total_linea,
-            utilidad_linea,
-            f"{margen_linea:.2f}%"
-        ])
-
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    filename = f"reporte_rentabilidad_{date.today().strftime('%d-%m-%Y')}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+@login_required
+def solicitar_exportacion(request, tipo):
+    """Encola (o reutiliza) la exportación y lleva a la página de estado."""
+    if request.user.rol not in ['Administrador', 'Tesoreria']:
+        messages.error(request, " No tienes permisos para exportar.")
+        return redirect('usuarios:dashboard')
 
-    wb.save(response)
-    return response
\ No newline at end of file
+    if tipo not in dict(TrabajoExportacion.TIPOS):
+        messages.error(request, " Tipo de exportación desconocido.")
+        return redirect('ventas:estadisticas_ventas')
+
+    try:
+        parametros = normalizar_parametros(tipo, request.GET)
+    except ValueError:
+        messages.error(request, " Fecha inválida. Usa formato YYYY-MM-DD.")
+        return redirect('ventas:estadisticas_ventas')
+
+    trabajo = solicitar_exportacion_en_cola(tipo, parametros, request.user)
+    return redirect('ventas:estado_exportacion', trabajo_id=trabajo.id)
+
+
+@login_required
+def estado_exportacion(request, trabajo_id):
+    if request.user.rol not in ['Administrador', 'Tesoreria']:
+        return redirect('usuarios:dashboard')
+
+    trabajo = get_object_or_404(TrabajoExportacion, id=trabajo_id)
+    disponible = archivo_disponible(trabajo)
+
+    # La página consulta este mismo endpoint con ?json=1 hasta que el archivo esté listo
+    if request.GET.get('json'):
+        return JsonResponse({
+            'id': trabajo.id,
+            'estado': trabajo.estado,
+            'disponible': disponible,
+            'error': trabajo.error,
+        })
+
+    return render(request, 'ventas/estado_exportacion.html', {
+        'trabajo': trabajo,
+        'disponible': disponible,
+    })
+
+
+@login_required
+def descargar_exportacion(request, trabajo_id):
+    if request.user.rol not in ['Administrador', 'Tesoreria']:
+        return redirect('usuarios:dashboard')
+
+    trabajo = get_object_or_404(TrabajoExportacion, id=trabajo_id)
+    if not archivo_disponible(trabajo):
+        messages.warning(request, " La exportación todavía no está lista.")
+        return redirect('ventas:estado_exportacion', trabajo_id=trabajo.id)
+
+    content_type = 'text/csv; charset=utf-8' if trabajo.archivo.endswith('.csv') else CONTENT_TYPE_XLSX
+    return FileResponse(
+        open(ruta_archivo(trabajo), 'rb'),
+        as_attachment=True,
+        filename=trabajo.nombre_archivo,
+        content_type=content_type,
+    )
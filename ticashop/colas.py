@@ -0,0 +1,63 @@
+"""
+Colas de trabajos en segundo plano guardadas en la base de datos.
+
+Sirve para cualquier modelo con `estado` (Pendiente, Procesando, Listo,
+Error), `fecha_creacion`, `fecha_inicio` y `archivo`: hoy TrabajoExportacion
+(apps/ventas/trabajos.py) y TrabajoImportacion (apps/productos/trabajos.py).
+Cada módulo de trabajos aporta su `ejecutar(trabajo)` y dónde guarda los
+archivos; reclamar, reencolar y purgar son iguales para todos.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+# Un trabajo "Procesando" más antiguo que esto se considera abandonado
+MINUTOS_TRABAJO_ABANDONADO = 30
+
+
+def tomar_siguiente(modelo):
+    """Reclama el trabajo Pendiente más antiguo (UPDATE condicional, seguro con varios workers)."""
+    pendientes = (
+        modelo.objects.filter(estado='Pendiente')
+        .order_by('fecha_creacion')
+        .values_list('id', flat=True)[:10]
+    )
+    for trabajo_id in pendientes:
+        tomado = modelo.objects.filter(id=trabajo_id, estado='Pendiente').update(
+            estado='Procesando', fecha_inicio=timezone.now()
+        )
+        if tomado:
+            return modelo.objects.get(id=trabajo_id)
+    return None
+
+
+def procesar_pendientes(modelo, ejecutar, limite=None):
+    """Ejecuta trabajos pendientes hasta agotar la cola (o `limite`). Retorna cuántos."""
+    procesados = 0
+    while limite is None or procesados < limite:
+        trabajo = tomar_siguiente(modelo)
+        if trabajo is None:
+            break
+        ejecutar(trabajo)
+        procesados += 1
+    return procesados
+
+
+def reencolar_abandonados(modelo, minutos=MINUTOS_TRABAJO_ABANDONADO):
+    """Devuelve a Pendiente los trabajos que un worker dejó a medias."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return modelo.objects.filter(
+        estado='Procesando', fecha_inicio__lt=limite
+    ).update(estado='Pendiente', fecha_inicio=None)
+
+
+def purgar(modelo, dias, ruta_archivo):
+    """Borra los trabajos terminados con más de `dias` de antigüedad y sus archivos."""
+    antiguos = modelo.objects.filter(
+        fecha_creacion__lt=timezone.now() - timedelta(days=dias)
+    ).exclude(estado__in=['Pendiente', 'Procesando'])
+    for trabajo in antiguos.only('id', 'archivo'):
+        if trabajo.archivo:
+            ruta_archivo(trabajo).unlink(missing_ok=True)
+    borrados, _ = antiguos.delete()
+    return borrados
@@ -0,0 +1,146 @@
+"""
+Instrumentación por request: consultas SQL, tiempo en la base, tiempo de
+renderizado de plantillas y tiempo total, por nombre de URL resuelto.
+
+Se activa con settings.INSTRUMENTACION_ACTIVA. Desactivada, el middleware
+lanza MiddlewareNotUsed y Django lo saca de la cadena: no queda ningún
+costo por request.
+
+Activada:
+- Cada consulta pasa por un execute_wrapper que anota SQL y duración.
+- El render de plantillas del backend de Django se mide envolviendo
+  Template.render (solo el nivel superior; los {% include %} quedan dentro).
+  Ese tiempo incluye las consultas perezosas que se ejecutan al renderizar.
+- La respuesta lleva el encabezado Server-Timing (visible en las
+  herramientas de desarrollo del navegador).
+- Los requests que superan INSTRUMENTACION_UMBRAL_MS se registran en el log
+  con sus consultas más costosas, agrupadas por SQL: una consulta repetida
+  N veces (N+1) aparece como una sola línea con su cantidad.
+"""
+import contextvars
+import logging
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('ticashop.instrumentacion')
+
+# Consultas guardadas con su SQL por request (las demás solo se cuentan)
+MAXIMO_CONSULTAS_GUARDADAS = 1000
+
+_medicion = contextvars.ContextVar('medicion_request', default=None)
+
+
+class Medicion:
+    __slots__ = ('consultas', 'tiempo_db', 'tiempo_plantillas', 'detalle')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.tiempo_plantillas = 0.0
+        self.detalle = []  # (sql, segundos)
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper de django.db
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.tiempo_db += duracion
+            if len(self.detalle) < MAXIMO_CONSULTAS_GUARDADAS:
+                self.detalle.append((sql, duracion))
+
+    def consultas_costosas(self, cantidad):
+        """[(sql, veces, segundos totales)] ordenadas por tiempo total."""
+        grupos = defaultdict(lambda: [0, 0.0])
+        for sql, duracion in self.detalle:
+            grupo = grupos[sql]
+            grupo[0] += 1
+            grupo[1] += duracion
+        return sorted(
+            ((sql, veces, total) for sql, (veces, total) in grupos.items()),
+            key=lambda item: item[2],
+            reverse=True,
+        )[:cantidad]
+
+
+def _instrumentar_plantillas():
+    """Envuelve una sola vez el render del backend de plantillas de Django."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'instrumentado', False):
+        return
+    render_original = Template.render
+
+    @wraps(render_original)
+    def render(self, *args, **kwargs):
+        medicion = _medicion.get()
+        if medicion is None:
+            return render_original(self, *args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return render_original(self, *args, **kwargs)
+        finally:
+            medicion.tiempo_plantillas += time.perf_counter() - inicio
+
+    render.instrumentado = True
+    Template.render = render
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 1)
+
+
+class InstrumentacionMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACION_ACTIVA', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.umbral = getattr(settings, 'INSTRUMENTACION_UMBRAL_MS', 500) / 1000
+        self.consultas_log = getattr(settings, 'INSTRUMENTACION_CONSULTAS_LOG', 5)
+        _instrumentar_plantillas()
+
+    def __call__(self, request):
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(medicion))
+                response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        total = time.perf_counter() - inicio
+
+        match = getattr(request, 'resolver_match', None)
+        vista = match.view_name if match else 'sin_ruta'
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={_ms(medicion.tiempo_db)};desc="{medicion.consultas} consultas"',
+            f'tpl;dur={_ms(medicion.tiempo_plantillas)};desc="plantillas"',
+            f'total;dur={_ms(total)};desc="{vista}"',
+        ])
+
+        if total >= self.umbral:
+            lineas = [
+                f"Request lento {request.method} {request.path} [{vista}] -> {response.status_code}: "
+                f"{_ms(total)} ms, {medicion.consultas} consultas ({_ms(medicion.tiempo_db)} ms en DB), "
+                f"plantillas {_ms(medicion.tiempo_plantillas)} ms"
+            ]
+            for sql, veces, segundos in medicion.consultas_costosas(self.consultas_log):
+                lineas.append(f"  {veces}x {_ms(segundos)} ms: {sql[:300]}")
+            logger.warning('\n'.join(lineas))
+        else:
+            logger.debug(
+                f"{request.method} {request.path} [{vista}] {_ms(total)} ms, "
+                f"{medicion.consultas} consultas ({_ms(medicion.tiempo_db)} ms DB)"
+            )
+        return response
@@ -0,0 +1,439 @@
+"""
+Métricas en formato de texto de Prometheus.
+
+Registro en memoria de contadores, medidores (gauges) e histogramas de
+buckets fijos. Cada proceso (worker web, `procesar_correos`,
+`procesar_exportaciones`, ...) acumula sus propios valores y cada
+settings.METRICAS_INTERVALO_SEGUNDOS los vuelca a su archivo en
+settings.METRICAS_DIR (<pid>-<id>.json, escrito en un temporal y renombrado:
+quien lo lee nunca ve un archivo a medio escribir). Cada archivo tiene un solo
+escritor, así que registrar no requiere bloqueos entre procesos; el endpoint
+/metricas/ combina los archivos de todos los procesos al exponer.
+
+- Contadores e histogramas se suman entre procesos. Los de procesos que ya
+  terminaron se consolidan en `terminados.json` (bajo un flock) y su archivo
+  se borra, para que el directorio no crezca con cada reinicio de workers.
+- Los medidores se suman solo entre procesos vivos. Un medidor con `funcion`
+  (p. ej. el largo de una cola) se calcula al exponer y no se guarda.
+
+Sin METRICAS_DIR las métricas quedan solo en la memoria del proceso. Lo que
+un proceso registró desde su último volcado se pierde si muere sin salir
+normalmente (al salir se vuelca con atexit).
+"""
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no se consolidan los archivos de procesos terminados
+    fcntl = None
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Segundos: de 5 ms (una vista simple) a 10 s (un checkout o reporte grande)
+BUCKETS_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Otros métodos se agrupan como 'otro' (el método lo elige el cliente)
+METODOS_HTTP = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+ARCHIVO_TERMINADOS = 'terminados.json'
+ARCHIVO_BLOQUEO = '.bloqueo'
+
+
+class Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=(), registro=None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.registro = registro or REGISTRO
+        self.series = {}
+        self.registro.registrar(self)
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(
+                f"{self.nombre} espera las etiquetas {self.etiquetas}, recibió {tuple(etiquetas)}"
+            )
+        return json.dumps([str(etiquetas[nombre]) for nombre in self.etiquetas])
+
+    def definicion(self):
+        return {'tipo': self.tipo, 'ayuda': self.ayuda, 'etiquetas': list(self.etiquetas)}
+
+    def reiniciar(self):
+        self.series = {}
+
+
+class Contador(Metrica):
+    tipo = 'counter'
+
+    def inc(self, valor=1, **etiquetas):
+        if valor < 0:
+            raise ValueError("Un contador solo puede aumentar.")
+        clave = self._clave(etiquetas)
+        with self.registro.actualizando():
+            self.series[clave] = self.series.get(clave, 0) + valor
+
+
+class Medidor(Metrica):
+    """
+    Valor que sube y baja. Con `funcion` el valor se calcula al exponer:
+    un número, o {(valor de cada etiqueta, ...): número} si tiene etiquetas.
+    """
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), registro=None, funcion=None):
+        self.funcion = funcion
+        super().__init__(nombre, ayuda, etiquetas, registro)
+
+    def set(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self.registro.actualizando():
+            self.series[clave] = valor
+
+    def inc(self, valor=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self.registro.actualizando():
+            self.series[clave] = self.series.get(clave, 0) + valor
+
+    def dec(self, valor=1, **etiquetas):
+        self.inc(-valor, **etiquetas)
+
+    def calcular(self):
+        valores = self.funcion()
+        if not self.etiquetas:
+            return {self._clave({}): valores}
+        return {
+            self._clave(dict(zip(self.etiquetas, etiquetas))): valor
+            for etiquetas, valor in valores.items()
+        }
+
+
+class Histograma(Metrica):
+    """
+    Buckets fijos. Cada serie guarda la cuenta de cada bucket (no acumulada,
+    el último es +Inf), la suma y la cantidad de observaciones.
+    """
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), registro=None, buckets=BUCKETS_DURACION):
+        self.buckets = tuple(sorted(float(limite) for limite in buckets))
+        super().__init__(nombre, ayuda, etiquetas, registro)
+
+    def definicion(self):
+        return {**super().definicion(), 'buckets': list(self.buckets)}
+
+    def observe(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = len(self.buckets)
+        for posicion, limite in enumerate(self.buckets):
+            if valor <= limite:
+                indice = posicion
+                break
+        with self.registro.actualizando():
+            serie = self.series.get(clave)
+            if serie is None:
+                serie = self.series[clave] = {'b': [0] * (len(self.buckets) + 1), 's': 0.0, 'n': 0}
+            serie['b'][indice] += 1
+            serie['s'] += valor
+            serie['n'] += 1
+
+    def medir(self, **etiquetas):
+        """`with histograma.medir(...):` observa la duración del bloque."""
+        return _Cronometro(self, etiquetas)
+
+
+class _Cronometro:
+    def __init__(self, histograma, etiquetas):
+        self.histograma = histograma
+        self.etiquetas = etiquetas
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histograma.observe(time.perf_counter() - self.inicio, **self.etiquetas)
+        return False
+
+
+class Registro:
+    def __init__(self):
+        self.metricas = {}
+        self._lock = threading.Lock()
+        self._lock_volcado = threading.Lock()
+        self._pid = os.getpid()
+        self._archivo = None
+        self._proximo_volcado = 0.0
+        self._cambios = False
+        atexit.register(self.volcar)
+
+    def registrar(self, metrica):
+        with self._lock:
+            if metrica.nombre in self.metricas:
+                raise ValueError(f"La métrica {metrica.nombre} ya está registrada.")
+            self.metricas[metrica.nombre] = metrica
+
+    def _revisar_proceso(self):
+        # Un worker creado con fork hereda los valores del proceso padre:
+        # empieza de cero y con su propio archivo
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._archivo = None
+            for metrica in self.metricas.values():
+                metrica.reiniciar()
+
+    def actualizando(self):
+        return _Actualizacion(self)
+
+    def _despues_de_actualizar(self):
+        if time.monotonic() >= self._proximo_volcado:
+            self.volcar()
+
+    def foto(self):
+        """Definiciones y valores del proceso actual (sin los medidores con función)."""
+        with self._lock:
+            self._revisar_proceso()
+            return {
+                'pid': self._pid,
+                'metricas': {
+                    nombre: {**metrica.definicion(), 'series': json.loads(json.dumps(metrica.series))}
+                    for nombre, metrica in self.metricas.items()
+                    if not getattr(metrica, 'funcion', None)
+                },
+            }
+
+    def volcar(self):
+        """Escribe los valores del proceso en su archivo de METRICAS_DIR."""
+        directorio = directorio_metricas()
+        self._proximo_volcado = time.monotonic() + getattr(settings, 'METRICAS_INTERVALO_SEGUNDOS', 5)
+        if directorio is None or not self._cambios:
+            return
+        # Si otro hilo ya está volcando, este cambio sale en el próximo volcado
+        if not self._lock_volcado.acquire(blocking=False):
+            return
+        try:
+            self._cambios = False
+            foto = self.foto()
+            if self._archivo is None:
+                self._archivo = f"{self._pid}-{uuid.uuid4().hex[:8]}.json"
+            directorio.mkdir(parents=True, exist_ok=True)
+            _escribir(directorio / self._archivo, foto)
+        except OSError as e:
+            # Las métricas nunca deben romper un request
+            logger.warning(f"No se pudieron guardar las métricas en {directorio}: {e}")
+        finally:
+            self._lock_volcado.release()
+
+
+class _Actualizacion:
+    __slots__ = ('registro',)
+
+    def __init__(self, registro):
+        self.registro = registro
+
+    def __enter__(self):
+        self.registro._lock.acquire()
+        self.registro._revisar_proceso()
+
+    def __exit__(self, *exc):
+        self.registro._cambios = True
+        self.registro._lock.release()
+        self.registro._despues_de_actualizar()
+        return False
+
+
+REGISTRO = Registro()
+
+
+def directorio_metricas():
+    directorio = getattr(settings, 'METRICAS_DIR', None)
+    return Path(directorio) if directorio else None
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _leer(ruta):
+    try:
+        return json.loads(ruta.read_text())
+    except (OSError, ValueError):
+        # Consolidado por otro proceso mientras se leía, o dañado
+        return None
+
+
+def _escribir(ruta, datos):
+    temporal = ruta.with_name(f".{ruta.name}.tmp")
+    temporal.write_text(json.dumps(datos))
+    os.replace(temporal, ruta)
+
+
+def combinar(destino, foto, con_medidores=True):
+    """Suma las series de `foto` en `destino` ({nombre: definición con series})."""
+    for nombre, metrica in foto['metricas'].items():
+        if metrica['tipo'] == 'gauge' and not con_medidores:
+            continue
+        actual = destino.setdefault(nombre, {**metrica, 'series': {}})
+        if actual['tipo'] != metrica['tipo'] or actual.get('buckets') != metrica.get('buckets'):
+            logger.warning(f"Definiciones distintas de la métrica {nombre}: se omite una")
+            continue
+        series = actual['series']
+        for clave, valor in metrica['series'].items():
+            if metrica['tipo'] != 'histogram':
+                series[clave] = series.get(clave, 0) + valor
+            elif clave not in series:
+                series[clave] = {'b': list(valor['b']), 's': valor['s'], 'n': valor['n']}
+            else:
+                serie = series[clave]
+                serie['b'] = [a + b for a, b in zip(serie['b'], valor['b'])]
+                serie['s'] += valor['s']
+                serie['n'] += valor['n']
+    return destino
+
+
+def _consolidar_terminados(directorio, propio):
+    """Pasa a terminados.json los contadores e histogramas de procesos que ya no existen."""
+    with open(directorio / ARCHIVO_BLOQUEO, 'a') as bloqueo:
+        fcntl.flock(bloqueo, fcntl.LOCK_EX)
+        terminados = []
+        for ruta in directorio.glob('*-*.json'):
+            pid = ruta.name.split('-', 1)[0]
+            if pid.isdigit() and ruta.name != propio and not _proceso_vivo(int(pid)):
+                terminados.append(ruta)
+        if not terminados:
+            return
+
+        acumulado = _leer(directorio / ARCHIVO_TERMINADOS) or {'metricas': {}}
+        for ruta in terminados:
+            foto = _leer(ruta)
+            if foto is not None:
+                combinar(acumulado['metricas'], foto, con_medidores=False)
+        _escribir(directorio / ARCHIVO_TERMINADOS, acumulado)
+        for ruta in terminados:
+            ruta.unlink(missing_ok=True)
+
+
+def recolectar(registro=None):
+    """Métricas combinadas de todos los procesos: {nombre: definición con series}."""
+    registro = registro or REGISTRO
+    directorio = directorio_metricas()
+    combinadas = {}
+
+    if directorio is None:
+        combinar(combinadas, registro.foto())
+    else:
+        registro._cambios = True
+        registro.volcar()
+        if directorio.is_dir():
+            if fcntl is not None:
+                _consolidar_terminados(directorio, registro._archivo)
+            terminados = _leer(directorio / ARCHIVO_TERMINADOS)
+            if terminados is not None:
+                combinar(combinadas, terminados, con_medidores=False)
+            for ruta in directorio.glob('*-*.json'):
+                foto = _leer(ruta)
+                if foto is not None:
+                    combinar(combinadas, foto)
+        else:
+            combinar(combinadas, registro.foto())
+
+    for nombre, metrica in registro.metricas.items():
+        if getattr(metrica, 'funcion', None):
+            try:
+                combinadas[nombre] = {**metrica.definicion(), 'series': metrica.calcular()}
+            except Exception:
+                logger.exception(f"No se pudo calcular la métrica {nombre}")
+    return combinadas
+
+
+def _numero(valor):
+    if valor == math.inf:
+        return '+Inf'
+    return repr(float(valor))
+
+
+def _escapar(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores, extra=()):
+    pares = list(zip(nombres, valores)) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + '}'
+
+
+def exponer(registro=None):
+    """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+    lineas = []
+    for nombre, metrica in sorted(recolectar(registro).items()):
+        lineas.append(f"# HELP {nombre} {metrica['ayuda']}")
+        lineas.append(f"# TYPE {nombre} {metrica['tipo']}")
+        nombres = metrica['etiquetas']
+        for clave, valor in sorted(metrica['series'].items()):
+            valores = json.loads(clave)
+            if metrica['tipo'] != 'histogram':
+                lineas.append(f"{nombre}{_etiquetas(nombres, valores)} {_numero(valor)}")
+                continue
+            acumulado = 0
+            for limite, cuenta in zip(list(metrica['buckets']) + [math.inf], valor['b']):
+                acumulado += cuenta
+                le = [('le', _numero(limite))]
+                lineas.append(f"{nombre}_bucket{_etiquetas(nombres, valores, le)} {_numero(acumulado)}")
+            lineas.append(f"{nombre}_sum{_etiquetas(nombres, valores)} {_numero(valor['s'])}")
+            lineas.append(f"{nombre}_count{_etiquetas(nombres, valores)} {_numero(valor['n'])}")
+    return '\n'.join(lineas) + '\n'
+
+
+DURACION_HTTP = Histograma(
+    'ticashop_http_duracion_segundos',
+    'Duración de los requests HTTP por vista y método',
+    etiquetas=('vista', 'metodo'),
+)
+RESPUESTAS_HTTP = Contador(
+    'ticashop_http_respuestas_total',
+    'Respuestas HTTP por vista y clase de código (2xx, 3xx, 4xx, 5xx)',
+    etiquetas=('vista', 'codigo'),
+)
+
+
+class MetricasMiddleware:
+    """Latencia y respuestas por nombre de URL (las rutas sin resolver cuentan como 'sin_ruta')."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_ACTIVAS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inicio = time.perf_counter()
+        response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        match = getattr(request, 'resolver_match', None)
+        vista = match.view_name if match else 'sin_ruta'
+        metodo = request.method if request.method in METODOS_HTTP else 'otro'
+        DURACION_HTTP.observe(duracion, vista=vista, metodo=metodo)
+        RESPUESTAS_HTTP.inc(vista=vista, codigo=f"{response.status_code // 100}xx")
+        return response
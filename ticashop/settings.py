@@ -1,6 +1,9 @@
 import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -27,6 +30,7 @@ INSTALLED_APPS = [
     'apps.productos', 
     'apps.ventas',
     'apps.documentos',
+    'apps.correos',
 ]
 
 # Configuración de usuarios personalizados
@@ -36,6 +40,9 @@ AUTH_USER_MODEL = 'usuarios.Usuario'
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
+    # Primero, para medir el request completo (ver INSTRUMENTACION_ACTIVA)
+    'ticashop.instrumentacion.InstrumentacionMiddleware',
+    'ticashop.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,6 +52,23 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Instrumentación por request (consultas, tiempo en DB y plantillas,
+# encabezado Server-Timing y log de requests lentos). Desactivada no tiene costo
+INSTRUMENTACION_ACTIVA = os.environ.get('INSTRUMENTACION', 'False') == 'True'
+INSTRUMENTACION_UMBRAL_MS = int(os.environ.get('INSTRUMENTACION_UMBRAL_MS', '500'))
+INSTRUMENTACION_CONSULTAS_LOG = 5
+
+# Métricas Prometheus en /metricas/ (ver ticashop/metricas.py). Cada proceso
+# vuelca sus valores en METRICAS_DIR cada METRICAS_INTERVALO_SEGUNDOS; todos
+# los workers y comandos deben compartir el directorio (por defecto uno en el
+# directorio temporal del sistema, fuera del repositorio). Con METRICAS_TOKEN el
+# scraper entra con "Authorization: Bearer <token>" (si no, solo administradores)
+# METRICAS=False quita el middleware de latencia HTTP
+METRICAS_ACTIVAS = os.environ.get('METRICAS', 'True') == 'True'
+METRICAS_DIR = os.environ.get('METRICAS_DIR', Path(tempfile.gettempdir()) / 'ticashop-metricas')
+METRICAS_INTERVALO_SEGUNDOS = 5
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
 ROOT_URLCONF = 'ticashop.urls'
 
 TEMPLATES = [
@@ -100,6 +124,12 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/images/'
 MEDIA_ROOT = BASE_DIR / 'static/'
 
+# Exportaciones generadas en segundo plano (fuera de static/: no son públicas)
+EXPORTACIONES_DIR = BASE_DIR / 'exportaciones'
+
+# Planillas subidas que esperan al worker `procesar_importaciones`
+IMPORTACIONES_DIR = BASE_DIR / 'importaciones'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # URLs de redirección de login
@@ -108,6 +138,43 @@ LOGOUT_REDIRECT_URL = '/usuarios/login/'
 
 LOGIN_URL = 'usuarios:login' 
 
+# Folios: cantidad de folios que cada proceso reserva de una vez por tipo de
+# documento (1 = sin bloques, folios sin huecos)
+FOLIOS_TAMANO_BLOQUE = int(os.environ.get('FOLIOS_TAMANO_BLOQUE', '1'))
+
+# Reservas de stock: minutos que se apartan las unidades de un carrito de
+# cliente y de un pedido en borrador del vendedor
+RESERVA_CARRITO_MINUTOS = 30
+RESERVA_PEDIDO_MINUTOS = 24 * 60
+
+# Caché (catálogo de la tienda e indicadores de los paneles). LocMem es por
+# proceso: la versión que sube `invalidar_catalogo()` o `invalidar_indicadores()`
+# no llega a los demás workers, que seguirían mostrando datos viejos hasta que
+# venza la caché. Solo sirve en desarrollo; en producción (DEBUG=False) se exige
+# un backend compartido: Redis/Memcached, o sin dependencias extra
+# CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache con
+# CACHE_LOCATION=ticashop_cache (y `python manage.py createcachetable`)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'ticashop'),
+    }
+}
+if not DEBUG and CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    raise ImproperlyConfigured(
+        'Con DEBUG=False se necesita una caché compartida entre procesos: '
+        'defina CACHE_BACKEND y CACHE_LOCATION (ver CACHES en ticashop/settings.py).'
+    )
+
+# Reportes agrupados de rentabilidad: leer del resumen diario de ventas
+# (se activa cuando `actualizar_resumen_ventas` corrió al menos una vez; los
+# reportes no lo actualizan, el comando debe correr por cron o --continuo)
+REPORTES_USAR_RESUMEN_DIARIO = True
+
+# Recordatorios de cobranza: cada cuántos días se repite el aviso de una
+# factura vencida (el de "por vencer" se envía una sola vez)
+RECORDATORIOS_REPETIR_VENCIDA_DIAS = 7
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
@@ -116,4 +183,9 @@ EMAIL_HOST_USER = 'ninovictorvargas@gmail.com'
 DEFAULT_FROM_EMAIL = 'TicaShop Latam <ninovictorvargas@gmail.com>'
 EMAIL_HOST_PASSWORD = 'hsfx rvbf dfpt ntym'
 
+# Backend con el que `procesar_correos` envía la bandeja de salida. Para
+# desarrollo: 'django.core.mail.backends.console.EmailBackend' o
+# 'django.core.mail.backends.filebased.EmailBackend' (con EMAIL_FILE_PATH)
+CORREOS_BACKEND = os.environ.get('CORREOS_BACKEND', EMAIL_BACKEND)
+
 
@@ -4,8 +4,11 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
 
+from ticashop.views import metricas
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metricas/', metricas, name='metricas'),
     
     # --- LÍNEA CORREGIDA ---
     # Ahora, la página de inicio '/' redirige a la tienda pública.
@@ -0,0 +1,42 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from apps.correos.models import CorreoSalida
+from apps.productos.models import TrabajoImportacion
+from apps.ventas.models import TrabajoExportacion
+from ticashop.metricas import CONTENT_TYPE, Medidor, exponer
+
+
+def _colas_pendientes():
+    return {
+        ('correos',): CorreoSalida.objects.filter(estado='Pendiente').count(),
+        ('exportaciones',): TrabajoExportacion.objects.filter(estado='Pendiente').count(),
+        ('importaciones',): TrabajoImportacion.objects.filter(estado='Pendiente').count(),
+    }
+
+
+COLAS_PENDIENTES = Medidor(
+    'ticashop_cola_pendientes',
+    'Elementos esperando a su worker (procesar_correos, procesar_exportaciones, procesar_importaciones)',
+    etiquetas=('cola',),
+    funcion=_colas_pendientes,
+)
+
+
+def _autorizado(request):
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    usuario = request.user
+    return usuario.is_authenticated and (usuario.is_superuser or usuario.rol == 'Administrador')
+
+
+@require_GET
+def metricas(request):
+    """Métricas de todos los procesos en formato de texto de Prometheus (solo administradores)."""
+    if not _autorizado(request):
+        return HttpResponseForbidden()
+    return HttpResponse(exponer(), content_type=CONTENT_TYPE)